@@ -0,0 +1,127 @@
+"""CheapShark requests and wall time: per-title lookups vs bulk refresh by id.
+
+Starts a local mock of the CheapShark games/deals endpoints (with a fixed
+per-request latency) and prices the same library three ways through
+bot/sales.py's rate-limited scanner:
+
+  per-title   games?title= then deals?id= for every game (how the scan used to work)
+  first scan  ids not yet known: one title lookup per game, then games?ids= in batches
+  steady      ids already stored: games?ids= batches only
+
+    python benchmarks/cheapshark_bulk.py --games 500 --rate 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+import sales  # noqa: E402
+from http_client import HttpClient  # noqa: E402
+from sales import IDS_PER_REQUEST, SaleScanner  # noqa: E402
+
+
+def mock_app(games, latency):
+    by_title = {f"Game Title {i}": i for i in range(1, games + 1)}
+    hits = {"games?title": 0, "games?ids": 0, "deals": 0}
+
+    def deal(game_id):
+        return {"storeID": "1", "dealID": f"deal{game_id}", "price": "9.99" if game_id % 3 == 0 else "19.99",
+                "retailPrice": "19.99", "savings": "50.0"}
+
+    async def games_endpoint(request):
+        await asyncio.sleep(latency)
+        if "ids" in request.query:
+            hits["games?ids"] += 1
+            ids = [int(game_id) for game_id in request.query["ids"].split(",")]
+            if len(ids) > IDS_PER_REQUEST:
+                return web.json_response({"error": "too many ids"}, status=400)
+            return web.json_response({
+                str(game_id): {"info": {"title": f"Game Title {game_id}"}, "deals": [deal(game_id)]}
+                for game_id in ids
+            })
+        hits["games?title"] += 1
+        game_id = by_title.get(request.query.get("title"))
+        if game_id is None:
+            return web.json_response([])
+        return web.json_response([{"gameID": str(game_id), "external": f"Game Title {game_id}",
+                                   "cheapest": deal(game_id)["price"], "cheapestDealID": f"deal{game_id}"}])
+
+    async def deals_endpoint(request):
+        await asyncio.sleep(latency)
+        hits["deals"] += 1
+        game_id = int(request.query["id"].removeprefix("deal"))
+        info = deal(game_id)
+        return web.json_response({"gameInfo": {"name": f"Game Title {game_id}", "storeID": "1",
+                                               "salePrice": info["price"], "retailPrice": info["retailPrice"]}})
+
+    app = web.Application()
+    app.router.add_get("/api/1.0/games", games_endpoint)
+    app.router.add_get("/api/1.0/deals", deals_endpoint)
+    return app, hits
+
+
+async def per_title(scanner, names):
+    # The old scan: search by title, then fetch the cheapest deal, two requests per game
+    async def check(name):
+        async with scanner.semaphore:
+            data = await scanner.get_json("games", {"title": name, "limit": 1})
+            if data:
+                await scanner.get_json("deals", {"id": data[0]["cheapestDealID"]})
+
+    await asyncio.gather(*(check(name) for name in names))
+
+
+async def run(args):
+    app, hits = mock_app(args.games, args.latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    sales.CHEAPSHARK_API = f"http://127.0.0.1:{port}/api/1.0"
+
+    client = HttpClient()
+    await client.start()
+    names = [f"Game Title {i}" for i in range(1, args.games + 1)]
+    known_ids = {}
+    results = {}
+    try:
+        for mode in ("per-title", "first scan", "steady"):
+            for key in hits:
+                hits[key] = 0
+            scanner = SaleScanner(client, concurrency=args.concurrency, rate=args.rate, burst=args.rate)
+            started = time.perf_counter()
+            if mode == "per-title":
+                await per_title(scanner, names)
+            else:
+                priced = await scanner.scan([(known_ids.get(name), name) for name in names])
+                for name, (cheapshark_id, _) in zip(names, priced):
+                    known_ids[name] = cheapshark_id
+            results[mode] = (time.perf_counter() - started, sum(hits.values()), dict(hits))
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+    print(f"\n{args.games} games, {args.rate:g} req/s limit, {args.latency * 1000:.0f}ms mock latency")
+    print(f"  {'mode':<12}{'requests':>10}{'seconds':>10}  breakdown")
+    for mode, (elapsed, total, breakdown) in results.items():
+        print(f"  {mode:<12}{total:>10}{elapsed:>10.2f}  {breakdown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""End-to-end command latency against local mock APIs.
+
+Starts benchmarks/mock_apis.py in-process, imports bot/bot.py pointed at it and
+at a throwaway database, seeds libraries of each size and drives the real command
+coroutines through fake Discord contexts. For every command it reports p50/p95/p99
+latency until the queued background work it started has finished, how long the
+reply itself took, upstream requests per call and time spent waiting on the
+database, and writes everything to a JSON file so runs can be compared.
+
+    python benchmarks/commands.py --sizes 10 1000 100000 --iterations 30 --out bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "bot"))
+sys.path.insert(0, BENCH_DIR)
+
+import mock_apis  # noqa: E402
+from fake_discord import FakeChannel, FakeContext, FakeGuild, FakeInteraction, FakeUser  # noqa: E402
+
+USERS = [FakeUser(f"member{i}") for i in range(12)]
+GUILD = FakeGuild("bench-club")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+def summarize(samples):
+    return {
+        "calls": len(samples["latency"]),
+        "reply_p50_ms": round(percentile(samples["reply"], 50) * 1000, 2),
+        "p50_ms": round(percentile(samples["latency"], 50) * 1000, 2),
+        "p95_ms": round(percentile(samples["latency"], 95) * 1000, 2),
+        "p99_ms": round(percentile(samples["latency"], 99) * 1000, 2),
+        "requests_per_call": round(sum(samples["requests"]) / len(samples["requests"]), 2),
+        "db_ms_per_call": round(sum(samples["db"]) / len(samples["db"]) * 1000, 2),
+    }
+
+
+def seed(path, rows, migrate):
+    conn = sqlite3.connect(path, isolation_level=None)
+    migrate(conn)
+    conn.execute("BEGIN")
+    conn.executemany('''
+        INSERT INTO game_picks (guild_id, user, game_name, title_key, genres, release_ts, summary, url,
+                                igdb_id, slug, cheapshark_id)
+        VALUES (?, ?, ?, ?, 'Adventure, RPG', 1500000000, 'A seeded game.', ?, ?, ?, ?)
+    ''', (
+        (GUILD.id, USERS[i % len(USERS)].name, f"Seeded Game {i}", f"seeded game {i}",
+         f"https://www.igdb.com/games/seeded-game-{i}", mock_apis.fake_id(f"seeded-game-{i}"),
+         f"seeded-game-{i}", mock_apis.fake_id(f"seeded-game-{i}"))
+        for i in range(rows)
+    ))
+    conn.execute("COMMIT")
+    conn.close()
+
+
+class Harness:
+    def __init__(self, bot_module, state):
+        self.bot = bot_module
+        self.state = state
+        self.db_time = 0.0
+        original_run = bot_module.db._run
+
+        # Every query goes through Database._run, so this is the time commands spend waiting on SQLite
+        async def timed_run(label, fn, *args):
+            started = time.perf_counter()
+            try:
+                return await original_run(label, fn, *args)
+            finally:
+                self.db_time += time.perf_counter() - started
+
+        bot_module.db._run = timed_run
+
+    async def settle(self):
+        while self.bot.background_tasks or not await self.bot.job_queue.idle():
+            await asyncio.sleep(0.002)
+
+    async def measure(self, samples, coro):
+        self.state.reset()
+        db_before = self.db_time
+        started = time.perf_counter()
+        await coro
+        samples["reply"].append(time.perf_counter() - started)
+        await self.settle()
+        samples["latency"].append(time.perf_counter() - started)
+        # Cover downloads run in the background after a suggestion, not while the command waits
+        samples["requests"].append(sum(count for key, count in self.state.counts.items()
+                                       if not key.endswith(("429", "5xx")) and not key.startswith("igdb_images")))
+        samples["db"].append(self.db_time - db_before)
+
+
+async def bench_size(bot_module, state, rows, iterations, tmp):
+    from cache import ResponseCache
+    from cover_fetcher import CoverFetcher
+    from db import Database
+    from guild_config import GuildConfigCache
+    from job_queue import JobQueue
+    from title_index import TitleIndex
+    from gameclub import migrations
+
+    path = os.path.join(tmp, f"gameclub-{rows}.db")
+    seed(path, rows, migrations.migrate)
+    bot_module.db = Database(path)
+    bot_module.api_cache = ResponseCache(os.path.join(tmp, f"api_cache-{rows}.db"))
+    bot_module.guild_configs = GuildConfigCache(bot_module.db)
+    bot_module.cover_fetcher = CoverFetcher(bot_module.db, bot_module.http_client, os.path.join(tmp, f"covers-{rows}"),
+                                            bot_module.COVER_CACHE_MB * 1024 * 1024)
+    handlers = bot_module.job_queue.handlers
+    bot_module.job_queue = JobQueue(bot_module.db, concurrency=bot_module.JOB_WORKERS)
+    bot_module.job_queue.handlers = handlers
+    await bot_module.job_queue.start()
+    bot_module.title_index = TitleIndex()
+    bot_module.title_index.load(await bot_module.db.run(bot_module.indexed_titles))
+    harness = Harness(bot_module, state)
+
+    # Jobs find the messages they edit through bot.get_channel, so commands run in a registered channel
+    sales_channel, announcements, club = FakeChannel("sales"), FakeChannel("announcements"), FakeChannel("club")
+    GUILD.channels = {channel.id: channel for channel in (sales_channel, announcements, club)}
+    bot_module.bot.get_channel = GUILD.channels.get
+    await bot_module.guild_configs.update(
+        GUILD.id, sales_channel_id=sales_channel.id, announcement_channel_id=announcements.id
+    )
+
+    results = {name: {"latency": [], "reply": [], "requests": [], "db": []}
+               for name in ("suggest", "suggest_duplicate", "autocomplete", "search", "pick_next", "sale_check")}
+    for i in range(iterations):
+        ctx = FakeContext(USERS[i % len(USERS)], channel=club, guild=GUILD)
+        await harness.measure(results["suggest"],
+                              bot_module.suggest_game.callback(ctx, input_name=f"Benchmark Quest {rows}-{i}"))
+        await harness.measure(results["suggest_duplicate"],
+                              bot_module.suggest_game.callback(ctx, input_name=f"Seeded Game {i * 7 % max(rows, 1)}"))
+        await harness.measure(results["autocomplete"],
+                              bot_module.suggest_autocomplete(FakeInteraction(GUILD), f"game {i * 7 % max(rows, 1)}"))
+        await harness.measure(results["search"], bot_module.search_games.callback(ctx, text="seeded game"))
+        await harness.measure(results["pick_next"], bot_module.pick_next_game.callback(ctx))
+
+    # Every run is a full steady-state scan: ids known, every price stale
+    for _ in range(max(1, iterations // 10)):
+        await bot_module.db.execute("UPDATE price_latest SET checked_at = 0")
+        await harness.measure(results["sale_check"], bot_module.run_sale_check())
+
+    await bot_module.job_queue.stop()
+    await bot_module.cover_fetcher.stop()
+    await bot_module.api_cache.close()
+    await bot_module.db.close()
+    return {name: summarize(samples) for name, samples in results.items()}
+
+
+async def run(args):
+    config = mock_apis.MockConfig(args.latency, args.jitter, args.error_rate, args.rate_limit)
+    runner, state, base_url = await mock_apis.start(config)
+    tmp = tempfile.mkdtemp(prefix="gameclub-bench-")
+    os.environ.update(mock_apis.env_for(base_url))
+    os.environ.update({
+        "CLIENT_ID": "bench", "CLIENT_SECRET": "bench",
+        "GAMECLUB_DB_PATH": os.path.join(tmp, "import.db"),
+        "GAMECLUB_CACHE_PATH": os.path.join(tmp, "import_cache.db"),
+        "CHEAPSHARK_RATE": str(args.cheapshark_rate), "CHEAPSHARK_BURST": str(int(args.cheapshark_rate)),
+    })
+    import bot as bot_module  # noqa: E402 -- reads the environment above at import
+
+    await bot_module.http_client.start()
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "config": {key: value for key, value in vars(args).items() if key != "out"},
+        "sizes": {},
+    }
+    try:
+        for rows in args.sizes:
+            started = time.perf_counter()
+            report["sizes"][str(rows)] = await bench_size(bot_module, state, rows, args.iterations, tmp)
+            print(f"{rows:>8,} games done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        await bot_module.http_client.close()
+        await runner.cleanup()
+
+    for rows, commands in report["sizes"].items():
+        print(f"\n{int(rows):,} games")
+        print(f"  {'command':<20}{'reply ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/call':>10}{'db ms':>10}")
+        for name, stats in commands.items():
+            print(f"  {name:<20}{stats['reply_p50_ms']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                  f"{stats['requests_per_call']:>10}{stats['db_ms_per_call']:>10}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="mock requests/second per service")
+    parser.add_argument("--cheapshark-rate", type=float, default=200, help="bot-side CheapShark rate limit")
+    parser.add_argument("--out", default="bench-results.json")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
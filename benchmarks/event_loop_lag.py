@@ -0,0 +1,120 @@
+"""Event-loop lag while bot commands hit SQLite.
+
+Runs the same burst of concurrent "commands" twice: once with a shared
+sqlite3 connection used directly on the loop (how bot.py used to work) and
+once through bot/db.py's Database, which runs queries on its own thread.
+A ticker coroutine measures how late each 10ms tick fires; that lateness is
+what gateway heartbeats and button interactions would see.
+
+    python benchmarks/event_loop_lag.py --rows 50000 --commands 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bot"))
+
+from db import Database  # noqa: E402
+
+# The queries a busy evening actually runs: pick_next's rotation lookup,
+# the duplicate check in suggest and a full listgames
+QUERIES = [
+    ("SELECT id, user, game_name FROM game_picks "
+     "WHERE user NOT IN (SELECT user FROM picked_users) ORDER BY id LIMIT 1", ()),
+    ("SELECT id FROM game_picks WHERE game_name = ?", ("Game 424242",)),
+    ("SELECT user, game_name FROM game_picks ORDER BY id", ()),
+]
+
+
+def seed(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE game_picks (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, game_name TEXT, "
+                 "genres TEXT, release_date TEXT, summary TEXT, url TEXT)")
+    conn.execute("CREATE TABLE picked_users (user TEXT PRIMARY KEY)")
+    users = [f"user{i}" for i in range(50)]
+    conn.executemany(
+        "INSERT INTO game_picks (user, game_name, genres, release_date, summary, url) VALUES (?, ?, ?, ?, ?, ?)",
+        ((random.choice(users), f"Game {i}", "Adventure, RPG", "2020-01-01", "x" * 200, "https://www.igdb.com")
+         for i in range(rows)),
+    )
+    # Everyone but the last user has picked, so the rotation query walks most of the table
+    conn.executemany("INSERT INTO picked_users (user) VALUES (?)", ((u,) for u in users[:-1]))
+    conn.commit()
+    conn.close()
+
+
+async def measure_lag(stop, interval=0.01):
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def run(mode, path, commands):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(0.05)
+
+    if mode == "blocking":
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+
+        async def command(i):
+            await asyncio.sleep(random.random() * 0.05)
+            sql, params = QUERIES[i % len(QUERIES)]
+            c.execute(sql, params)
+            c.fetchall()
+    else:
+        db = Database(path)
+
+        async def command(i):
+            await asyncio.sleep(random.random() * 0.05)
+            sql, params = QUERIES[i % len(QUERIES)]
+            await db.fetchall(sql, params)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(command(i) for i in range(commands)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await ticker
+
+    if mode == "blocking":
+        conn.close()
+    else:
+        await db.close()
+    return elapsed, lags
+
+
+def report(mode, elapsed, lags):
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{mode:>9}: {elapsed:6.2f}s total | loop lag mean {statistics.mean(lags_ms):7.2f}ms "
+          f"p99 {p99:7.2f}ms max {lags_ms[-1]:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--commands", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.rows)
+        print(f"{args.rows} rows, {args.commands} concurrent commands")
+        for mode in ("blocking", "executor"):
+            report(mode, *asyncio.run(run(mode, path, args.commands)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Just enough of discord.py's Context/Channel/Message surface to drive bot commands offline.
+
+Commands are called through their `.callback`, skipping checks and the gateway.
+Confirmation views (anything with a `result` the command waits on) are answered
+with `confirm` as soon as they're sent or edited in, as if the author clicked the button.
+"""
+import itertools
+
+_ids = itertools.count(1)
+
+
+class FakeUser:
+    def __init__(self, name="bench-user", user_id=None):
+        self.name = name
+        self.id = user_id or next(_ids)
+        self.mention = f"<@{self.id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, name="bench-guild", guild_id=None):
+        self.name = name
+        self.id = guild_id or next(_ids)
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, view=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+    async def edit(self, content=None, embed=None, view=None, **kwargs):
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+        self.view = view if view is not None else self.view
+        self.channel.answer(view)
+        return self
+
+    async def delete(self):
+        self.channel.messages.remove(self)
+
+
+class FakeChannel:
+    def __init__(self, name="bench", channel_id=None, confirm="accept"):
+        self.name = name
+        self.id = channel_id or next(_ids)
+        self.confirm = confirm
+        self.messages = []
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        message = FakeMessage(self, content, embed, view)
+        self.messages.append(message)
+        self.answer(view)
+        return message
+
+    def answer(self, view):
+        if view is not None and hasattr(view, "result") and self.confirm:
+            view.result = self.confirm
+            view.stop()
+
+    def get_partial_message(self, message_id):
+        return next(message for message in self.messages if message.id == message_id)
+
+
+class FakeContext:
+    def __init__(self, author=None, channel=None, guild=None):
+        self.author = author or FakeUser()
+        self.channel = channel or FakeChannel()
+        self.guild = guild or FakeGuild()
+        self.message = FakeMessage(self.channel)
+        # Always a prefix invocation; slash commands need a real interaction
+        self.interaction = None
+        self.clean_prefix = "!"
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeInteraction:
+    """What autocomplete callbacks read from an interaction."""
+
+    def __init__(self, guild=None, user=None):
+        self.guild_id = (guild or FakeGuild()).id
+        self.user = user or FakeUser()
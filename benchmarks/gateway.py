@@ -0,0 +1,350 @@
+"""Bot startup time and memory against a mocked Discord gateway.
+
+Serves just enough of Discord's REST API and gateway protocol (HELLO, IDENTIFY, READY,
+GUILD_CREATE, heartbeats) on localhost to log the real bot/bot.py in, then streams message,
+typing and reaction traffic to every guild. Like Discord, the mock only sends events the
+bot's intents subscribe to and strips message content without the message content intent.
+Each run is a fresh process, so the RSS figures are what a container would need.
+
+    python benchmarks/gateway.py --guilds 1 10 100 --profiles lean full --out gateway.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import yarl
+from aiohttp import WSMsgType, web
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "bot"))
+
+import discord  # noqa: E402
+
+BOT_ID = 1000
+APPLICATION_ID = 1001
+OWNER_ID = 1002
+# Snowflakes carry their creation time in the top bits; shards are assigned from it
+EPOCH_MS = 1_600_000_000_000 - 1_420_070_400_000
+JOINED_AT = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc).isoformat()
+
+
+def snowflake(n):
+    return ((EPOCH_MS + n) << 22) | (n & 0xFFF)
+
+
+def user(user_id, bot=False):
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "global_name": None,
+            "avatar": None, "bot": bot}
+
+
+def json_response(data):
+    # discord.py only decodes bodies whose content type is exactly application/json, no charset
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+
+def member(user_id):
+    return {"user": user(user_id), "nick": None, "roles": [], "joined_at": JOINED_AT,
+            "deaf": False, "mute": False, "flags": 0}
+
+
+class MockGateway:
+    """REST and gateway endpoints for one bot; `configure` sets the world the next login sees."""
+
+    def __init__(self, channels=40, roles=20, emojis=30, members=5000, messages=100):
+        self.channels = channels
+        self.roles = roles
+        self.emojis = emojis
+        self.members = members
+        self.messages = messages
+        self.guild_ids = []
+        self.shards = 1
+        self.sent = {"events": 0, "bytes": 0}
+        self.url = None
+
+    def configure(self, guilds, shards):
+        self.guild_ids = [snowflake(i) for i in range(guilds)]
+        self.shards = shards
+        self.sent = {"events": 0, "bytes": 0}
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/v10/users/@me", self.me)
+        app.router.add_get("/api/v10/oauth2/applications/@me", self.application)
+        app.router.add_get("/api/v10/gateway/bot", self.gateway_bot)
+        app.router.add_get("/gateway", self.gateway)
+        return app
+
+    async def me(self, request):
+        return json_response(user(BOT_ID, bot=True))
+
+    async def application(self, request):
+        return json_response({
+            "id": str(APPLICATION_ID), "name": "gameclub", "icon": None, "description": "", "flags": 0,
+            "bot_public": False, "bot_require_code_grant": False, "verify_key": "0" * 64,
+            "owner": user(OWNER_ID), "team": None,
+        })
+
+    async def gateway_bot(self, request):
+        return json_response({
+            "url": self.url, "shards": self.shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1},
+        })
+
+    def guild(self, guild_id):
+        channels = [
+            {"id": str(guild_id + 1 + i), "type": 2 if i % 8 == 7 else 0, "guild_id": str(guild_id),
+             "position": i, "permission_overwrites": [], "name": f"channel-{i}", "topic": None, "nsfw": False,
+             "last_message_id": None, "rate_limit_per_user": 0, "parent_id": None, "bitrate": 64000,
+             "user_limit": 0, "rtc_region": None}
+            for i in range(self.channels)
+        ]
+        roles = [
+            {"id": str(guild_id if i == 0 else guild_id + 1000 + i), "name": "@everyone" if i == 0 else f"role-{i}",
+             "permissions": "104324673", "position": i, "color": 0, "hoist": False, "managed": False,
+             "mentionable": False, "flags": 0}
+            for i in range(self.roles)
+        ]
+        emojis = [
+            {"id": str(guild_id + 2000 + i), "name": f"emoji{i}", "roles": [], "require_colons": True,
+             "managed": False, "animated": False, "available": True}
+            for i in range(self.emojis)
+        ]
+        # Without the members intent Discord only sends the bot's own member
+        return {
+            "id": str(guild_id), "name": f"guild-{guild_id}", "icon": None, "owner_id": str(OWNER_ID),
+            "afk_timeout": 300, "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "roles": roles, "emojis": emojis, "stickers": [], "features": [],
+            "mfa_level": 0, "system_channel_id": None, "premium_tier": 0, "preferred_locale": "en-US",
+            "nsfw_level": 0, "premium_progress_bar_enabled": False, "joined_at": JOINED_AT,
+            "large": self.members > 250, "unavailable": False, "member_count": self.members,
+            "members": [member(BOT_ID)], "channels": channels, "threads": [], "presences": [], "voice_states": [],
+            "stage_instances": [], "guild_scheduled_events": [],
+        }
+
+    def traffic(self, guild_id, intents, rng):
+        """Chat in a guild: messages, with typing before and reactions after some of them."""
+        text_channels = [guild_id + 1 + i for i in range(self.channels) if i % 8 != 7]
+        for n in range(self.messages):
+            channel_id = rng.choice(text_channels)
+            author = 10_000 + rng.randrange(self.members)
+            message_id = snowflake(100_000 + n)
+            base = {"channel_id": str(channel_id), "guild_id": str(guild_id)}
+            if intents.guild_typing:
+                yield "TYPING_START", dict(base, user_id=str(author), timestamp=int(time.time()), member=member(author))
+            if intents.guild_messages:
+                content = f"message {n} about the next game night, who's in?" if intents.message_content else ""
+                yield "MESSAGE_CREATE", dict(
+                    base, id=str(message_id), author=user(author), content=content, timestamp=JOINED_AT,
+                    member={key: value for key, value in member(author).items() if key != "user"},
+                    edited_timestamp=None, tts=False, mention_everyone=False, mentions=[], mention_roles=[],
+                    attachments=[], embeds=[], pinned=False, type=0, flags=0,
+                )
+            if intents.guild_reactions and n % 3 == 0:
+                yield "MESSAGE_REACTION_ADD", dict(
+                    base, user_id=str(author), message_id=str(message_id), emoji={"id": None, "name": "👍"},
+                    member=member(author), burst=False, type=0,
+                )
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        sequence = 0
+
+        async def dispatch(event, data):
+            nonlocal sequence
+            sequence += 1
+            body = json.dumps({"op": 0, "t": event, "s": sequence, "d": data})
+            self.sent["events"] += 1
+            self.sent["bytes"] += len(body)
+            await ws.send_str(body)
+
+        await ws.send_json({"op": 10, "d": {"heartbeat_interval": 41250}})
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            payload = json.loads(msg.data)
+            if payload["op"] == 1:
+                await ws.send_json({"op": 11})
+            elif payload["op"] == 2:
+                identify = payload["d"]
+                intents = discord.Intents.none()
+                intents.value = identify["intents"]
+                shard_id, shard_count = identify.get("shard") or (0, 1)
+                guild_ids = [guild_id for guild_id in self.guild_ids if (guild_id >> 22) % shard_count == shard_id]
+                await dispatch("READY", {
+                    "v": 10, "user": user(BOT_ID, bot=True), "session_id": f"bench-{shard_id}",
+                    "resume_gateway_url": self.url, "shard": [shard_id, shard_count],
+                    "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in guild_ids],
+                    "application": {"id": str(APPLICATION_ID), "flags": 0},
+                })
+                for guild_id in guild_ids:
+                    await dispatch("GUILD_CREATE", self.guild(guild_id))
+                rng = random.Random(shard_id)
+                for guild_id in guild_ids:
+                    for event, data in self.traffic(guild_id, intents, rng):
+                        await dispatch(event, data)
+                # Not a real event; the bot counts it to know this shard's traffic is all in
+                await dispatch("BENCH_DONE", {})
+        return ws
+
+
+async def child(args):
+    """One bot process: log in, wait for every guild and all traffic, report timings, caches and RSS."""
+    from monitoring import gateway_cache_sizes, resident_bytes
+
+    rss_start = resident_bytes()
+    discord.http.Route.BASE = f"{args.url}/api/v10"
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(args.url.replace("http", "ws", 1) + "/gateway")
+    import bot as bot_module  # noqa: E402 -- reads the environment set by the parent
+    rss_import = resident_bytes()
+
+    bot = bot_module.bot
+    guilds = args.guilds[0]
+    shards_done = asyncio.Event()
+    done = []
+
+    async def on_socket_event_type(event):
+        if event == "BENCH_DONE":
+            done.append(event)
+            if len(done) == args.shards:
+                shards_done.set()
+
+    async def until(awaitable):
+        # Surface the bot's own error instead of waiting forever on a login that failed
+        waiter = asyncio.ensure_future(awaitable)
+        await asyncio.wait({waiter, runner}, return_when=asyncio.FIRST_COMPLETED)
+        if not waiter.done():
+            waiter.cancel()
+            await runner
+            raise RuntimeError("bot stopped before the benchmark finished")
+
+    async def all_guilds():
+        while len(bot.guilds) < guilds:
+            await asyncio.sleep(0.001)
+
+    bot.add_listener(on_socket_event_type)
+    started = time.perf_counter()
+    runner = asyncio.create_task(bot.start("bench-token"))
+    await until(all_guilds())
+    guilds_loaded = time.perf_counter() - started
+    await until(bot.wait_until_ready())
+    ready = time.perf_counter() - started
+    rss_ready = resident_bytes()
+    await until(shards_done.wait())
+    traffic = time.perf_counter() - started
+    rss_traffic = resident_bytes()
+    caches = gateway_cache_sizes(bot)
+    await bot.close()
+    await asyncio.gather(runner, return_exceptions=True)
+    print(json.dumps({
+        "guilds_loaded_ms": round(guilds_loaded * 1000, 1),
+        "ready_ms": round(ready * 1000, 1),
+        "traffic_done_ms": round(traffic * 1000, 1),
+        "rss_start_mb": round(rss_start / 2**20, 1),
+        "rss_import_mb": round(rss_import / 2**20, 1),
+        "rss_ready_mb": round(rss_ready / 2**20, 1),
+        "rss_traffic_mb": round(rss_traffic / 2**20, 1),
+        "profile": str(bot_module.RUNTIME),
+        "caches": caches,
+    }))
+
+
+async def run_child(args, gateway, profile, guilds, tmp):
+    shards = args.shards or max(1, math.ceil(guilds / 1000))
+    gateway.configure(guilds, shards)
+    env = dict(
+        os.environ,
+        GAMECLUB_RUNTIME_PROFILE=profile,
+        GAMECLUB_DB_PATH=os.path.join(tmp, f"{profile}-{guilds}.db"),
+        GAMECLUB_CACHE_PATH=os.path.join(tmp, f"{profile}-{guilds}-cache.db"),
+        GAMECLUB_COVER_DIR=os.path.join(tmp, "covers"),
+        METRICS_PORT="0", SYNC_COMMANDS="0", CLIENT_ID="bench", CLIENT_SECRET="bench",
+        GUILD_READY_TIMEOUT=str(args.ready_timeout),
+    )
+    if args.sharded:
+        env["GAMECLUB_SHARDED"] = "1"
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--child", "--url", gateway.url,
+        "--guilds", str(guilds), "--shards", str(shards if args.sharded else 1),
+        env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode:
+        sys.stderr.write(stderr.decode()[-4000:])
+        raise RuntimeError(f"{profile} run with {guilds} guilds exited with {proc.returncode}")
+    result = json.loads(stdout.decode().strip().splitlines()[-1])
+    result["gateway_events"] = gateway.sent["events"]
+    result["gateway_mb"] = round(gateway.sent["bytes"] / 2**20, 2)
+    return result
+
+
+async def run(args):
+    gateway = MockGateway(args.channels, args.roles, args.emojis, args.members, args.messages)
+    runner = web.AppRunner(gateway.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    gateway.url = f"http://127.0.0.1:{port}"
+    tmp = tempfile.mkdtemp(prefix="gameclub-gateway-")
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "discord.py": discord.__version__,
+        "config": {key: value for key, value in vars(args).items() if key not in ("out", "child", "url")},
+        "runs": {},
+    }
+    try:
+        for profile in args.profiles:
+            for guilds in args.guilds:
+                result = await run_child(args, gateway, profile, guilds, tmp)
+                report["runs"][f"{profile}/{guilds}"] = result
+                print(f"{profile:>6} {guilds:>6,} guilds done", file=sys.stderr)
+    finally:
+        await runner.cleanup()
+
+    print(f"\n  {'profile':<8}{'guilds':>8}{'loaded ms':>11}{'ready ms':>10}{'import MB':>11}{'ready MB':>10}"
+          f"{'traffic MB':>12}{'events':>9}{'sent MB':>9}{'messages':>10}{'members':>9}")
+    for key, result in report["runs"].items():
+        profile, guilds = key.split("/")
+        caches = result["caches"]
+        print(f"  {profile:<8}{int(guilds):>8,}{result['guilds_loaded_ms']:>11}{result['ready_ms']:>10}"
+              f"{result['rss_import_mb']:>11}{result['rss_ready_mb']:>10}{result['rss_traffic_mb']:>12}"
+              f"{result['gateway_events']:>9}{result['gateway_mb']:>9}{caches['messages']:>10}{caches['members']:>9}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--profiles", nargs="+", default=["lean", "full"], choices=["lean", "full"])
+    parser.add_argument("--sharded", action="store_true", help="run the bot as an AutoShardedBot")
+    parser.add_argument("--shards", type=int, default=0, help="shards the gateway recommends (default: 1 per 1000 guilds)")
+    parser.add_argument("--channels", type=int, default=40, help="channels per guild")
+    parser.add_argument("--roles", type=int, default=20, help="roles per guild")
+    parser.add_argument("--emojis", type=int, default=30, help="emojis per guild")
+    parser.add_argument("--members", type=int, default=5000, help="members per guild (message authors)")
+    parser.add_argument("--messages", type=int, default=100, help="messages streamed per guild after startup")
+    parser.add_argument("--ready-timeout", type=float, default=2.0, help="discord.py guild_ready_timeout")
+    parser.add_argument("--out", default="gateway-results.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    asyncio.run(child(args) if args.child else run(args))
+
+
+if __name__ == "__main__":
+    main()
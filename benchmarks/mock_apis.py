@@ -0,0 +1,248 @@
+"""Local stand-ins for the Twitch token endpoint, IGDB v4 (and its images) and CheapShark.
+
+One aiohttp app serves them under /twitch, /igdb/v4, /igdb/images and /cheapshark/api/1.0.
+Every title resolves to a deterministic fake game, so any library can be priced
+and looked up. Latency, error rate and a per-service rate limit are configurable,
+and every request is counted by service and path.
+
+    python benchmarks/mock_apis.py --port 8081 --latency 0.08 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import collections
+import random
+import re
+import struct
+import time
+import zlib
+
+from aiohttp import web
+
+# Enough of the Apicalypse grammar for the queries bot.py sends
+SEARCH_RE = re.compile(r'search\s+"((?:[^"\\]|\\.)*)"')
+WHERE_RE = re.compile(r"where\s+(\w+)\s*=\s*(\([^)]*\)|\"(?:[^\"\\]|\\.)*\"|\d+)")
+LIMIT_RE = re.compile(r"limit\s+(\d+)")
+MULTI_RE = re.compile(r'query\s+(\w+)\s+"([^"]+)"\s*\{(.*?)\};', re.S)
+
+
+class MockConfig:
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, rate_limit=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per second per service; None for unlimited
+        self.random = random.Random(seed)
+
+
+def slugify(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def fake_id(text):
+    return zlib.crc32(text.encode()) % 9_000_000 + 1
+
+
+class MockState:
+    def __init__(self, config):
+        self.config = config
+        self.counts = collections.Counter()
+        self.names = {}  # id -> title, for ids handed out earlier
+        self.windows = collections.defaultdict(collections.deque)
+
+    def reset(self):
+        self.counts.clear()
+
+    def game(self, name):
+        game_id = fake_id(slugify(name))
+        self.names[game_id] = name
+        return {
+            "id": game_id,
+            "name": name,
+            "slug": slugify(name),
+            "url": f"https://www.igdb.com/games/{slugify(name)}",
+            "summary": f"{name} is a game about {name.lower()}. " * 4,
+            "first_release_date": 1_400_000_000 + game_id % 300_000_000,
+            "genres": [{"id": 12, "name": "Role-playing (RPG)"}, {"id": 31, "name": "Adventure"}],
+            "platforms": [{"id": 6, "name": "PC (Microsoft Windows)"}, {"id": 48, "name": "PlayStation 4"}],
+            "cover": {"id": game_id, "image_id": f"co{game_id:x}"},
+            "websites": [{"id": game_id, "url": f"https://store.steampowered.com/app/{game_id}"}],
+            "similar_games": [{"id": game_id + i, "name": f"{name} {numeral}"} for i, numeral in enumerate(("II", "III"), 1)],
+        }
+
+    def name_for(self, game_id):
+        return self.names.get(game_id, f"Game {game_id}")
+
+    async def gate(self, service, path):
+        """Latency, rate limit and injected failures shared by every endpoint."""
+        config = self.config
+        self.counts[f"{service} {path}"] += 1
+        if config.rate_limit:
+            window = self.windows[service]
+            now = time.monotonic()
+            while window and now - window[0] > 1:
+                window.popleft()
+            if len(window) >= config.rate_limit:
+                self.counts[f"{service} 429"] += 1
+                return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+            window.append(now)
+        await asyncio.sleep(max(0.0, config.latency + config.random.uniform(-config.jitter, config.jitter)))
+        if config.random.random() < config.error_rate:
+            self.counts[f"{service} 5xx"] += 1
+            return web.json_response({"error": "upstream failure"}, status=503)
+        return None
+
+    # --- Twitch ---
+
+    async def token(self, request):
+        failure = await self.gate("twitch", "token")
+        if failure is not None:
+            return failure
+        return web.json_response({"access_token": f"mock-{time.monotonic_ns()}", "expires_in": 5_000_000,
+                                  "token_type": "bearer"})
+
+    # --- IGDB ---
+
+    def igdb_query(self, endpoint, body):
+        limit = int(LIMIT_RE.search(body).group(1)) if LIMIT_RE.search(body) else 10
+        search = SEARCH_RE.search(body)
+        where = WHERE_RE.search(body)
+        if endpoint == "game_time_to_beats":
+            game_id = int(where.group(2)) if where else 0
+            return [{"id": game_id, "game_id": game_id, "hastily": 18000, "normally": 36000, "completely": 90000}]
+        if search:
+            return [self.game(search.group(1).replace('\\"', '"'))][:limit]
+        if not where:
+            return []
+        field, raw = where.group(1), where.group(2)
+        values = [value.strip().strip('"') for value in raw.strip("()").split(",") if value.strip()]
+        if field == "id":
+            return [self.game(self.name_for(int(value))) for value in values][:limit]
+        if field == "slug":
+            return [self.game(value.replace("-", " ").title()) for value in values][:limit]
+        return []
+
+    async def igdb(self, request):
+        endpoint = request.match_info["endpoint"]
+        failure = await self.gate("igdb", endpoint)
+        if failure is not None:
+            return failure
+        if not request.headers.get("Authorization", "").startswith("Bearer mock-"):
+            return web.json_response({"message": "Authorization Failure"}, status=401)
+        body = await request.text()
+        if endpoint == "multiquery":
+            parts = MULTI_RE.findall(body)
+            if len(parts) > 10:
+                return web.json_response({"message": "too many queries"}, status=400)
+            return web.json_response([
+                {"name": name, "result": self.igdb_query(sub_endpoint, sub_body)}
+                for sub_endpoint, name, sub_body in parts
+            ])
+        return web.json_response(self.igdb_query(endpoint, body))
+
+    async def igdb_image(self, request):
+        failure = await self.gate("igdb_images", request.match_info["size"])
+        if failure is not None:
+            return failure
+        return web.Response(body=cover_png(request.match_info["image_id"]), content_type="image/png")
+
+    # --- CheapShark ---
+
+    def deal(self, game_id):
+        retail = 1999 + (game_id % 5) * 1000
+        # A third of the catalogue is on sale at any time
+        sale = retail // 2 if game_id % 3 == 0 else retail
+        return {"storeID": str(1 + game_id % 7), "dealID": f"deal-{game_id}",
+                "price": f"{sale / 100:.2f}", "retailPrice": f"{retail / 100:.2f}", "savings": "50.0"}
+
+    async def cheapshark_games(self, request):
+        failure = await self.gate("cheapshark", "games")
+        if failure is not None:
+            return failure
+        if "ids" in request.query:
+            ids = [int(value) for value in request.query["ids"].split(",") if value]
+            if len(ids) > 25:
+                return web.json_response({"error": "too many ids"}, status=400)
+            return web.json_response({
+                str(game_id): {"info": {"title": self.name_for(game_id)}, "deals": [self.deal(game_id)]}
+                for game_id in ids
+            })
+        title = request.query.get("title", "")
+        game_id = fake_id(slugify(title))
+        self.names[game_id] = title
+        deal = self.deal(game_id)
+        return web.json_response([{"gameID": str(game_id), "external": title, "cheapest": deal["price"],
+                                   "cheapestDealID": deal["dealID"]}])
+
+    async def cheapshark_deals(self, request):
+        failure = await self.gate("cheapshark", "deals")
+        if failure is not None:
+            return failure
+        game_id = int(request.query.get("id", "deal-0").rsplit("-", 1)[-1])
+        deal = self.deal(game_id)
+        return web.json_response({"gameInfo": {"name": self.name_for(game_id), "storeID": deal["storeID"],
+                                               "salePrice": deal["price"], "retailPrice": deal["retailPrice"]}})
+
+
+def cover_png(image_id, width=264, height=374):
+    """A flat-coloured PNG, different per image id, the size of an IGDB cover_big."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rgb = zlib.crc32(image_id.encode()).to_bytes(4, "big")[:3]
+    rows = b"".join(b"\x00" + rgb * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+def make_app(config=None):
+    state = MockState(config or MockConfig())
+    app = web.Application()
+    app["state"] = state
+    app.router.add_post("/twitch/oauth2/token", state.token)
+    app.router.add_post("/igdb/v4/{endpoint}", state.igdb)
+    app.router.add_get("/igdb/images/{size}/{image_id}.jpg", state.igdb_image)
+    app.router.add_get("/cheapshark/api/1.0/games", state.cheapshark_games)
+    app.router.add_get("/cheapshark/api/1.0/deals", state.cheapshark_deals)
+    return app
+
+
+async def start(config=None, host="127.0.0.1", port=0):
+    """Start the mocks; returns (runner, state, base_url). Port 0 picks a free one."""
+    app = make_app(config)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, app["state"], f"http://{host}:{port}"
+
+
+def env_for(base_url):
+    """Environment that points bot/http_client.py and bot/sales.py at the mocks."""
+    return {
+        "TWITCH_TOKEN_URL": f"{base_url}/twitch/oauth2/token",
+        "IGDB_API": f"{base_url}/igdb/v4",
+        "IGDB_IMAGES": f"{base_url}/igdb/images",
+        "CHEAPSHARK_API": f"{base_url}/cheapshark/api/1.0",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.rate_limit)
+    app = make_app(config)
+    for name, value in env_for(f"http://{args.host}:{args.port}").items():
+        print(f"{name}={value}")
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
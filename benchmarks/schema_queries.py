@@ -0,0 +1,121 @@
+"""Hot-query timings before and after the keys/indexes migration.
+
+Seeds a database at the pre-index schema (migration 2), times the lookups the
+bot and web app run most, migrates to head and times the same lookups again.
+
+    python benchmarks/schema_queries.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gameclub import migrations, rotation  # noqa: E402
+from gameclub.titles import normalize_title  # noqa: E402
+
+USERS = [f"member{i}" for i in range(40)]
+
+
+def seed(conn, rows):
+    migrations.migrate(conn, target=2)
+    random.seed(rows)
+    suggestions = []
+    for i in range(rows):
+        # Mix of the two release date formats older versions of the bot wrote
+        release = "2019-06-01" if i % 2 else str(1559347200 + i)
+        suggestions.append((random.choice(USERS), f"Game Title {i}", "Adventure, RPG", release, "summary " * 20,
+                            f"https://www.igdb.com/games/game-title-{i}"))
+    conn.executemany(
+        "INSERT INTO game_picks (user, game_name, genres, release_date, summary, url) VALUES (?, ?, ?, ?, ?, ?)",
+        suggestions,
+    )
+    # Move a tenth of the library into the archive, like years of weekly picks would
+    conn.execute("INSERT INTO archived_games SELECT * FROM game_picks WHERE id % 10 = 0")
+    conn.execute("DELETE FROM game_picks WHERE id % 10 = 0")
+    conn.execute("INSERT INTO current_game (game_id) VALUES (?)", (rows // 10 * 10,))
+    # All but one member has had a turn, so the old rotation query scans up to that member's first suggestion
+    conn.executemany("INSERT INTO picked_users (user) VALUES (?)", ((u,) for u in USERS[:-1]))
+    conn.commit()
+
+
+def whose_turn(conn):
+    # Everything next_pick does before it writes: the rotation's state, who's waiting and the draw itself
+    mode, seed, cursor, draws = rotation.state(conn, 0)
+    members = rotation.eligible(conn, 0)
+    user, _ = rotation.choose(mode, [row[:4] for row in members], cursor, seed, draws)
+    return next(row[4] for row in members if row[1] == user)
+
+
+def hot_queries(rows, after):
+    """{name: (sql, params) or a callable taking the connection}; each name is the same operation on both schemas."""
+    title = f"Game Title {rows // 2 + 1}"
+    dupe_check = ("SELECT id FROM game_picks WHERE game_name = ?", (title,))
+    if after:
+        # At head every query is scoped to a guild; unadopted rows sit in guild 0
+        return {
+            "suggest: duplicate check": (
+                "SELECT id FROM game_picks WHERE guild_id = 0 AND title_key = ?", (normalize_title(title),)),
+            # The old query answered in one statement; the rotation needs its state and a draw in Python too
+            "pick_next: whose turn": whose_turn,
+            "member's suggestions": (
+                "SELECT id, game_name FROM game_picks WHERE guild_id = 0 AND user = ? ORDER BY id", (USERS[3],)),
+            "web: current game": (
+                "SELECT ag.game_name FROM current_game cg JOIN archived_games ag ON cg.game_id = ag.id "
+                "WHERE cg.guild_id = 0", ()),
+            "archive by id": ("SELECT game_name FROM archived_games WHERE id = ?", (rows // 20 * 10,)),
+        }
+    return {
+        "suggest: duplicate check": dupe_check,
+        "pick_next: whose turn": (
+            "SELECT id FROM game_picks WHERE user NOT IN (SELECT user FROM picked_users) ORDER BY id LIMIT 1", ()),
+        "member's suggestions": ("SELECT id, game_name FROM game_picks WHERE user = ? ORDER BY id", (USERS[3],)),
+        "web: current game": (
+            "SELECT ag.game_name FROM current_game cg JOIN archived_games ag ON cg.game_id = ag.id LIMIT 1", ()),
+        "archive by id": ("SELECT game_name FROM archived_games WHERE id = ?", (rows // 20 * 10,)),
+    }
+
+
+def time_query(conn, query, repeat):
+    run = query if callable(query) else lambda conn: conn.execute(*query).fetchall()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(conn)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+            seed(conn, rows)
+            before = {name: time_query(conn, query, args.repeat)
+                      for name, query in hot_queries(rows, after=False).items()}
+
+            started = time.perf_counter()
+            migrations.migrate(conn)
+            migrate_s = time.perf_counter() - started
+            after = {name: time_query(conn, query, args.repeat)
+                     for name, query in hot_queries(rows, after=True).items()}
+            conn.close()
+
+        print(f"\n{rows:,} rows (migration took {migrate_s:.2f}s)")
+        print(f"  {'query':<28}{'before ms':>12}{'after ms':>12}")
+        for name in before:
+            print(f"  {name:<28}{before[name]:>12.3f}{after[name]:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Search and duplicate-detection latency over a synthetic library.
+
+Seeds a database at head with varied titles, then times full-text search,
+the fuzzy fallback and the pre-IGDB duplicate check the bot runs on !suggest.
+
+    python benchmarks/search.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gameclub import migrations, search  # noqa: E402
+from gameclub.titles import normalize_title  # noqa: E402
+
+WORDS = ("shadow", "legend", "star", "dungeon", "dragon", "witcher", "hollow", "knight", "chrono", "trigger",
+         "dark", "souls", "mass", "effect", "final", "fantasy", "hades", "celeste", "portal", "outer", "wilds")
+GENRES = ("Adventure", "RPG", "Platform", "Puzzle", "Shooter", "Strategy", "Indie", "Simulator")
+# Spread over this many guilds; the timed lookups run in one of them
+GUILDS = 20
+GUILD = 1
+
+
+def seed(conn, rows):
+    migrations.migrate(conn)
+    random.seed(rows)
+    games = []
+    for i in range(rows):
+        name = " ".join(random.sample(WORDS, 3)).title() + f" {i}"
+        summary = " ".join(random.choices(WORDS, k=30))
+        games.append((i % GUILDS, f"member{i % 40}", name, normalize_title(name),
+                      ", ".join(random.sample(GENRES, 2)), summary, f"https://www.igdb.com/games/game-{i}"))
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO game_picks (guild_id, user, game_name, title_key, genres, summary, url) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", games
+    )
+    conn.execute("INSERT INTO archived_games SELECT * FROM game_picks WHERE id % 10 = 0")
+    conn.execute("DELETE FROM game_picks WHERE id % 10 = 0")
+    conn.execute("COMMIT")
+    return [name for guild, _, name, *_ in games if guild == GUILD]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1000  # noqa: E731
+    return pick(0.5), pick(0.95)
+
+
+def time_calls(fn, inputs):
+    samples = []
+    for value in inputs:
+        started = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def typo(name):
+    # Drop one letter, the most common way a title gets mistyped
+    i = random.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"), isolation_level=None)
+        started = time.perf_counter()
+        names = seed(conn, args.rows)
+        seed_s = time.perf_counter() - started
+
+        sample = random.sample(names, min(args.repeat, len(names)))
+        cases = {
+            "search: two words": (lambda text: search.search(conn, GUILD, text),
+                                  [" ".join(random.sample(WORDS, 2)) for _ in range(args.repeat)]),
+            "search: prefix": (lambda text: search.search(conn, GUILD, text),
+                               [random.choice(WORDS)[:4] for _ in sample]),
+            "search: fuzzy fallback": (lambda text: search.search(conn, GUILD, text), [typo(name) for name in sample]),
+            "duplicate: exact title": (lambda text: search.find_duplicate(conn, GUILD, text), sample),
+            "duplicate: typo": (lambda text: search.similar_suggestion(conn, GUILD, text),
+                                [typo(name) for name in sample]),
+            "duplicate: slug": (lambda slug: search.find_duplicate(conn, GUILD, None, slug),
+                                [f"game-{i}" for i in range(50)]),
+        }
+        results = {name: time_calls(fn, inputs) for name, (fn, inputs) in cases.items()}
+        conn.close()
+
+    print(f"\n{args.rows:,} rows (seeded and indexed in {seed_s:.2f}s)")
+    print(f"  {'case':<26}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, (p50, p95) in results.items():
+        print(f"  {name:<26}{p50:>10.3f}{p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,37 @@
 import discord
-from discord.ext import commands, tasks
-import sqlite3
-import aiohttp
+from discord.ext import commands
 import re
 import os
+import signal
+import sys
+import sqlite3
 from dotenv import load_dotenv
 import datetime
+import asyncio
+import io
 import logging
-from discord import Embed, ButtonStyle, ui, Interaction
+import time
+import aiohttp
+from discord import Embed, ButtonStyle, app_commands, ui, Interaction
+
+# The gameclub package is shared with the web app and lives at the repo root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sales import SaleScanner, FAILED, cheapest_deal, format_sale, match_game
+from cache import ResponseCache
+from governor import CircuitOpenError
+from http_client import CHEAPSHARK_API, HttpClient, HttpError, provider_for
+from db import Database
+from scheduler import Scheduler
+from guild_config import GuildConfigCache
+from cover_fetcher import CoverFetcher
+from job_queue import JobQueue, PermanentJobError
+from monitoring import LoopLagMonitor, MetricsServer, update_process_gauges
+from runtime import RuntimeProfile
+from title_index import AUTOCOMPLETE_SECONDS, TitleIndex, choice_label, suggest_value
+import igdb
+from gameclub import enrichment, guilds, jobs, migrations, notify, prices, queries, rotation, search, stats
+from gameclub.metrics import SamplingProfiler, registry
+from gameclub.titles import normalize_title
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.DEBUG if os.getenv("DEBUG") else logging.INFO)
@@ -24,144 +48,447 @@ CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 
-# Channel IDs and Owner ID
-SALES_CHANNEL_ID = 1361774693576868063
-SUGGESTIONS_CHANNEL_ID = 1361756574963728738
-ANNOUNCEMENT_CHANNEL_ID = 1361756466666803471
-OWNER_ID = 174970986934960128
+# Channels and owners are per guild (see !config). The club this bot was first written for
+# keeps its old settings: set GAMECLUB_DEFAULT_GUILD_ID to its guild id and the rows stored
+# before per-guild data existed move there, with this configuration if it has none yet.
+DEFAULT_GUILD_ID = int(os.getenv("GAMECLUB_DEFAULT_GUILD_ID", "0"))
+LEGACY_CONFIG = {
+    "sales_channel_id": 1361774693576868063,
+    "suggestions_channel_id": 1361756574963728738,
+    "announcement_channel_id": 1361756466666803471,
+    "owner_id": 174970986934960128,
+}
+
+# Sale scan tuning (CheapShark asks clients to stay well under a few requests per second)
+SALE_SCAN_CONCURRENCY = int(os.getenv("SALE_SCAN_CONCURRENCY", "8"))
+CHEAPSHARK_RATE = float(os.getenv("CHEAPSHARK_RATE", "4"))
+CHEAPSHARK_BURST = int(os.getenv("CHEAPSHARK_BURST", "4"))
+# Daily sale scan: cron schedule (local time), start jitter and how many chunks to spread it over
+SALE_CHECK_CRON = os.getenv("SALE_CHECK_CRON", "0 12 * * *")
+SALE_CHECK_JITTER = int(os.getenv("SALE_CHECK_JITTER", "120"))
+SALE_CHECK_CHUNKS = int(os.getenv("SALE_CHECK_CHUNKS", "4"))
+SALE_CHECK_WINDOW = int(os.getenv("SALE_CHECK_WINDOW", "1800"))
+# Local Prometheus endpoint; set METRICS_PORT=0 to turn it off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+# A game's price is re-checked once its last check is older than this
+PRICE_STALE_HOURS = float(os.getenv("PRICE_STALE_HOURS", "20"))
 
 # DB 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "../db/gameclub.db")
+DB_PATH = os.getenv("GAMECLUB_DB_PATH", os.path.join(BASE_DIR, "../db/gameclub.db"))
+CACHE_PATH = os.getenv("GAMECLUB_CACHE_PATH", os.path.join(BASE_DIR, "../db/api_cache.db"))
+# Cover art cache, shared with the web app; least recently served images go first past the limit
+COVER_CACHE_DIR = os.getenv("GAMECLUB_COVER_DIR", os.path.join(BASE_DIR, "../db/covers"))
+COVER_CACHE_MB = int(os.getenv("COVER_CACHE_MB", "256"))
+COVER_FETCH_CRON = os.getenv("COVER_FETCH_CRON", "*/15 * * * *")
+# Workers running queued lookups and enrichment
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Gateway intents, caches and sharding (see runtime.RuntimeProfile). Commands are slash commands,
+# also answered when the bot is mentioned; MESSAGE_CONTENT_INTENT=1 (and the privileged intent
+# enabled for the app) keeps plain `!` commands working in servers.
+RUNTIME = RuntimeProfile.from_env()
+# Push the slash command list to Discord at startup; turn off when running several copies
+SYNC_COMMANDS = os.getenv("SYNC_COMMANDS", "1") == "1"
+
+# Shared HTTP client: pooled connections and the IGDB token, opened with the bot
+http_client = HttpClient(CLIENT_ID, CLIENT_SECRET)
+
+# Instrumentation: loop lag, command timings and an on-demand profiler for the loop thread
+COMMAND_SECONDS = registry.histogram("gameclub_command_seconds", "Bot command duration", ("command", "status"))
+lag_monitor = LoopLagMonitor()
+profiler = SamplingProfiler()
+metrics_server = MetricsServer(
+    METRICS_HOST, METRICS_PORT, lag_monitor, profiler, health=lambda: bot.is_ready() and not bot.is_closed(),
+    collect=lambda: update_process_gauges(bot),
+)
+
+
+class GameClubBot(RUNTIME.bot_class):
+    async def setup_hook(self):
+        logger.info("Runtime profile: %s", RUNTIME)
+        version = await db.run(migrations.migrate)
+        logger.info("Database schema at version %d", version)
+        if DEFAULT_GUILD_ID:
+            moved = await db.transaction(adopt_legacy_data)
+            if moved:
+                logger.info("Moved %d games from before per-guild data to guild %d", moved, DEFAULT_GUILD_ID)
+        elif await db.run(guilds.legacy_rows):
+            logger.warning("Games from before per-guild data are unassigned; set GAMECLUB_DEFAULT_GUILD_ID")
+        await guild_configs.load()
+        title_index.load(
+            await db.run(indexed_titles),
+            (game for games in await api_cache.values("igdb_games") for game in games),
+        )
+        logger.info("Indexed %d titles for autocomplete", len(title_index))
+        await http_client.start()
+        scheduler.add(
+            "sale_check", "* * * * *" if DEBUG_MODE else SALE_CHECK_CRON, run_sale_check,
+            jitter=SALE_CHECK_JITTER, chunks=SALE_CHECK_CHUNKS, window=SALE_CHECK_WINDOW, lock="sales",
+        )
+        scheduler.add("cover_fetch", COVER_FETCH_CRON, cover_fetcher.run, jitter=60)
+        await scheduler.start()
+        await job_queue.start()
+        if SYNC_COMMANDS:
+            # Discord keeps the last synced list, so a failed sync only delays command changes
+            try:
+                synced = await self.tree.sync()
+                logger.info("Synced %d slash commands", len(synced))
+            except discord.HTTPException:
+                logger.exception("Couldn't sync slash commands")
+        lag_monitor.start()
+        if METRICS_PORT:
+            await metrics_server.start()
+        # The supervisor and docker stop with SIGTERM; shut down cleanly instead of being killed mid-write
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            pass
+
+    async def on_command_error(self, ctx, error):
+        # Anything a command lets escape still gets an answer, so a slash command is never left hanging
+        inner = error.original if isinstance(error, commands.HybridCommandError) else error
+        if isinstance(inner, (commands.CommandInvokeError, app_commands.CommandInvokeError)):
+            logger.error("Unhandled error in %s", ctx.command, exc_info=inner.original)
+            try:
+                await ctx.send(describe_error(inner.original))
+            except discord.HTTPException:
+                pass
+            return
+        await super().on_command_error(ctx, error)
+
+    async def close(self):
+        await scheduler.stop()
+        await job_queue.stop()
+        await cover_fetcher.stop()
+        await metrics_server.stop()
+        await lag_monitor.stop()
+        await super().close()
+        await http_client.close()
+        await api_cache.close()
+        await db.close()
+        publisher.close()
+
 
 # Bot setup
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = GameClubBot(command_prefix=commands.when_mentioned_or("!"), **RUNTIME.options())
 bot.remove_command("help")
 
 
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+
+@bot.after_invoke
+async def record_command_time(ctx):
+    status = "error" if ctx.command_failed else "ok"
+    COMMAND_SECONDS.observe(time.perf_counter() - ctx.started_at, command=ctx.command.qualified_name, status=status)
+
+
+# Web workers are told about every commit that changed what they show
+publisher = notify.Publisher()
+last_published = None
+
+
+def publish_change(conn):
+    global last_published
+    version = conn.execute("SELECT version FROM data_changes WHERE id = 1").fetchone()[0]
+    if version != last_published:
+        # Versions only grow, so everything past the last notification is what just moved
+        guilds = conn.execute(
+            "SELECT guild_id, version FROM guild_changes WHERE version > ?", (last_published or version - 1,)
+        ).fetchall()
+        last_published = version
+        publisher.publish(version, guilds)
+
+
 # SQLite setup
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
-c.execute('''
-CREATE TABLE IF NOT EXISTS game_picks (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user TEXT,
-    game_name TEXT,
-    genres TEXT,
-    release_date TEXT,
-    summary TEXT,
-    url TEXT
-)
-''')
-c.execute(
-'''CREATE TABLE IF NOT EXISTS current_game (
-    id INTEGER PRIMARY KEY,
-    game_id INTEGER,
-    FOREIGN KEY (game_id) REFERENCES game_picks(id)
-);
-''')
-c.execute('''CREATE TABLE IF NOT EXISTS archived_games AS
-SELECT * FROM game_picks WHERE 0;
-''')
-c.execute('''
-CREATE TABLE IF NOT EXISTS picked_users (
-    user TEXT PRIMARY KEY
-)
-''')
-conn.commit()
+db = Database(DB_PATH, on_change=publish_change)
+
+# Background jobs; last runs persist in the database
+scheduler = Scheduler(db)
 
-# Global token cache
-access_token = None
+# Per-guild channels and owners, cached for the life of the process
+guild_configs = GuildConfigCache(db)
+
+cover_fetcher = CoverFetcher(db, http_client, COVER_CACHE_DIR, COVER_CACHE_MB * 1024 * 1024)
+
+# IGDB lookups and enrichment run here; commands answer first and edit their messages once done
+job_queue = JobQueue(db, concurrency=JOB_WORKERS)
+# Suggestion previews waiting on a click, held so the tasks aren't garbage collected
+background_tasks = set()
+
+GAME_COLUMNS = ", ".join(migrations.GAME_COLUMNS)
+
+# IGDB / CheapShark response cache
+api_cache = ResponseCache(CACHE_PATH)
+# Titles behind slash command autocomplete; filled at startup and as games are suggested, picked or looked up
+title_index = TitleIndex()
 
 # --- Utility Functions ---
+def adopt_legacy_data(c):
+    moved = guilds.adopt_legacy(c, DEFAULT_GUILD_ID)
+    c.execute("INSERT OR IGNORE INTO guild_config (guild_id) VALUES (?)", (DEFAULT_GUILD_ID,))
+    # Only fill settings the guild hasn't chosen itself
+    for field, value in LEGACY_CONFIG.items():
+        c.execute(f"UPDATE guild_config SET {field} = ? WHERE guild_id = ? AND {field} IS NULL", (value, DEFAULT_GUILD_ID))
+    return moved
+
+def indexed_titles(c):
+    # Picks first, so a game suggested again after being picked shows as suggested
+    return c.execute('''
+        SELECT game_name, slug, release_ts, guild_id, 'picked', user FROM archived_games
+        UNION ALL
+        SELECT game_name, slug, release_ts, guild_id, 'suggested', user FROM game_picks
+    ''').fetchall()
+
+def guild_channel(guild_id, setting):
+    channel_id = guild_configs.get(guild_id)[setting]
+    return bot.get_channel(channel_id) if channel_id else None
+
 def is_in_suggestions_channel():
-    return commands.check(lambda ctx: ctx.channel.id == SUGGESTIONS_CHANNEL_ID)
-
-def is_owner():
-    return commands.check(lambda ctx: ctx.author.id == OWNER_ID)
-
-async def get_igdb_token():
-    global access_token
-    if access_token:
-        return access_token
-    url = "https://id.twitch.tv/oauth2/token"
-    logger.debug("Requesting new IGDB token")
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, data={
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "grant_type": "client_credentials"
-        }) as resp:
-            data = await resp.json()
-            access_token = data["access_token"]
-            logger.info("Received new IGDB token")
-            return access_token
-
-async def query_igdb(game_name):
-    logger.debug(f"Querying IGDB for: {game_name}")
-    token = await get_igdb_token()
-    headers = {"Client-ID": CLIENT_ID, "Authorization": f"Bearer {token}"}
-    query = f'''fields name, platforms.name, genres.name, summary, url, first_release_date; search "{game_name}"; limit 1;'''
-    async with aiohttp.ClientSession() as session:
-        async with session.post("https://api.igdb.com/v4/games", headers=headers, data=query) as resp:
-            result = await resp.json()
-            logger.debug(f"IGDB response: {result}")
-            return result
-
-async def query_cheapshark_deal(deal_id):
-    logger.debug(f"Querying CheapShark deal ID: {deal_id}")
-    url = f"https://www.cheapshark.com/api/1.0/deals?id={deal_id}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            result = await resp.json()
-            logger.debug(f"CheapShark deal response: {result}")
-            return result
-
-async def run_sale_check():
-    logger.info("Running manual sale check")
-    channel = bot.get_channel(SALES_CHANNEL_ID)
-    if not channel:
-        logger.warning("Sales channel not found")
+    # Anywhere in the guild until a suggestions channel is configured
+    def predicate(ctx):
+        channel_id = guild_configs.get(ctx.guild.id)["suggestions_channel_id"] if ctx.guild else None
+        return channel_id is None or ctx.channel.id == channel_id
+    return commands.check(predicate)
+
+def is_club_admin():
+    """The guild's configured club owner, anyone who can manage the guild, or the bot's owner."""
+    async def predicate(ctx):
+        if ctx.guild is None:
+            return False
+        if ctx.author.id == guild_configs.get(ctx.guild.id)["owner_id"]:
+            return True
+        permissions = getattr(ctx.author, "guild_permissions", None)
+        return bool(permissions and permissions.manage_guild) or await ctx.bot.is_owner(ctx.author)
+    return commands.check(predicate)
+
+# `interactive` lookups have someone waiting on them and are hedged (see HttpClient.hedged)
+async def lookup_igdb_game(query_type, query_value, interactive=True):
+    async def fetch():
+        where = f"where slug = {igdb.quote(query_value)};" if query_type == "slug" else f"search {igdb.quote(query_value)};"
+        return await http_client.igdb("games", f"fields {igdb.GAME_FIELDS}; {where} limit 1;", hedge=interactive)
+
+    results = await api_cache.get_or_fetch("igdb_games", f"{query_type}:{query_value}", fetch)
+    title_index.add_games(results)
+    return results
+
+async def lookup_pick_enrichment(igdb_id, interactive=True):
+    # Time-to-beat, platforms, storefronts and similar games in a single multiquery round trip
+    async def fetch():
+        return igdb.parse_multiquery(
+            await http_client.igdb("multiquery", igdb.enrichment_query(igdb_id), hedge=interactive)
+        )
+
+    return await api_cache.get_or_fetch("igdb_enrichment", f"v2:{igdb_id}", fetch)
+
+async def lookup_cheapest_price(name, cheapshark_id=None, interactive=True):
+    # Older rows that were never scanned still need one title search to find their id
+    if not cheapshark_id:
+        async def search():
+            return await http_client.get_json(f"{CHEAPSHARK_API}/games", params={"title": name, "limit": 5},
+                                              hedge=interactive)
+
+        cheapshark_id = match_game(name, await api_cache.get_or_fetch("cheapshark_games", f"title:{name}", search))
+        if not cheapshark_id:
+            return None
+
+    async def fetch():
+        return await http_client.get_json(f"{CHEAPSHARK_API}/games", params={"ids": cheapshark_id}, hedge=interactive)
+
+    data = await api_cache.get_or_fetch("cheapshark_games", f"ids:{cheapshark_id}", fetch)
+    return cheapest_deal(data.get(str(cheapshark_id))) if data else None
+
+async def enrich_game(igdb_id, name=None, cheapshark_id=None, interactive=True):
+    """Fetch and store a game's IGDB details, and its best current price when `name` is given."""
+    results, price = await asyncio.gather(
+        lookup_pick_enrichment(igdb_id, interactive) if igdb_id else asyncio.sleep(0, None),
+        lookup_cheapest_price(name, cheapshark_id, interactive) if name else asyncio.sleep(0, None),
+    )
+    details = {}
+    if results is not None:
+        details = igdb.enrichment_columns(results)
+        await db.run(enrichment.save, igdb_id, details)
+    return details, price
+
+def format_hours(seconds):
+    return f"~{round(seconds / 3600)} hours" if seconds else "Unknown"
+
+def format_price(price_data):
+    if not price_data:
+        return "Unknown — Check link"
+    return (
+        f"[${price_data['sale_cents'] / 100:.2f} here]"
+        f"(https://www.cheapshark.com/redirect?dealID={price_data['deal_id']})"
+    )
+
+def suggestion_embed(game, details=None, price=None, pending=False):
+    """Preview of a suggestion from its game_picks columns, plus enrichment once there is some."""
+    summary = game["summary"] or "No summary provided."
+    embed = discord.Embed(
+        title=game["game_name"],
+        url=game["url"],
+        description=summary[:300] + ("..." if len(summary) > 300 else ""),
+        color=discord.Color.blurple()
+    )
+    embed.add_field(name="Genres", value=game["genres"] or "N/A", inline=False)
+    release_date = "Unknown"
+    if game["release_ts"] is not None:
+        release_date = datetime.datetime.utcfromtimestamp(game["release_ts"]).strftime("%Y-%m-%d")
+    embed.add_field(name="Release Date", value=release_date, inline=False)
+    platforms = game["platforms"] or (details or {}).get("platforms")
+    if platforms:
+        embed.add_field(name="Platforms", value=platforms, inline=False)
+    if details:
+        if details["ttb_normally"]:
+            embed.add_field(name="Time to Beat", value=format_hours(details["ttb_normally"]), inline=True)
+        if details["stores"]:
+            embed.add_field(name="Stores", value=" · ".join(f"[{store}]({url})" for store, url in details["stores"]),
+                            inline=False)
+        if details["similar"]:
+            embed.add_field(name="Similar Games", value=", ".join(details["similar"]), inline=False)
+    if price:
+        embed.add_field(name="Price", value=format_price(price), inline=True)
+    if game["cover_id"]:
+        embed.set_thumbnail(url=f"https://images.igdb.com/igdb/image/upload/t_cover_big/{game['cover_id']}.jpg")
+    if pending:
+        embed.set_footer(text="Fetching price and details…")
+    return embed
+
+def pick_announcement(user, name, url, platforms, picked_on, details=None, price=None, pending=False):
+    discussion_date = picked_on + datetime.timedelta(days=7)
+    return (
+        f"🎮 **Game Pick:**\n"
+        f"**Selected By:** {user}\n"
+        f"**Game:** [{name}]({url})\n"
+        f"**Price:** {'Looking up…' if pending else format_price(price)}\n"
+        f"**Platforms:** {platforms or 'Unknown'}\n"
+        f"**Estimated Time to Finish:** {format_hours((details or {}).get('ttb_normally'))}\n\n"
+        f"**Play Period:** {picked_on.strftime('%B %d')} → {discussion_date.strftime('%B %d')}\n"
+        f"We'll meet for discussion on **{discussion_date.strftime('%B %d')}** — time TBA."
+    )
+
+async def edit_job_message(payload, **fields):
+    """Edit the message a job was queued for; None if it's gone, so there's nothing left to update."""
+    channel = bot.get_channel(payload["channel_id"])
+    if channel is None:
+        return None
+    try:
+        return await channel.get_partial_message(payload["message_id"]).edit(**fields)
+    except discord.NotFound:
+        return None
+    except discord.Forbidden as e:
+        raise PermanentJobError(f"can't edit message {payload['message_id']}: {e}")
+
+def provider_problem(e):
+    """What's wrong upstream, in words fit for chat, or None if `e` isn't an API failure."""
+    if isinstance(e, CircuitOpenError):
+        return f"{e.provider} is unavailable right now"
+    if isinstance(e, HttpError) and e.status == 429:
+        return f"{provider_for(e.url)} is rate limiting us"
+    if isinstance(e, HttpError) and e.status >= 500:
+        return f"{provider_for(e.url)} is having problems"
+    if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return "A game database isn't responding"
+    return None
+
+def describe_error(e):
+    problem = provider_problem(e)
+    if problem is None:
+        return "⚠️ Something went wrong; it's been logged."
+    if isinstance(e, CircuitOpenError) and e.retry_in >= 1:
+        return f"⚠️ {problem}; try again in {e.retry_in:.0f}s."
+    return f"⚠️ {problem}; try again in a minute."
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def send_lines(channel, header, lines):
+    # Split long reports across messages to stay under Discord's 2000 character limit
+    message = header
+    for line in lines:
+        if len(message) + len(line) + 1 > 2000:
+            await channel.send(message)
+            message = ""
+        message += "\n" + line if message else line
+    if message:
+        await channel.send(message)
+
+async def run_sale_check(announce_all=False, chunk=0, chunks=1, guild_id=None, channel=None):
+    """Re-price games whose data is stale and announce new or deeper discounts in each guild.
+
+    Covers every guild at once unless `guild_id` is given; a game suggested in several
+    guilds is still fetched once. With `announce_all` (which needs `guild_id`), every
+    game on sale in that guild is listed in `channel`, not just the changes. The
+    scheduler runs this in `chunks` slices of the library spread over a window.
+    """
+    logger.info("Running sale check")
+    stale = await db.run(prices.stale_games, PRICE_STALE_HOURS * 3600, None, None, chunk, chunks, guild_id)
+
+    scanner = SaleScanner(
+        http_client,
+        cache=api_cache,
+        concurrency=SALE_SCAN_CONCURRENCY,
+        rate=CHEAPSHARK_RATE,
+        burst=CHEAPSHARK_BURST,
+    )
+    results = await scanner.scan([(cheapshark_id, name) for _, _, name, cheapshark_id in stale])
+
+    resolved, observations = [], []
+    guild_of = {game_id: game_guild for game_id, game_guild, _, _ in stale}
+    for (game_id, _, _, known_id), (cheapshark_id, observation) in zip(stale, results):
+        if isinstance(cheapshark_id, int) and cheapshark_id != known_id:
+            resolved.append((game_id, cheapshark_id))
+        # Failed lookups stay stale so the next run retries them
+        if observation is not FAILED and cheapshark_id is not FAILED:
+            observations.append((game_id, observation))
+
+    def record(c):
+        prices.set_cheapshark_ids(c, resolved)
+        return prices.record_prices(c, observations)
+
+    alerts = await db.transaction(record)
+    logger.info("Sale scan of %d stale games finished: %s", len(stale), scanner.report())
+    logger.info("API cache stats: %s", api_cache.stats())
+    logger.info("HTTP stats: %s", http_client.stats())
+
+    if announce_all:
+        sales = await db.run(prices.current_sales, guild_id)
+        lines = [format_sale(name, sale, retail, deal_id) for _, name, sale, retail, deal_id in sales]
+        if scanner.failures:
+            await channel.send(f"⚠️ CheapShark couldn't be reached for part of the scan ({scanner.failures} "
+                               f"request{'s' if scanner.failures != 1 else ''} failed); showing the last prices we saw.")
+        if lines:
+            await send_lines(channel, "🛍️ **Current Game Sales:**", lines)
+        else:
+            await channel.send("🔍 No sales found for saved games right now.")
         return
 
-    c.execute("SELECT game_name FROM game_picks")
-    games = c.fetchall()
-    found_sales = []
-
-    async with aiohttp.ClientSession() as session:
-        for (game_name,) in games:
-            logger.debug(f"Checking deals for: {game_name}")
-            search_url = f"https://www.cheapshark.com/api/1.0/games?title={game_name}&limit=1"
-            async with session.get(search_url) as resp:
-                data = await resp.json()
-                logger.debug(f"CheapShark search result: {data}")
-                if data:
-                    deal_id = data[0].get("cheapestDealID")
-                    if deal_id:
-                        deal_data = await query_cheapshark_deal(deal_id)
-                        if "gameInfo" in deal_data:
-                            info = deal_data["gameInfo"]
-                            sale = float(info.get("salePrice", 0))
-                            retail = float(info.get("retailPrice", 0))
-                            title = info.get("name", game_name)
-                            if sale < retail:
-                                discount = round((1 - sale / retail) * 100)
-                                found_sales.append(
-                                    f"💸 **{title}** is on sale! **${sale}** (was ${retail}, {discount}% off)\n"
-                                    f"👉 [Buy here](https://www.cheapshark.com/redirect?dealID={deal_id})"
-                                )
-
-    if found_sales:
-        await channel.send("🛍️ **Today's Game Sales:**\n" + "\n".join(found_sales))
-    else:
-        await channel.send("🔍 No sales found for saved games today.")
+    by_guild = {}
+    for game_id, alert, obs in alerts:
+        by_guild.setdefault(guild_of[game_id], []).append(
+            format_sale(obs["name"], obs["sale_cents"], obs["retail_cents"], obs["deal_id"], deeper=alert == "deeper")
+        )
+    if not by_guild:
+        logger.info("No new or deeper discounts")
+    for game_guild, lines in by_guild.items():
+        sales_channel = guild_channel(game_guild, "sales_channel_id")
+        if not sales_channel:
+            logger.warning("No sales channel for guild %d; %d sales not announced", game_guild, len(lines))
+            continue
+        await send_lines(sales_channel, "🛍️ **New Game Sales:**", lines)
 
 
 # # --- Commands --- 
-@bot.command(name="help")
+@bot.hybrid_command(name="help", description="List the bot's commands.")
 async def help_command(ctx):
+    # Admin and owner commands aren't slash commands; they answer when the bot is mentioned
+    mention = f"@{ctx.me.display_name} "
     embed = discord.Embed(
         title="Bot Help",
         description="List of commands:",
@@ -171,7 +498,7 @@ async def help_command(ctx):
     embed.add_field(
         name="🎮 Game Suggestions",
         value=(
-            "`!suggest <game name or IGDB URL>` – Suggest a game for the club.\n"
+            "`/suggest <game name or IGDB URL>` – Suggest a game for the club; titles autocomplete as you type.\n"
             "You'll get a preview to confirm or cancel before it's added."
         ),
         inline=False
@@ -180,8 +507,11 @@ async def help_command(ctx):
     embed.add_field(
         name="🗃️ Viewing Suggestions",
         value=(
-            "`!listgames` – View all currently suggested games.\n"
-            "`!listpastgames` – View games that have been picked in the past."
+            "`/listgames` – View all currently suggested games.\n"
+            "`/listpastgames` – View games that have been picked in the past.\n"
+            "`/search <text>` – Search titles, genres and summaries of current and past games.\n"
+            "`/pricehistory <game>` – Show how a saved game's price has moved.\n"
+            "`/stats` – Club totals, top genres and platforms, and who suggests the most."
         ),
         inline=False
     )
@@ -189,8 +519,18 @@ async def help_command(ctx):
     embed.add_field(
         name="🎲 Game Selection",
         value=(
-            "`!pick_next` – (Owner only) Picks the next game from the queue using round-robin.\n"
-            "Automatically announces it and updates the site."
+            "`/pick_next` – (Club admins) Picks the next game from the queue using round-robin.\n"
+            "Automatically announces it and updates the site.\n"
+            "`/upcoming [n]` – Show whose turn is next and which game they'd bring.\n"
+            "`/defer` – Sit out the next pick; you go straight after it.\n"
+            "`/skip` – (Club admins) Pass over whoever is up next without picking their game.\n"
+            f"`{mention}rotation [mode|weight|audit]` – (Club admins) Show or change how turns are drawn.\n"
+            f"`{mention}config [setting] [value]` – (Club admins) Show or set this server's sales, suggestions "
+            "and announcement channels and club owner.\n"
+            f"`{mention}backfill_igdb` – (Owner only) Fills in IGDB ids, covers and platforms for older entries.\n"
+            f"`{mention}profile start|stop` – (Owner only) Sample where the bot spends its time.\n"
+            f"`{mention}jobs [retry [id]]` – (Owner only) Show the background job queue or re-queue failed jobs.\n"
+            f"`{mention}apistatus` – (Owner only) Show IGDB and CheapShark health, rate limits and circuit breakers."
         ),
         inline=False
     )
@@ -198,7 +538,7 @@ async def help_command(ctx):
     embed.add_field(
         name="💸 Game Sales",
         value=(
-            "`!sales` – Manually check for sales on currently suggested games.\n"
+            "`/sales` – Manually check for sales on currently suggested games.\n"
             "This also runs daily at noon automatically."
         ),
         inline=False
@@ -230,6 +570,8 @@ class SuggestionView(ui.View):
         self.result = "accept"
         await interaction.response.defer()
         await self.disable_buttons()
+        # Without this view.wait() sits out the whole timeout even after the click
+        self.stop()
 
     @ui.button(label="❌ Cancel", style=ButtonStyle.danger)
     async def cancel_button(self, interaction: Interaction, button: ui.Button):
@@ -237,272 +579,751 @@ class SuggestionView(ui.View):
             await interaction.response.send_message("You can't cancel someone else's suggestion.", ephemeral=True)
             return
         self.result = "cancel"
+        self.stop()
         await interaction.message.delete()
         await interaction.channel.send("❌ Suggestion cancelled.")
 
 
-@bot.command(name="suggest")
+@bot.hybrid_command(name="suggest", description="Suggest a game for the club.")
+@app_commands.rename(input_name="game")
+@app_commands.describe(input_name="Game name or IGDB URL")
+@commands.guild_only()
 # @is_in_suggestions_channel()
 async def suggest_game(ctx, *, input_name: str):
-    logger.info(f"{ctx.author} suggested: {input_name}")
+    logger.info("%s suggested: %s", ctx.author, input_name)
 
     match = re.match(r'https?://www\.igdb\.com/games/([\w\-]+)', input_name.strip())
     query_type = "slug" if match else "search"
     query_value = match.group(1) if match else input_name.strip()
 
-    await ctx.send(f"🔍 Looking up **{query_value}**...")
-
     try:
-        token = await get_igdb_token()
-        headers = {"Client-ID": CLIENT_ID, "Authorization": f"Bearer {token}"}
-
+        # Catch titles we already have before spending an IGDB round trip on them
         if query_type == "slug":
-            igdb_query = f'''
-                fields name, genres.name, summary, url, first_release_date, cover.image_id;
-                where slug = "{query_value}";
-                limit 1;
-            '''
+            duplicate = await db.run(search.find_duplicate, ctx.guild.id, None, query_value)
         else:
-            igdb_query = f'''
-                fields name, genres.name, summary, url, first_release_date, cover.image_id;
-                search "{query_value}";
-                limit 1;
-            '''
+            duplicate = await db.run(search.find_duplicate, ctx.guild.id, query_value)
+        if duplicate:
+            await ctx.send(f"⚠️ **{duplicate['game_name']}** has already been suggested by {duplicate['user']}.")
+            return
+        # A look-alike may well be a different game (a sequel, a remake); the preview asks
+        similar = None
+        if query_type == "search":
+            similar = await db.run(search.similar_suggestion, ctx.guild.id, query_value)
+
+        # The lookup runs on the job queue and turns this message into the preview
+        message = await ctx.send(f"🔍 Looking up **{query_value}**...")
+        await job_queue.enqueue("suggest_lookup", {
+            "guild_id": ctx.guild.id, "channel_id": message.channel.id, "message_id": message.id,
+            "author_id": ctx.author.id, "author_name": ctx.author.name,
+            "query_type": query_type, "query_value": query_value,
+            "similar": similar and {"game_name": similar["game_name"], "user": similar["user"]},
+        })
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post("https://api.igdb.com/v4/games", headers=headers, data=igdb_query) as resp:
-                results = await resp.json()
+    except Exception as e:
+        logger.exception("Error in suggest_game")
+        await ctx.send(describe_error(e))
 
-        if not results:
-            await ctx.send("❌ Game not found on IGDB.")
-            return
 
-        game = results[0]
-        name = game.get("name", "Unknown")
-        summary = game.get("summary") or "No summary provided."
-        genres = ", ".join([g["name"] for g in game.get("genres", [])]) if "genres" in game else "N/A"
+# Autocomplete has to answer within Discord's 3 seconds, so it only reads the in-memory index
+@suggest_game.autocomplete("input_name")
+async def suggest_autocomplete(interaction: Interaction, current: str):
+    with AUTOCOMPLETE_SECONDS.time(command="suggest"):
+        return [
+            app_commands.Choice(name=choice_label(title, own), value=suggest_value(title))
+            for title, own in title_index.matches(interaction.guild_id, current)
+        ]
 
-        release_date = game.get("first_release_date")
-        if isinstance(release_date, int):
-            release_date = datetime.datetime.utcfromtimestamp(release_date).strftime("%Y-%m-%d")
-        else:
-            release_date = "Unknown"
 
-        url = game.get("url", "https://www.igdb.com")
-        url = f"https://www.igdb.com{url}" if url.startswith("/") else url
+async def run_suggest_lookup(payload):
+    try:
+        results = await lookup_igdb_game(payload["query_type"], payload["query_value"])
+    except Exception as e:
+        # The job retries; tell the author why their preview is taking a while
+        problem = provider_problem(e)
+        if problem:
+            await edit_job_message(payload, content=f"⏳ {problem}; still trying to look up **{payload['query_value']}**.")
+        raise
+    if not results:
+        await edit_job_message(payload, content="❌ Game not found on IGDB.")
+        return
 
-        cover_url = None
-        if "cover" in game and game["cover"].get("image_id"):
-            cover_url = f"https://images.igdb.com/igdb/image/upload/t_cover_big/{game['cover']['image_id']}.jpg"
+    game = results[0]
+    name = game.get("name", "Unknown")
+    url = game.get("url", "https://www.igdb.com")
+    release_ts = game.get("first_release_date")
+    suggestion = dict(
+        igdb.game_columns(game),
+        guild_id=payload["guild_id"],
+        user=payload["author_name"],
+        game_name=name,
+        title_key=normalize_title(name),
+        genres=", ".join([g["name"] for g in game.get("genres", [])]) if "genres" in game else "N/A",
+        release_ts=release_ts if isinstance(release_ts, int) else None,
+        summary=game.get("summary") or "No summary provided.",
+        url=f"https://www.igdb.com{url}" if url.startswith("/") else url,
+    )
 
-        c.execute("SELECT id FROM game_picks WHERE game_name = ?", (name,))
-        if c.fetchone():
-            await ctx.send(f"⚠️ **{name}** has already been suggested.")
-            return
+    if await db.fetchone(
+        "SELECT id FROM game_picks WHERE guild_id = ? AND title_key = ? "
+        "UNION ALL SELECT id FROM game_picks WHERE guild_id = ? AND igdb_id = ? LIMIT 1",
+        (payload["guild_id"], suggestion["title_key"], payload["guild_id"], suggestion["igdb_id"]),
+    ):
+        await edit_job_message(payload, content=f"⚠️ **{name}** has already been suggested.")
+        return
 
-        embed = discord.Embed(
-            title=name,
-            url=url,
-            description=summary[:300] + ("..." if len(summary) > 300 else ""),
-            color=discord.Color.blurple()
-        )
-        embed.add_field(name="Genres", value=genres, inline=False)
-        embed.add_field(name="Release Date", value=release_date, inline=False)
-        if cover_url:
-            embed.set_thumbnail(url=cover_url)
-
-        view = SuggestionView(ctx.author.id)
-        preview = await ctx.send(
-            f"📝 {ctx.author.mention} suggested a game — confirm below:",
-            embed=embed,
-            view=view
-        )
-        view.interaction_message = preview
+    content = f"📝 <@{payload['author_id']}> suggested a game — confirm below:"
+    similar = payload.get("similar")
+    if similar:
+        content += (f"\n🤔 Did you mean **{similar['game_name']}**, already suggested by {similar['user']}? "
+                    "Only accept if this is a different game.")
+    view = SuggestionView(payload["author_id"])
+    preview = await edit_job_message(
+        payload,
+        content=content,
+        embed=suggestion_embed(suggestion),
+        view=view,
+    )
+    if preview is None:
+        return
+    view.interaction_message = preview
+    # Waiting for the click happens off the queue so a worker isn't held for the whole timeout
+    spawn(confirm_suggestion(view, preview, payload, suggestion))
 
-        await view.wait()
 
-        if view.result == "cancel":
-            return
+async def confirm_suggestion(view, preview, payload, suggestion):
+    await view.wait()
+    if view.result == "cancel":
+        return
 
-        # If accepted or timeout
-        c.execute('''
-            INSERT INTO game_picks (user, game_name, genres, release_date, summary, url)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (ctx.author.name, name, genres, release_date, summary, url))
-        conn.commit()
+    # If accepted or timeout
+    try:
+        try:
+            game_id = await db.execute('''
+                INSERT INTO game_picks (guild_id, user, game_name, title_key, genres, release_ts, summary, url,
+                                        igdb_id, cover_id, platforms, slug, suggested_at)
+                VALUES (:guild_id, :user, :game_name, :title_key, :genres, :release_ts, :summary, :url,
+                        :igdb_id, :cover_id, :platforms, :slug, :suggested_at)
+            ''', dict(suggestion, suggested_at=int(time.time())))
+        except sqlite3.IntegrityError:
+            # Someone else got the same game in while this preview was open
+            await preview.edit(content=f"⚠️ **{suggestion['game_name']}** has already been suggested.",
+                               embed=None, view=None)
+            return
+        title_index.add(suggestion["game_name"], suggestion["slug"], suggestion["release_ts"],
+                        suggestion["guild_id"], "suggested", suggestion["user"])
 
         await preview.edit(
-            content=f"✅ **[{name}]({url})** successfully added by {ctx.author.mention}!",
-            embed=embed,
+            content=f"✅ **[{suggestion['game_name']}]({suggestion['url']})** successfully added by "
+                    f"<@{payload['author_id']}>!",
+            embed=suggestion_embed(suggestion, pending=True),
             view=None
         )
-
+        await job_queue.enqueue("enrich_suggestion", dict(
+            game_id=game_id, channel_id=payload["channel_id"], message_id=payload["message_id"],
+        ), dedupe_key=f"enrich_suggestion:{game_id}")
+        if suggestion["cover_id"]:
+            cover_fetcher.kick()
     except Exception as e:
-        logger.exception("Error in suggest_game")
-        await ctx.send(f"⚠️ Error: {str(e)}")
+        logger.exception("Error confirming suggestion")
+        await preview.channel.send(describe_error(e))
 
 
-        
-@bot.command(name="pick_next")
-@commands.is_owner()
+async def run_enrich_suggestion(payload):
+    row = await db.fetchone(
+        "SELECT game_name, url, summary, genres, release_ts, igdb_id, cover_id, platforms, cheapshark_id "
+        "FROM game_picks WHERE id = ?", (payload["game_id"],)
+    )
+    if row is None:
+        # Picked or removed before this ran; the pick announcement has the details
+        return
+    suggestion = dict(zip(("game_name", "url", "summary", "genres", "release_ts", "igdb_id", "cover_id",
+                           "platforms", "cheapshark_id"), row))
+    details, price = await enrich_game(suggestion["igdb_id"], suggestion["game_name"], suggestion["cheapshark_id"])
+    await edit_job_message(payload, embed=suggestion_embed(suggestion, details, price))
+
+
+def pick_and_archive(c, guild_id):
+    # The rotation says whose turn it is and which of their suggestions comes up
+    turn = rotation.next_pick(c, guild_id)
+    if not turn:
+        return None
+    _, game_id = turn
+    row = c.execute(f"SELECT {GAME_COLUMNS} FROM game_picks WHERE id = ?", (game_id,)).fetchone()
+
+    # Archive the selected game BEFORE deleting it
+    c.execute(f'''
+        INSERT INTO archived_games ({GAME_COLUMNS}, suggested_at, picked_at)
+        SELECT {GAME_COLUMNS}, suggested_at, ? FROM game_picks WHERE id = ?
+    ''', (int(time.time()), game_id))
+
+    # Set it as the guild's current game
+    c.execute("INSERT OR REPLACE INTO current_game (guild_id, game_id) VALUES (?, ?)", (guild_id, game_id))
+
+    # Remove from suggestions; a trigger moves the member's pointer to their next one
+    c.execute("DELETE FROM game_picks WHERE id = ?", (game_id,))
+    return row
+
+
+@bot.hybrid_command(name="pick_next", description="Pick the next game from the queue and announce it.")
+@commands.guild_only()
+@is_club_admin()
 async def pick_next_game(ctx):
-    logger.info(f"{ctx.author} triggered pick_next_game")
+    logger.info("%s triggered pick_next_game in guild %s", ctx.author, ctx.guild.id)
+    # A slash command must be answered within 3 seconds, even when the announcement goes elsewhere
+    await ctx.defer()
     try:
-        # Find the next game whose user hasn't had a pick yet
-        c.execute("""
-            SELECT id, user, game_name, genres, release_date, summary, url
-            FROM game_picks
-            WHERE user NOT IN (SELECT user FROM picked_users)
-            ORDER BY id
-            LIMIT 1
-        """)
-        row = c.fetchone()
-
-        # If all users have had a pick, reset and try again
-        if not row:
-            c.execute("DELETE FROM picked_users")
-            conn.commit()
-            c.execute("""
-                SELECT id, user, game_name, genres, release_date, summary, url
-                FROM game_picks
-                ORDER BY id
-                LIMIT 1
-            """)
-            row = c.fetchone()
-
+        row = await db.transaction(pick_and_archive, ctx.guild.id)
         if not row:
             await ctx.send("No games left to pick from.")
             return
 
-        game_id, user, name, genres, release_date, summary, url = row
-
-        # Archive the selected game BEFORE deleting it
-        c.execute('''
-            INSERT INTO archived_games (id, user, game_name, genres, release_date, summary, url)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (game_id, user, name, genres, release_date, summary, url))
-
-        # Set it as the current game
-        c.execute("DELETE FROM current_game")
-        c.execute("INSERT INTO current_game (game_id) VALUES (?)", (game_id,))
-
-        # Mark user as picked
-        c.execute("INSERT OR IGNORE INTO picked_users (user) VALUES (?)", (user,))
-
-        # Remove from suggestions
-        c.execute("DELETE FROM game_picks WHERE id = ?", (game_id,))
-        conn.commit()
-
-        # IGDB + CheapShark queries
-        token = await get_igdb_token()
-        headers = {"Client-ID": CLIENT_ID, "Authorization": f"Bearer {token}"}
-        search_query = f'fields id,name; search "{name}"; limit 1;'
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post("https://api.igdb.com/v4/games", headers=headers, data=search_query) as search_resp:
-                search_data = await search_resp.json()
-                game_igdb_id = search_data[0]["id"] if search_data else None
-
-            estimated_hours = "Unknown"
-            if game_igdb_id:
-                ttb_query = f"fields normally; where game_id = {game_igdb_id};"
-                async with session.post("https://api.igdb.com/v4/game_time_to_beats", headers=headers, data=ttb_query) as ttb_resp:
-                    ttb_data = await ttb_resp.json()
-                    if ttb_data and "normally" in ttb_data[0]:
-                        normally_seconds = ttb_data[0]["normally"]
-                        estimated_hours = f"~{round(normally_seconds / 3600)} hours"
-
-            price_str = "Unknown — Check link"
-            price_api = f"https://www.cheapshark.com/api/1.0/games?title={name}&limit=1"
-            async with session.get(price_api) as price_resp:
-                price_data = await price_resp.json()
-                if price_data:
-                    game_price = price_data[0].get("cheapest")
-                    deal_id = price_data[0].get("cheapestDealID")
-                    if game_price and deal_id:
-                        price_str = f"[${game_price} here](https://www.cheapshark.com/redirect?dealID={deal_id})"
-
-        today = datetime.date.today()
-        discussion_date = today + datetime.timedelta(days=7)
-        message = (
-            f"🎮 **Game Pick:**\n"
-            f"**Selected By:** {user}\n"
-            f"**Game:** [{name}]({url})\n"
-            f"**Price:** {price_str}\n"
-            f"**Estimated Time to Finish:** {estimated_hours}\n\n"
-            f"**Play Period:** {today.strftime('%B %d')} → {discussion_date.strftime('%B %d')}\n"
-            f"We'll meet for discussion on **{discussion_date.strftime('%B %d')}** — time TBA."
-        )
+        (game_id, user, name, _, genres, release_ts, summary, url, igdb_id, cover_id, platforms, slug,
+         cheapshark_id, _) = row
+        title_index.add(name, slug, release_ts, ctx.guild.id, "picked", user)
+
+        # Announce straight away with what's stored; price and time to beat are filled in by a job
+        picked_on = datetime.date.today()
+        details = await db.run(enrichment.load, igdb_id) if igdb_id else None
+        message = pick_announcement(user, name, url, platforms, picked_on, details, pending=True)
 
-        announcement_channel = bot.get_channel(ANNOUNCEMENT_CHANNEL_ID)
+        announcement_channel = guild_channel(ctx.guild.id, "announcement_channel_id")
         if announcement_channel:
-            await announcement_channel.send(message)
+            sent = await announcement_channel.send(message)
+            if ctx.interaction:
+                await ctx.send(f"🎲 Picked **{name}**; announced in {announcement_channel.mention}.")
         else:
             logger.warning("Announcement channel not found.")
-            await ctx.send(message)
+            sent = await ctx.send(message)
+
+        await job_queue.enqueue("enrich_pick", dict(
+            game_id=game_id, channel_id=sent.channel.id, message_id=sent.id, picked_on=picked_on.isoformat(),
+        ), dedupe_key=f"enrich_pick:{game_id}")
 
     except Exception as e:
         logger.exception("Error in pick_next_game")
-        await ctx.send(f"⚠️ Error: {str(e)}")
+        await ctx.send(describe_error(e))
 
-# --- Sales Task ---
-@tasks.loop(minutes=1)
-async def daily_sale_check():
-    now = datetime.datetime.now()
-    if DEBUG_MODE or (now.hour == 12 and now.minute == 0):
-        await run_sale_check()
 
-@bot.command(name="listgames")
-async def list_games(ctx):
-    logger.info(f"{ctx.author} requested list of suggested games")
+async def run_enrich_pick(payload):
+    row = await db.fetchone(
+        "SELECT user, game_name, url, igdb_id, platforms, cheapshark_id FROM archived_games WHERE id = ?",
+        (payload["game_id"],),
+    )
+    if row is None:
+        raise PermanentJobError(f"archived game {payload['game_id']} not found")
+    user, name, url, igdb_id, platforms, cheapshark_id = row
+
+    # Rows suggested before IGDB ids were stored still need one search
+    if not igdb_id:
+        search_data = await lookup_igdb_game("search", name)
+        igdb_id = search_data[0]["id"] if search_data else None
+
+    details, price = await enrich_game(igdb_id, name, cheapshark_id)
+    picked_on = datetime.date.fromisoformat(payload["picked_on"])
+    await edit_job_message(
+        payload, content=pick_announcement(user, name, url, platforms or details.get("platforms"), picked_on, details, price)
+    )
+
+
+@bot.hybrid_command(name="upcoming", description="Show whose turn is next and which game they'd bring.")
+@commands.guild_only()
+@app_commands.describe(count="How many turns to show (up to 20)")
+async def upcoming_picks(ctx, count: int = 5):
+    count = max(1, min(count, 20))
+    try:
+        picks = await db.run(rotation.upcoming, ctx.guild.id, count)
+        if not picks:
+            await ctx.send("No games left to pick from.")
+            return
+        lines = [f"{i}. **{user}** – {name}" for i, (user, _, name) in enumerate(picks, start=1)]
+        await ctx.send("🔜 Up next:\n" + "\n".join(lines), allowed_mentions=discord.AllowedMentions.none())
+    except Exception as e:
+        logger.exception("Error in upcoming_picks")
+        await ctx.send(describe_error(e))
+
+
+@bot.hybrid_command(name="skip", description="Pass over whoever is up next without picking their game.")
+@commands.guild_only()
+@is_club_admin()
+async def skip_turn(ctx):
     try:
-        c.execute("SELECT user, game_name FROM game_picks ORDER BY id")
-        rows = c.fetchall()
-        if not rows:
-            await ctx.send("📭 No games have been suggested yet.")
+        turn = await db.transaction(rotation.skip, ctx.guild.id)
+        if not turn:
+            await ctx.send("No one is waiting for a turn.")
             return
+        logger.info("%s skipped %s's turn in guild %s", ctx.author, turn[0], ctx.guild.id)
+        await ctx.send(f"⏭️ Skipped **{turn[0]}**'s turn.", allowed_mentions=discord.AllowedMentions.none())
+    except Exception as e:
+        logger.exception("Error in skip_turn")
+        await ctx.send(describe_error(e))
+
+
+@bot.hybrid_command(name="defer", description="Sit out the next pick; you go straight after it.")
+@commands.guild_only()
+async def defer_turn(ctx):
+    try:
+        await db.transaction(rotation.defer, ctx.guild.id, ctx.author.name)
+    except rotation.RotationError:
+        await ctx.send("⚠️ You need a suggestion in the queue to have a turn.")
+        return
+    await ctx.send(f"⏳ {ctx.author.mention} will sit out the next pick.")
 
-        msg_lines = [f"**{user}**: {game}" for user, game in rows]
-        chunks = [msg_lines[i:i + 20] for i in range(0, len(msg_lines), 20)]
 
-        for chunk in chunks:
-            await ctx.send("\n".join(chunk))
+@bot.command(name="rotation")
+@commands.guild_only()
+@is_club_admin()
+async def rotation_command(ctx, action: str = None, *args):
+    try:
+        if action == "mode" and len(args) in (1, 2):
+            seed = int(args[1]) if len(args) == 2 else None
+            await db.transaction(rotation.set_mode, ctx.guild.id, args[0], seed)
+        elif action == "weight" and len(args) == 2:
+            member = await commands.MemberConverter().convert(ctx, args[0])
+            await db.transaction(rotation.set_weight, ctx.guild.id, member.name, float(args[1]))
+        elif action == "audit":
+            checked, problems = await db.run(rotation.verify, ctx.guild.id)
+            await ctx.send(f"🔍 Replayed {checked} draws: " + (
+                "all match." if not problems else f"{len(problems)} problems:\n" + "\n".join(
+                    f"• {f'event {event_id}' if event_id else 'now'}: {problem}" for event_id, problem in problems[:10]
+                )
+            ), allowed_mentions=discord.AllowedMentions.none())
+            return
+        elif action is not None:
+            await ctx.send(f"⚠️ Usage: `{ctx.clean_prefix}rotation [mode <round_robin|weighted|random> [seed] | weight <@member> <n> | audit]`")
+            return
+    except (rotation.RotationError, ValueError, commands.BadArgument) as e:
+        await ctx.send(f"⚠️ {e}")
+        return
+
+    mode, seed, _, draws = await db.transaction(rotation.state, ctx.guild.id)
+    members = await db.run(rotation.eligible, ctx.guild.id)
+    lines = [f"{position}. **{user}**" + (f" (weight {weight:g})" if mode == "weighted" else "")
+             + (" – deferred" if deferred_until > draws else "")
+             for position, user, weight, deferred_until, _ in members]
+    await ctx.send(
+        f"🔄 Mode **{mode}** (seed {seed}), {draws} draws so far.\n" + ("\n".join(lines) or "No one is waiting."),
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
+
+
+@bot.command(name="profile")
+@commands.is_owner()
+async def profile_command(ctx, action: str = "status"):
+    if action == "start":
+        started = profiler.start()
+        await ctx.send("🔬 Profiler started." if started else "🔬 Profiler is already running.")
+    elif action == "stop":
+        if not profiler.stop():
+            await ctx.send("🔬 Profiler isn't running.")
+            return
+        lines = [f"`{share:6.1%}` {frame}" for frame, share in profiler.top(10)]
+        await ctx.send(
+            f"🔬 {profiler.samples} samples. Hottest frames:\n" + "\n".join(lines),
+            file=discord.File(io.BytesIO(profiler.collapsed().encode()), filename="profile.collapsed"),
+        )
+    else:
+        await ctx.send(f"🔬 Profiler is {'running' if profiler.running else 'stopped'}. Use `{ctx.clean_prefix}profile start|stop`.")
+
+
+async def queue_enrichment_backfill():
+    # Details (time to beat, stores, similar games) come from the queue, behind interactive work
+    return await job_queue.enqueue_many("enrich_game", [
+        ({"igdb_id": igdb_id}, f"enrich_game:{igdb_id}") for igdb_id in await db.run(enrichment.missing)
+    ], priority=jobs.PRIORITY_BACKFILL)
+
+
+@bot.command(name="backfill_igdb")
+@commands.is_owner()
+async def backfill_igdb(ctx):
+    logger.info("%s triggered IGDB backfill", ctx.author)
+    rows = []
+    for table in ("game_picks", "archived_games"):
+        rows += [(table, *row) for row in await db.fetchall(f"""
+            SELECT id, game_name, url, igdb_id FROM {table}
+            WHERE igdb_id IS NULL OR cover_id IS NULL OR platforms IS NULL OR slug IS NULL
+        """)]
+
+    if not rows:
+        queued = await queue_enrichment_backfill()
+        await ctx.send(f"✅ Every game already has its IGDB data; queued details for {queued} games.")
+        return
+
+    await ctx.send(f"🔧 Backfilling IGDB data for {len(rows)} games...")
+    try:
+        requests = 0
+        by_id, by_slug, by_name = {}, {}, {}
+        fields = f"fields {igdb.GAME_FIELDS};"
+
+        # Known ids and slugs resolve in batches of up to 500 per request
+        ids = sorted({igdb_id for _, _, _, _, igdb_id in rows if igdb_id})
+        for batch in igdb.chunked(ids, igdb.RESULT_LIMIT):
+            where = ", ".join(str(igdb_id) for igdb_id in batch)
+            results = await http_client.igdb("games", f"{fields} where id = ({where}); limit {igdb.RESULT_LIMIT};")
+            by_id.update((game["id"], game) for game in results)
+            requests += 1
+
+        slugs = sorted({igdb.slug_from_url(url) for _, _, _, url, igdb_id in rows if not igdb_id} - {None})
+        for batch in igdb.chunked(slugs, igdb.RESULT_LIMIT):
+            where = ", ".join(igdb.quote(slug) for slug in batch)
+            results = await http_client.igdb("games", f"{fields} where slug = ({where}); limit {igdb.RESULT_LIMIT};")
+            by_slug.update((game["slug"], game) for game in results)
+            requests += 1
+
+        # Anything left needs a name search; pack those ten to a multiquery
+        names = sorted({
+            name for _, _, name, url, igdb_id in rows
+            if not igdb_id and igdb.slug_from_url(url) not in by_slug
+        })
+        for batch in igdb.chunked(names, igdb.MULTIQUERY_MAX):
+            body = igdb.multiquery([
+                ("games", str(i), f"{fields} search {igdb.quote(name)}; limit 1;")
+                for i, name in enumerate(batch)
+            ])
+            results = igdb.parse_multiquery(await http_client.igdb("multiquery", body))
+            by_name.update((name, results[str(i)][0]) for i, name in enumerate(batch) if results.get(str(i)))
+            requests += 1
+
+        def apply_updates(c):
+            updated = 0
+            for table, row_id, name, url, igdb_id in rows:
+                game = by_id.get(igdb_id) or by_slug.get(igdb.slug_from_url(url)) or by_name.get(name)
+                if not game:
+                    continue
+                columns = igdb.game_columns(game)
+                c.execute(f'''
+                    UPDATE {table}
+                    SET igdb_id = COALESCE(igdb_id, ?), cover_id = COALESCE(cover_id, ?),
+                        platforms = COALESCE(platforms, ?), slug = COALESCE(slug, ?)
+                    WHERE id = ?
+                ''', (columns["igdb_id"], columns["cover_id"], columns["platforms"], columns["slug"], row_id))
+                updated += 1
+            return updated
+
+        updated = await db.transaction(apply_updates)
+
+        queued = await queue_enrichment_backfill()
+
+        await ctx.send(f"✅ Backfilled {updated} of {len(rows)} games in {requests} IGDB requests; "
+                       f"queued details for {queued} games.")
+    except Exception as e:
+        logger.exception("Error in backfill_igdb")
+        await ctx.send(describe_error(e))
+
+class GameListView(ui.View):
+    """Pages through suggestions or the archive 20 at a time, fetching each page on demand."""
+
+    PAGE_SIZE = 20
+
+    def __init__(self, author_id, guild_id, source, order, timeout=120):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.guild_id = guild_id
+        self.source = source
+        self.order = order
+        self.cursors = [None]  # start cursor of every page seen so far
+        self.index = 0
+        self.next_cursor = None
+        self.message = None
+
+    async def load(self):
+        page = await db.run(
+            queries.page_games, self.guild_id, self.source, None, None, "id", self.order,
+            self.cursors[self.index], self.PAGE_SIZE, "user,game_name",
+        )
+        self.next_cursor = page["next"]
+        self.previous_button.disabled = self.index == 0
+        self.next_button.disabled = self.next_cursor is None
+        lines = [f"**{row['user']}**: {row['game_name']}" for row in page["items"]]
+        if lines and (self.index or self.next_cursor):
+            lines.append(f"-# Page {self.index + 1}")
+        return "\n".join(lines)
+
+    async def interaction_check(self, interaction: Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Run the command yourself to browse the list.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        if self.message:
+            await self.message.edit(view=None)
+
+    @ui.button(label="◀ Previous", style=ButtonStyle.secondary)
+    async def previous_button(self, interaction: Interaction, button: ui.Button):
+        self.index -= 1
+        await interaction.response.edit_message(content=await self.load(), view=self)
+
+    @ui.button(label="Next ▶", style=ButtonStyle.secondary)
+    async def next_button(self, interaction: Interaction, button: ui.Button):
+        if self.index + 1 == len(self.cursors):
+            self.cursors.append(self.next_cursor)
+        self.index += 1
+        await interaction.response.edit_message(content=await self.load(), view=self)
+
+
+async def send_game_list(ctx, source, order, empty_message):
+    view = GameListView(ctx.author.id, ctx.guild.id, source, order)
+    content = await view.load()
+    if not content:
+        await ctx.send(empty_message)
+        return
+    # A single page doesn't need buttons
+    if view.next_cursor is None:
+        await ctx.send(content)
+        return
+    view.message = await ctx.send(content, view=view)
+
+
+@bot.hybrid_command(name="listgames", description="View all currently suggested games.")
+@commands.guild_only()
+async def list_games(ctx):
+    logger.info("%s requested list of suggested games", ctx.author)
+    try:
+        await send_game_list(ctx, "games", "asc", "📭 No games have been suggested yet.")
     except Exception as e:
         logger.exception("Error in list_games")
-        await ctx.send(f"⚠️ Error retrieving game list: {str(e)}")
+        await ctx.send(describe_error(e))
         
         
-@bot.command(name="listpastgames")
+@bot.hybrid_command(name="listpastgames", description="View games that have been picked in the past.")
+@commands.guild_only()
 async def list_archived_games(ctx):
-    logger.info(f"{ctx.author} requested list of archived games")
+    logger.info("%s requested list of archived games", ctx.author)
     try:
-        c.execute("SELECT user, game_name FROM archived_games ORDER BY id DESC")
-        rows = c.fetchall()
+        await send_game_list(ctx, "archive", "desc", "📦 No archived games yet.")
+    except Exception as e:
+        logger.exception("Error in list_archived_games")
+        await ctx.send(describe_error(e))
 
-        if not rows:
-            await ctx.send("📦 No archived games yet.")
-            return
 
-        msg_lines = [f"**{user}**: {game}" for user, game in rows]
-        chunks = [msg_lines[i:i + 20] for i in range(0, len(msg_lines), 20)]
+@bot.hybrid_command(name="search", description="Search titles, genres and summaries of current and past games.")
+@commands.guild_only()
+@app_commands.describe(text="Words from a title, genre or summary")
+async def search_games(ctx, *, text: str):
+    logger.info("%s searched for: %s", ctx.author, text)
+    try:
+        results = await db.run(search.search, ctx.guild.id, text, 10)
+        if not results:
+            await ctx.send(f"🔍 Nothing matches **{text}**.")
+            return
 
-        for chunk in chunks:
-            await ctx.send("\n".join(chunk))
+        message = ""
+        for result in results:
+            where = "suggested" if result["source"] == "games" else "picked"
+            line = f"**[{result['game_name']}]({result['url']})** — {where} by {result['user']}"
+            if result.get("snippet"):
+                line += f"\n> {result['snippet']}"
+            # Stay under Discord's 2000 character message limit
+            if len(message) + len(line) > 1900:
+                break
+            message += line + "\n"
+        await ctx.send(message, suppress_embeds=True)
     except Exception as e:
-        logger.exception("Error in list_archived_games")
-        await ctx.send(f"⚠️ Error retrieving archived games: {str(e)}")
+        logger.exception("Error in search_games")
+        await ctx.send(describe_error(e))
 
 
-@bot.command(name="sales")
+@bot.hybrid_command(name="sales", description="Check for sales on currently suggested games.")
+@commands.guild_only()
 async def checksales(ctx):
-    logger.info(f"{ctx.author} manually triggered sales check")
-    await run_sale_check()
+    logger.info("%s manually triggered sales check", ctx.author)
+    lock = scheduler.lock("sales")
+    if lock.locked():
+        await ctx.send("⏳ A sale scan is already running; results will follow once it finishes.")
+    elif ctx.interaction:
+        # The scan can outlast the 3 seconds a slash command has to answer
+        await ctx.send("🔎 Checking prices...")
+    try:
+        # Shares the scheduled scan's lock so the two never hit CheapShark at once
+        async with lock:
+            channel = guild_channel(ctx.guild.id, "sales_channel_id") or ctx.channel
+            await run_sale_check(announce_all=True, guild_id=ctx.guild.id, channel=channel)
+    except Exception as e:
+        logger.exception("Error in checksales")
+        await ctx.send(describe_error(e))
+
+
+@bot.hybrid_command(name="pricehistory", description="Show how a saved game's price has moved.")
+@commands.guild_only()
+@app_commands.describe(game="A suggested or picked game")
+async def price_history(ctx, *, game: str):
+    logger.info("%s requested price history for: %s", ctx.author, game)
+    try:
+        matches = await db.run(search.fuzzy_titles, ctx.guild.id, game, 1)
+        if not matches:
+            await ctx.send(f"⚠️ No saved game matches **{game}**.")
+            return
+        match = matches[0]
+        daily = await db.run(prices.daily_prices, match["id"])
+        if not daily:
+            await ctx.send(f"📉 No price history for **{match['game_name']}** yet.")
+            return
+
+        lows = [row["min_cents"] for row in daily]
+        latest = daily[-1]
+        await ctx.send(
+            f"📈 **{match['game_name']}** over the last {len(daily)} checked days\n"
+            f"`{prices.spark_text(lows)}`\n"
+            f"Low **${min(lows) / 100:.2f}** · High ${max(row['max_cents'] for row in daily) / 100:.2f} · "
+            f"Now ${latest['close_cents'] / 100:.2f} (retail ${latest['retail_cents'] / 100:.2f})"
+        )
+    except Exception as e:
+        logger.exception("Error in price_history")
+        await ctx.send(describe_error(e))
+
+
+@price_history.autocomplete("game")
+async def price_history_autocomplete(interaction: Interaction, current: str):
+    with AUTOCOMPLETE_SECONDS.time(command="pricehistory"):
+        return [
+            app_commands.Choice(name=choice_label(title, own), value=title.name[:100])
+            for title, own in title_index.matches(interaction.guild_id, current, own_only=True)
+        ]
+
+
+def format_tags(tags):
+    return "\n".join(f"**{tag['name']}** – {tag['suggested']} suggested, {tag['picked']} picked" for tag in tags) or "None yet."
+
+
+@bot.hybrid_command(name="stats", description="Club totals, top genres and platforms, and who suggests the most.")
+@commands.guild_only()
+async def stats_command(ctx):
+    try:
+        overview = await db.run(stats.overview, ctx.guild.id, 5)
+        totals = overview["totals"]
+        embed = discord.Embed(title="📊 Club Stats", color=discord.Color.teal())
+        summary = [f"{totals['suggested']} games suggested, {totals['picked']} picked, {totals['waiting']} waiting"]
+        if totals["avg_wait_days"] is not None:
+            summary.append(f"Picked games waited **{totals['avg_wait_days']} days** on average "
+                           f"({totals['waits_known']} with known dates)")
+        if totals["avg_ttb_hours"] is not None:
+            summary.append(f"Average time to beat of picked games: **{totals['avg_ttb_hours']} hours**")
+        embed.description = "\n".join(summary)
+        embed.add_field(name="🏷️ Top Genres", value=format_tags(overview["genres"]), inline=False)
+        embed.add_field(name="🖥️ Top Platforms", value=format_tags(overview["platforms"]), inline=False)
+        embed.add_field(name="🙋 Top Suggesters", value="\n".join(
+            f"**{member['user']}** – {member['suggested']} suggested, {member['picked']} picked"
+            for member in overview["members"]
+        ) or "None yet.", inline=False)
+        await ctx.send(embed=embed)
+    except Exception as e:
+        logger.exception("Error in stats_command")
+        await ctx.send(describe_error(e))
+
+
+# !config name -> (guild_config column, what the value is)
+CONFIG_SETTINGS = {
+    "sales": ("sales_channel_id", "channel"),
+    "suggestions": ("suggestions_channel_id", "channel"),
+    "announcements": ("announcement_channel_id", "channel"),
+    "owner": ("owner_id", "user"),
+}
+
+
+def format_setting(kind, value):
+    if value is None:
+        return "not set"
+    return f"<#{value}>" if kind == "channel" else f"<@{value}>"
+
+
+@bot.command(name="config")
+@commands.guild_only()
+@is_club_admin()
+async def config_command(ctx, setting: str = None, *, value: str = None):
+    config = guild_configs.get(ctx.guild.id)
+    if setting is None:
+        lines = [f"**{name}**: {format_setting(kind, config[field])}" for name, (field, kind) in CONFIG_SETTINGS.items()]
+        await ctx.send(
+            "⚙️ Settings for this server:\n" + "\n".join(lines)
+            + f"\nChange one with `{ctx.clean_prefix}config <setting> <#channel|@user|none>`.",
+            allowed_mentions=discord.AllowedMentions.none(),
+        )
+        return
+    if setting not in CONFIG_SETTINGS or value is None:
+        await ctx.send(f"⚠️ Usage: `{ctx.clean_prefix}config <{'|'.join(CONFIG_SETTINGS)}> <#channel|@user|none>`")
+        return
+
+    field, kind = CONFIG_SETTINGS[setting]
+    if value.strip().lower() == "none":
+        new_value = None
+    else:
+        # Mentions arrive as <#id>, <@id> or <@!id>; a bare id works too
+        match = re.fullmatch(r"<(?:#|@!?)(\d+)>|(\d+)", value.strip())
+        if not match:
+            await ctx.send(f"⚠️ Expected a {kind} mention or id, got `{value}`.")
+            return
+        new_value = int(match.group(1) or match.group(2))
+        if kind == "channel" and ctx.guild.get_channel(new_value) is None:
+            await ctx.send("⚠️ That channel isn't in this server.")
+            return
+
+    await guild_configs.update(ctx.guild.id, **{field: new_value, "name": ctx.guild.name})
+    logger.info("%s set %s to %s in guild %s", ctx.author, setting, new_value, ctx.guild.id)
+    await ctx.send(f"✅ **{setting}** is now {format_setting(kind, new_value)}.",
+                   allowed_mentions=discord.AllowedMentions.none())
+
+
+@bot.command(name="jobs")
+@commands.is_owner()
+async def jobs_command(ctx, action: str = None, job_id: int = None):
+    if action == "retry":
+        retried = await db.run(jobs.retry, job_id)
+        job_queue.wake.set()
+        await ctx.send(f"🔁 Re-queued {retried} dead job{'s' if retried != 1 else ''}.")
+        return
+
+    counts = await db.run(jobs.counts)
+    lines = [f"**{state}** {kind}: {count}" for (state, kind), count in sorted(counts.items())]
+    for dead_id, kind, attempts, error, updated_at in await db.run(jobs.dead, 5):
+        lines.append(f"💀 #{dead_id} {kind} after {attempts} attempts, <t:{updated_at}:R>: `{(error or '')[:120]}`")
+    await ctx.send("🧰 Job queue:\n" + ("\n".join(lines) or "Empty.")
+                   + f"\nRe-queue dead jobs with `{ctx.clean_prefix}jobs retry [id]`.")
+
+
+@bot.command(name="apistatus")
+@commands.is_owner()
+async def api_status(ctx):
+    icons = {"closed": "🟢", "half-open": "🟡", "open": "🔴"}
+    lines = []
+    for provider, status in http_client.status().items():
+        counts = status["counts"]
+        line = (f"{icons[status['state']]} **{provider}** {status['state']} · limit {status['limit']}/"
+                f"{status['max_limit']} · {status['in_flight']} in flight · p95 {status['p95_ms'] or '–'} ms · "
+                f"{counts.get('ok', 0)} ok, {counts.get('failed', 0)} failed, {counts.get('throttled', 0)} throttled, "
+                f"{counts.get('rejected', 0)} failed fast")
+        if status["retry_in"]:
+            line += f" · probing in {status['retry_in']}s"
+        if status["paused_for"]:
+            line += f" · rate limited for {status['paused_for']}s"
+        if status["last_error"]:
+            line += f"\n  last error: `{status['last_error'][:150]}`"
+        lines.append(line)
+    stale = {endpoint: stats["stale"] for endpoint, stats in api_cache.stats().items()
+             if endpoint != "entries" and stats["stale"]}
+    if stale:
+        lines.append("📦 Stale cache answers served: " + ", ".join(f"{endpoint} {count}" for endpoint, count in stale.items()))
+    await send_lines(ctx, "🌐 **API status:**", lines or ["No API calls since startup."])
+
+
+async def run_enrich_game(payload):
+    await enrich_game(payload["igdb_id"], interactive=False)
+
+
+job_queue.register("suggest_lookup", run_suggest_lookup)
+job_queue.register("enrich_suggestion", run_enrich_suggestion)
+job_queue.register("enrich_pick", run_enrich_pick)
+job_queue.register("enrich_game", run_enrich_game)
+
+
+@bot.event
+async def on_guild_join(guild):
+    logger.info("Joined guild %s (%s)", guild.name, guild.id)
+    await guild_configs.update(guild.id, name=guild.name)
 
 
 @bot.event
 async def on_ready():
-    logger.info(f"Logged in as {bot.user}")
-    if not daily_sale_check.is_running():
-        daily_sale_check.start()
+    logger.info("Logged in as %s", bot.user)
 
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":
+    bot.run(DISCORD_TOKEN)
@@ -0,0 +1,201 @@
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+from db import Database
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.cache")
+
+LOOKUPS = registry.counter("gameclub_cache_lookups_total", "API cache lookups by endpoint", ("endpoint", "result"))
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Game metadata barely changes once released; prices move daily
+DEFAULT_TTLS = {
+    "igdb_games": 7 * DAY,
+    "igdb_enrichment": 30 * DAY,
+    "cheapshark_games": HOUR,
+    "cheapshark_deals": HOUR,
+}
+
+MISSING = object()
+
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", str(query)).strip().lower()
+
+
+def _load(conn, key):
+    row = conn.execute("SELECT value, stored_at FROM api_cache WHERE key = ?", (key,)).fetchone()
+    return (row[1], json.loads(row[0])) if row else None
+
+
+def _touch(conn, touched):
+    conn.executemany("UPDATE api_cache SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in touched.items()])
+
+
+def _store(cur, key, endpoint, value, now, touched):
+    """Write one response and the access times of disk hits since the last write; returns rows added."""
+    _touch(cur, touched)
+    cur.execute("UPDATE api_cache SET value = ?, stored_at = ?, accessed_at = ? WHERE key = ?", (value, now, now, key))
+    if cur.rowcount:
+        return 0
+    cur.execute(
+        "INSERT INTO api_cache (key, endpoint, value, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+        (key, endpoint, value, now, now),
+    )
+    return 1
+
+
+def _evict(conn, keep):
+    conn.execute('''
+        DELETE FROM api_cache WHERE key IN (
+            SELECT key FROM api_cache ORDER BY accessed_at LIMIT max(0, (SELECT COUNT(*) FROM api_cache) - ?)
+        )
+    ''', (keep,))
+    return conn.execute("SELECT COUNT(*) FROM api_cache").fetchone()[0]
+
+
+def _stale(conn, key):
+    row = conn.execute("SELECT value FROM api_cache WHERE key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else MISSING
+
+
+def _values(conn, endpoint):
+    rows = conn.execute("SELECT value FROM api_cache WHERE endpoint = ?", (endpoint,)).fetchall()
+    return [json.loads(value) for (value,) in rows]
+
+
+class ResponseCache:
+    """API response cache: an in-memory LRU in front of a size-bounded SQLite table.
+
+    The table has its own file and its own database thread, so a lookup that misses
+    memory waits on SQLite without blocking the event loop.
+    """
+
+    def __init__(self, path, ttls=None, max_entries=20000, memory_entries=512):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+        self.stale = {}
+        # Access times of disk hits, written with the next store rather than a commit per hit
+        self.touched = {}
+
+        # Created at import, before there's an event loop to block
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS api_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_api_cache_accessed ON api_cache (accessed_at)")
+        conn.commit()
+        self.size = conn.execute("SELECT COUNT(*) FROM api_cache").fetchone()[0]
+        conn.close()
+        self.db = Database(path)
+
+    def _key(self, endpoint, query):
+        return f"{endpoint}:{normalize_query(query)}"
+
+    def _fresh(self, endpoint, stored_at, now):
+        return now - stored_at < self.ttls.get(endpoint, HOUR)
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _count(self, counter, endpoint, result):
+        counter[endpoint] = counter.get(endpoint, 0) + 1
+        LOOKUPS.inc(endpoint=endpoint, result=result)
+
+    async def get(self, endpoint, query, default=None):
+        key = self._key(endpoint, query)
+        now = time.time()
+
+        entry = self.memory.get(key, MISSING)
+        if entry is MISSING:
+            entry = await self.db.run(_load, key) or MISSING
+            if entry is not MISSING:
+                self.touched[key] = now
+
+        if entry is not MISSING and self._fresh(endpoint, entry[0], now):
+            self._remember(key, entry)
+            self._count(self.hits, endpoint, "hit")
+            return entry[1]
+
+        self.memory.pop(key, None)
+        self._count(self.misses, endpoint, "miss")
+        return default
+
+    async def set(self, endpoint, query, value):
+        key = self._key(endpoint, query)
+        now = time.time()
+        self._remember(key, (now, value))
+        touched, self.touched = self.touched, {}
+        self.size += await self.db.transaction(_store, key, endpoint, json.dumps(value), now, touched)
+        if self.size > self.max_entries:
+            # Trim an extra 10% so we aren't evicting on every insert once full
+            before = self.size
+            self.size = await self.db.run(_evict, int(self.max_entries * 0.9))
+            logger.debug("Evicted %d cache entries", before - self.size)
+
+    async def get_stale(self, endpoint, query, default=None):
+        """An entry past its TTL that hasn't been evicted yet, for when the API can't be reached."""
+        value = await self.db.run(_stale, self._key(endpoint, query))
+        if value is MISSING:
+            return default
+        self._count(self.stale, endpoint, "stale")
+        return value
+
+    async def values(self, endpoint):
+        """Every stored response for an endpoint, fresh or not."""
+        return await self.db.run(_values, endpoint)
+
+    async def get_or_fetch(self, endpoint, query, fetch):
+        value = await self.get(endpoint, query, MISSING)
+        if value is MISSING:
+            try:
+                value = await fetch()
+            except Exception as e:
+                # An old answer beats an error while the provider is down
+                value = await self.get_stale(endpoint, query, MISSING)
+                if value is MISSING:
+                    raise
+                logger.warning("Serving stale %s for %r: %s", endpoint, query, e)
+                return value
+            # Don't pin "not found" answers; the title may just be misspelled
+            if value:
+                await self.set(endpoint, query, value)
+        return value
+
+    def stats(self):
+        endpoints = sorted(set(self.hits) | set(self.misses))
+        return {
+            endpoint: {
+                "hits": self.hits.get(endpoint, 0),
+                "misses": self.misses.get(endpoint, 0),
+                "stale": self.stale.get(endpoint, 0),
+            }
+            for endpoint in endpoints
+        } | {"entries": self.size}
+
+    async def close(self):
+        if self.touched:
+            touched, self.touched = self.touched, {}
+            await self.db.run(_touch, touched)
+        await self.db.close()
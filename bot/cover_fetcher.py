@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from governor import CircuitOpenError
+from http_client import IGDB_IMAGES, HttpError
+from gameclub import covers
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.covers")
+
+COVERS_FETCHED = registry.counter("gameclub_covers_fetched_total", "Cover downloads by outcome", ("result",))
+COVERS_EVICTED = registry.counter("gameclub_covers_evicted_total", "Cover images evicted from the disk cache")
+
+# A cover that failed to download isn't tried again for this long
+RETRY_AFTER = 6 * 3600
+
+
+class CoverFetcher:
+    """Downloads covers the site shows into the on-disk cache (gameclub.covers), once each.
+
+    Runs as a scheduled job and is kicked after each suggestion so a new cover shows up
+    within seconds. Decoding and resizing happen in a worker thread.
+    """
+
+    def __init__(self, db, client, root, max_bytes, batch=50, concurrency=4):
+        self.db = db
+        self.client = client
+        self.root = root
+        self.max_bytes = max_bytes
+        self.batch = batch
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.failed = {}  # cover_id -> monotonic time it may be retried
+        self.pending = None
+
+    def kick(self):
+        """Fetch whatever is missing soon, without waiting for it."""
+        if self.pending is None or self.pending.done():
+            self.pending = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.pending is not None:
+            self.pending.cancel()
+            await asyncio.gather(self.pending, return_exceptions=True)
+
+    async def run(self, chunk=0, chunks=1):
+        async with self.lock:
+            now = time.monotonic()
+            self.failed = {cover_id: until for cover_id, until in self.failed.items() if until > now}
+            wanted = await self.db.run(covers.missing, self.batch + len(self.failed))
+            wanted = [cover_id for cover_id in wanted if cover_id not in self.failed][:self.batch]
+            if not wanted:
+                return 0
+            results = await asyncio.gather(*(self.fetch(cover_id) for cover_id in wanted))
+            stored = [result for result in results if result]
+            if stored:
+                await self.db.transaction(self.record, stored)
+
+            evicted = await asyncio.to_thread(covers.evict, self.root, self.max_bytes)
+            if evicted:
+                await self.db.run(covers.forget, evicted)
+                COVERS_EVICTED.inc(len(evicted))
+                logger.info("Evicted %d cover images to stay under %d bytes", len(evicted), self.max_bytes)
+            logger.info("Fetched %d of %d missing covers", len(stored), len(wanted))
+            return len(stored)
+
+    async def fetch(self, cover_id):
+        async with self.semaphore:
+            try:
+                data = await self.client.get_bytes(f"{IGDB_IMAGES}/t_cover_big/{cover_id}.jpg")
+                stored = await asyncio.to_thread(covers.store, self.root, data)
+            except CircuitOpenError:
+                # The image host is down, not this cover; the next run tries it again
+                COVERS_FETCHED.inc(result="skipped")
+                return None
+            except (HttpError, aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
+                logger.warning("Could not cache cover %s: %s", cover_id, e)
+                self.failed[cover_id] = time.monotonic() + RETRY_AFTER
+                COVERS_FETCHED.inc(result="error")
+                return None
+        COVERS_FETCHED.inc(result="ok")
+        return (cover_id,) + stored
+
+    @staticmethod
+    def record(conn, stored):
+        for row in stored:
+            covers.record(conn, *row)
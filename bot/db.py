@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.db")
+
+QUERY_SECONDS = registry.histogram(
+    "gameclub_db_query_seconds", "Time spent running SQLite work on the database thread", ("statement",)
+)
+
+
+def statement_label(sql):
+    # Bounded label: statements are static strings with placeholders
+    return " ".join(sql.split())[:80]
+
+
+class Database:
+    """SQLite access for the bot, run on one dedicated thread so disk I/O never blocks the event loop.
+
+    Every call gets its own cursor. Statements passed to execute() commit on their own;
+    anything that must be atomic goes through transaction(). `on_change(conn)` runs on the
+    database thread after any call that modified rows.
+    """
+
+    def __init__(self, path, on_change=None):
+        self.path = path
+        self.on_change = on_change
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gameclub-db")
+        self.conn = None
+
+    def _connect(self):
+        # isolation_level=None: no implicit transactions, we BEGIN explicitly
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _call(self, label, fn, args):
+        if self.conn is None:
+            self.conn = self._connect()
+        changes = self.conn.total_changes
+        started = time.perf_counter()
+        try:
+            return fn(self.conn, *args)
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - started, statement=label)
+            if self.on_change is not None and self.conn is not None and self.conn.total_changes != changes:
+                try:
+                    self.on_change(self.conn)
+                except Exception:
+                    logger.exception("on_change hook failed")
+
+    async def _run(self, label, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, label, fn, args)
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) on the database thread."""
+        return await self._run(getattr(fn, "__qualname__", "run"), fn, *args)
+
+    async def execute(self, sql, params=()):
+        def op(conn):
+            cur = conn.execute(sql, params)
+            try:
+                return cur.lastrowid if sql.lstrip().upper().startswith("INSERT") else cur.rowcount
+            finally:
+                cur.close()
+        return await self._run(statement_label(sql), op)
+
+    async def fetchone(self, sql, params=()):
+        def op(conn):
+            cur = conn.execute(sql, params)
+            try:
+                return cur.fetchone()
+            finally:
+                cur.close()
+        return await self._run(statement_label(sql), op)
+
+    async def fetchall(self, sql, params=()):
+        def op(conn):
+            cur = conn.execute(sql, params)
+            try:
+                return cur.fetchall()
+            finally:
+                cur.close()
+        return await self._run(statement_label(sql), op)
+
+    async def transaction(self, fn, *args):
+        """Run fn(cursor, *args) inside BEGIN IMMEDIATE ... COMMIT, rolling back on error."""
+        def op(conn):
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(cur, *args)
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            else:
+                cur.execute("COMMIT")
+                return result
+            finally:
+                cur.close()
+        return await self._run(f"transaction:{getattr(fn, '__qualname__', 'fn')}", op)
+
+    async def close(self):
+        def op():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, op)
+        self.executor.shutdown(wait=True)
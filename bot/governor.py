@@ -0,0 +1,200 @@
+"""Adaptive concurrency and circuit breaking for each third-party API the bot calls.
+
+A Governor caps how many requests may be in flight to one provider. The cap is tuned
+AIMD-style: every successful response raises it by 1/limit, so roughly one more slot per
+round of requests, and a 429, 5xx or timeout halves it, at most once per
+DECREASE_COOLDOWN so a burst of failures from the same moment counts once. Rate-limit
+headers (Retry-After, X-RateLimit-*/RateLimit-*) pause the provider until they reset.
+
+After FAILURE_THRESHOLD consecutive failures the breaker opens and requests fail at once
+with CircuitOpenError instead of each waiting out a timeout. When the open period is over
+a single probe is let through (half-open): success closes the breaker, failure opens it
+again for twice as long, up to MAX_OPEN_SECONDS.
+"""
+import asyncio
+import collections
+import logging
+import time
+
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.http")
+
+CONCURRENCY_LIMIT = registry.gauge("gameclub_api_concurrency_limit", "AIMD concurrency limit per provider", ("provider",))
+CIRCUIT_OPEN = registry.gauge("gameclub_api_circuit_open", "1 while a provider's circuit breaker is open", ("provider",))
+REJECTED = registry.counter("gameclub_api_rejected_total", "Requests failed fast by an open circuit", ("provider",))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+MAX_OPEN_SECONDS = 600
+DECREASE_COOLDOWN = 1.0
+# A rate-limit pause longer than this fails requests instead of holding them
+MAX_PAUSE = 30
+# Hedging waits for the provider's p95 latency, once there are enough samples to know it
+HEDGE_SAMPLES = 20
+HEDGE_DEFAULT = 1.0
+HEDGE_MIN = 0.05
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, provider, retry_in):
+        super().__init__(f"{provider} is unavailable (retry in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def rate_limit_pause(headers, now=None):
+    """Seconds the provider asked us to wait, from Retry-After or an exhausted rate-limit window."""
+    retry_after = headers.get("Retry-After", "")
+    if retry_after.strip().isdigit():
+        return float(retry_after)
+    remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+    reset = headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset"))
+    if remaining is None or reset is None or remaining.strip() != "0":
+        return 0.0
+    try:
+        reset = float(reset)
+    except ValueError:
+        return 0.0
+    # Some providers send the reset as a Unix timestamp rather than seconds from now
+    if reset > 1e9:
+        reset -= now or time.time()
+    return max(0.0, reset)
+
+
+class Governor:
+    def __init__(self, provider, max_limit=8, min_limit=1):
+        self.provider = provider
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiters = set()
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = OPEN_SECONDS
+        self.opened_until = 0.0
+        self.paused_until = 0.0
+        self.probing = False
+        self.last_decrease = 0.0
+        self.last_error = None
+        self.latencies = collections.deque(maxlen=200)
+        self.counts = collections.Counter()
+        CONCURRENCY_LIMIT.set(self.limit, provider=provider)
+        CIRCUIT_OPEN.set(0, provider=provider)
+
+    def capacity(self):
+        return max(self.min_limit, int(self.limit))
+
+    def _reject(self, retry_in):
+        self.counts["rejected"] += 1
+        REJECTED.inc(provider=self.provider)
+        raise CircuitOpenError(self.provider, retry_in)
+
+    async def acquire(self):
+        """Wait for a slot; raises CircuitOpenError while the provider is considered down.
+
+        Returns whether this request is the half-open probe, to be passed back to release().
+        """
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now < self.opened_until:
+                self._reject(self.opened_until - now)
+            self.state = HALF_OPEN
+            logger.info("Probing %s after %ds open", self.provider, self.open_seconds)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                self._reject(1)
+            self.probing = True
+            self.in_flight += 1
+            return True
+
+        pause = self.paused_until - now
+        if pause > MAX_PAUSE:
+            self._reject(pause)
+        if pause > 0:
+            await asyncio.sleep(pause)
+        while self.in_flight >= self.capacity():
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.add(waiter)
+            try:
+                await waiter
+            finally:
+                self.waiters.discard(waiter)
+        self.in_flight += 1
+        return False
+
+    def release(self, outcome, elapsed=None, headers=None, error=None, probe=False):
+        """Record how a request went: "ok", "client_error" (4xx), "throttled" (429), "failed" or "cancelled"."""
+        now = time.monotonic()
+        self.in_flight -= 1
+        if headers is not None:
+            pause = rate_limit_pause(headers)
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+        if outcome != "cancelled":
+            self.counts[outcome] += 1
+            if outcome in ("ok", "client_error"):
+                # A 4xx still means the provider is up and answering
+                if outcome == "ok":
+                    self.latencies.append(elapsed)
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.failures = 0
+                if self.state != CLOSED:
+                    logger.info("%s is answering again; circuit closed", self.provider)
+                    self.state = CLOSED
+                    self.open_seconds = OPEN_SECONDS
+                    CIRCUIT_OPEN.set(0, provider=self.provider)
+            else:
+                self.last_error = error
+                if now - self.last_decrease >= DECREASE_COOLDOWN:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self.last_decrease = now
+                if outcome == "failed":
+                    self.failures += 1
+                if self.state == HALF_OPEN or self.failures >= FAILURE_THRESHOLD:
+                    self._open(now)
+            CONCURRENCY_LIMIT.set(self.limit, provider=self.provider)
+        # Requests from before the circuit opened may still be finishing; only the probe's own ends the probe
+        if probe:
+            self.probing = False
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _open(self, now):
+        if self.state == HALF_OPEN:
+            self.open_seconds = min(MAX_OPEN_SECONDS, self.open_seconds * 2)
+        self.state = OPEN
+        self.opened_until = now + self.open_seconds
+        CIRCUIT_OPEN.set(1, provider=self.provider)
+        logger.warning("%s circuit open for %ds after %d failures (last: %s)",
+                       self.provider, self.open_seconds, self.failures, self.last_error)
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_SAMPLES:
+            return HEDGE_DEFAULT
+        ordered = sorted(self.latencies)
+        return max(HEDGE_MIN, ordered[int(len(ordered) * 0.95)])
+
+    def can_hedge(self):
+        """Whether a duplicate request fits without queueing; hedges never add load to a struggling provider."""
+        return self.state == CLOSED and self.paused_until <= time.monotonic() and self.in_flight < self.capacity()
+
+    def status(self):
+        now = time.monotonic()
+        ordered = sorted(self.latencies)
+        return {
+            "state": self.state,
+            "limit": round(self.limit, 1),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.failures,
+            "retry_in": round(max(0.0, self.opened_until - now)) if self.state == OPEN else 0,
+            "paused_for": round(max(0.0, self.paused_until - now), 1),
+            "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else None,
+            "counts": dict(self.counts),
+            "last_error": self.last_error,
+        }
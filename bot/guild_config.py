@@ -0,0 +1,31 @@
+import logging
+
+from gameclub import guilds
+
+logger = logging.getLogger("gameclub.guild_config")
+
+EMPTY = dict.fromkeys(("name",) + guilds.CONFIG_FIELDS)
+
+
+class GuildConfigCache:
+    """Every guild's settings in memory, loaded once and written through.
+
+    The bot is the only writer of guild_config, so the copy here never goes stale
+    and commands never wait on the database just to find a channel id.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.configs = {}
+
+    async def load(self):
+        self.configs = await self.db.run(guilds.load_configs)
+        logger.info("Loaded settings for %d guilds", len(self.configs))
+
+    def get(self, guild_id):
+        return self.configs.get(guild_id, EMPTY)
+
+    async def update(self, guild_id, **values):
+        await self.db.run(guilds.save_config, guild_id, values)
+        self.configs[guild_id] = dict(self.get(guild_id), **values)
+        return self.configs[guild_id]
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from governor import Governor
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.http")
+
+REQUEST_SECONDS = registry.histogram(
+    "gameclub_http_request_seconds", "Outbound HTTP request latency", ("host", "endpoint", "status")
+)
+HEDGED = registry.counter("gameclub_http_hedged_total", "Duplicate requests sent for slow interactive lookups",
+                          ("provider",))
+
+# Overridable so benchmarks can point the bot at local mocks
+TWITCH_TOKEN_URL = os.getenv("TWITCH_TOKEN_URL", "https://id.twitch.tv/oauth2/token")
+IGDB_API = os.getenv("IGDB_API", "https://api.igdb.com/v4")
+IGDB_IMAGES = os.getenv("IGDB_IMAGES", "https://images.igdb.com/igdb/image/upload")
+CHEAPSHARK_API = os.getenv("CHEAPSHARK_API", "https://www.cheapshark.com/api/1.0")
+
+# Each provider gets its own governor and circuit breaker (see governor.py), matched by URL prefix
+PROVIDERS = (
+    ("Twitch", TWITCH_TOKEN_URL),
+    ("IGDB images", IGDB_IMAGES),
+    ("IGDB", IGDB_API),
+    ("CheapShark", CHEAPSHARK_API),
+)
+
+# Per-host request timeouts in seconds; anything unlisted gets DEFAULT_TIMEOUT
+HOST_TIMEOUTS = {
+    "id.twitch.tv": 10,
+    "api.igdb.com": 10,
+    "images.igdb.com": 30,
+    "www.cheapshark.com": 15,
+}
+DEFAULT_TIMEOUT = 20
+
+
+def provider_for(url):
+    """Display name of the API a URL belongs to; unknown URLs are grouped by host."""
+    return next((name for name, base in PROVIDERS if url.startswith(base)), urlsplit(url).hostname)
+
+
+class HttpError(Exception):
+    def __init__(self, status, url, retry_after=None):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+
+class LatencyStats:
+    def __init__(self):
+        self.samples = []
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        count = len(self.samples)
+        return {
+            "count": count,
+            "mean_ms": round(sum(self.samples) / count * 1000, 1) if count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "max_ms": round(max(self.samples) * 1000, 1) if count else 0.0,
+        }
+
+
+class TwitchToken:
+    """IGDB app access token that refreshes itself ahead of expiry."""
+
+    def __init__(self, client, client_id, client_secret, refresh_margin=300):
+        self.client = client
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.value = None
+        self.expires_at = 0.0
+        self._refresh = None
+
+    async def get(self):
+        if self.value and time.time() < self.expires_at - self.refresh_margin:
+            return self.value
+        # Every caller that finds the token stale awaits the same refresh
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._fetch())
+            self._refresh.add_done_callback(self._clear_refresh)
+        return await asyncio.shield(self._refresh)
+
+    def _clear_refresh(self, _):
+        self._refresh = None
+
+    async def _fetch(self):
+        logger.debug("Requesting new IGDB token")
+        data = await self.client.request("POST", TWITCH_TOKEN_URL, data={
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials",
+        })
+        self.value = data["access_token"]
+        self.expires_at = time.time() + data.get("expires_in", 3600)
+        logger.info("Received new IGDB token (expires in %ss)", data.get("expires_in"))
+        return self.value
+
+    def invalidate(self, rejected):
+        if self.value == rejected:
+            self.value = None
+            self.expires_at = 0.0
+
+
+class HttpClient:
+    """One pooled aiohttp session shared by the whole bot for its lifetime."""
+
+    def __init__(self, client_id=None, client_secret=None, limit=64, limit_per_host=8,
+                 dns_ttl=300, keepalive=60, timeouts=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeouts = {
+            host: aiohttp.ClientTimeout(total=seconds)
+            for host, seconds in dict(HOST_TIMEOUTS, **(timeouts or {})).items()
+        }
+        self.default_timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        self.token = TwitchToken(self, client_id, client_secret)
+        self.client_id = client_id
+        self.session = None
+        self.latency = {}
+        self.errors = {}
+        self.governors = {}
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive,
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def governor(self, url):
+        provider = provider_for(url)
+        if provider not in self.governors:
+            self.governors[provider] = Governor(provider, max_limit=self.limit_per_host)
+        return self.governors[provider]
+
+    async def request(self, method, url, raw=False, **kwargs):
+        if self.session is None:
+            await self.start()
+        parts = urlsplit(url)
+        host = parts.hostname
+        kwargs.setdefault("timeout", self.timeouts.get(host, self.default_timeout))
+        governor = self.governor(url)
+        probe = await governor.acquire()
+        started = time.monotonic()
+        status = "error"
+        outcome, headers, error = "cancelled", None, None
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                status, headers = resp.status, resp.headers
+                if resp.status >= 400:
+                    raise HttpError(resp.status, url, resp.headers.get("Retry-After"))
+                body = await resp.read() if raw else await resp.json(content_type=None)
+            outcome = "ok"
+            return body
+        except Exception as e:
+            self.errors[host] = self.errors.get(host, 0) + 1
+            if isinstance(e, HttpError) and e.status < 500:
+                outcome = "throttled" if e.status == 429 else "client_error"
+            else:
+                outcome = "failed"
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            governor.release(outcome, elapsed, headers, error, probe)
+            self.latency.setdefault(host, LatencyStats()).record(elapsed)
+            REQUEST_SECONDS.observe(elapsed, host=host, endpoint=parts.path, status=status)
+
+    async def hedged(self, method, url, **kwargs):
+        """Send a request, and a second copy if the first is slower than the provider's usual p95.
+
+        Whichever succeeds first wins and the other is cancelled. Only for idempotent
+        lookups a user is waiting on; the copy is skipped when the provider has no spare
+        capacity, so hedging never piles onto an API that is already struggling.
+        """
+        governor = self.governor(url)
+        tasks = {asyncio.ensure_future(self.request(method, url, **kwargs))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=governor.hedge_delay())
+            if not done and governor.can_hedge():
+                HEDGED.inc(provider=governor.provider)
+                tasks.add(asyncio.ensure_future(self.request(method, url, **kwargs)))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    # A failure only counts once there's nothing left that could still succeed
+                    if task.exception() is None or not tasks:
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_json(self, url, params=None, hedge=False):
+        if hedge:
+            return await self.hedged("GET", url, params=params)
+        return await self.request("GET", url, params=params)
+
+    async def get_bytes(self, url):
+        return await self.request("GET", url, raw=True)
+
+    async def igdb(self, endpoint, query, hedge=False):
+        token = await self.token.get()
+        send = self.hedged if hedge else self.request
+        for attempt in range(2):
+            headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
+            try:
+                return await send("POST", f"{IGDB_API}/{endpoint}", headers=headers, data=query)
+            except HttpError as e:
+                if e.status != 401 or attempt:
+                    raise
+                logger.info("IGDB rejected token, refreshing")
+                self.token.invalidate(token)
+                token = await self.token.get()
+
+    def stats(self):
+        return {
+            host: dict(latency.summary(), errors=self.errors.get(host, 0))
+            for host, latency in self.latency.items()
+        }
+
+    def status(self):
+        """Governor and circuit breaker state per provider, for !apistatus."""
+        return {provider: governor.status() for provider, governor in sorted(self.governors.items())}
@@ -0,0 +1,96 @@
+import re
+from urllib.parse import urlsplit
+
+# IGDB caps: 10 sub-queries per multiquery request, 500 results per query
+MULTIQUERY_MAX = 10
+RESULT_LIMIT = 500
+
+GAME_FIELDS = "id, name, slug, genres.name, platforms.name, summary, url, first_release_date, cover.image_id"
+SLUG_RE = re.compile(r"igdb\.com/games/([\w\-]+)")
+
+
+def quote(value):
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def slug_from_url(url):
+    match = SLUG_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def multiquery(queries):
+    """Build a /v4/multiquery body from (endpoint, name, body) triples."""
+    return "\n".join(
+        f'query {endpoint} "{name}" {{ {body} }};'
+        for endpoint, name, body in queries
+    )
+
+
+def parse_multiquery(response):
+    return {part["name"]: part.get("result", []) for part in response or []}
+
+
+def game_columns(game):
+    """Map an IGDB game record to the igdb_* columns stored on game_picks."""
+    platforms = ", ".join(p["name"] for p in game.get("platforms", []))
+    return {
+        "igdb_id": game.get("id"),
+        "slug": game.get("slug"),
+        "cover_id": (game.get("cover") or {}).get("image_id"),
+        "platforms": platforms or None,
+    }
+
+
+# Storefronts worth linking to, by the host of an IGDB website url
+STORE_HOSTS = {
+    "store.steampowered.com": "Steam",
+    "www.gog.com": "GOG",
+    "gog.com": "GOG",
+    "store.epicgames.com": "Epic Games Store",
+    "itch.io": "itch.io",
+    "www.nintendo.com": "Nintendo eShop",
+    "store.playstation.com": "PlayStation Store",
+    "www.xbox.com": "Xbox",
+    "www.microsoft.com": "Microsoft Store",
+    "www.humblebundle.com": "Humble Store",
+}
+SIMILAR_MAX = 5
+
+
+def store_links(websites):
+    """[(store name, url)] for the storefront links among an IGDB game's websites, one per store."""
+    links = {}
+    for site in websites or []:
+        host = urlsplit(site.get("url", "")).hostname or ""
+        store = STORE_HOSTS.get(host) or ("itch.io" if host.endswith(".itch.io") else None)
+        if store and store not in links:
+            links[store] = site["url"]
+    return list(links.items())
+
+
+def enrichment_query(igdb_id):
+    """Multiquery body for everything enrichment stores about one game."""
+    return multiquery([
+        ("game_time_to_beats", "ttb", f"fields normally, hastily, completely; where game_id = {igdb_id};"),
+        ("games", "game", f"fields platforms.name, websites.url, similar_games.name; where id = {igdb_id};"),
+    ])
+
+
+def enrichment_columns(results):
+    """Map a parsed enrichment multiquery to the game_enrichment columns."""
+    ttb = (results.get("ttb") or [{}])[0]
+    game = (results.get("game") or [{}])[0]
+    platforms = ", ".join(p["name"] for p in game.get("platforms", []))
+    return {
+        "ttb_hastily": ttb.get("hastily"),
+        "ttb_normally": ttb.get("normally"),
+        "ttb_completely": ttb.get("completely"),
+        "platforms": platforms or None,
+        "stores": store_links(game.get("websites")),
+        "similar": [g["name"] for g in game.get("similar_games", [])][:SIMILAR_MAX],
+    }
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+
+from gameclub import jobs
+from gameclub.metrics import registry
+
+logger = logging.getLogger("gameclub.jobs")
+
+JOBS_RUN = registry.counter("gameclub_jobs_total", "Background jobs run, by outcome", ("kind", "result"))
+JOB_SECONDS = registry.histogram("gameclub_job_seconds", "Background job duration", ("kind",))
+
+# Backoff after the queue's own database calls fail, e.g. "database is locked"
+ERROR_BACKOFF = 1.0
+MAX_ERROR_BACKOFF = 60.0
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying can't help; the job goes straight to the dead letters."""
+
+
+class JobQueue:
+    """Runs jobs from the SQLite queue (gameclub.jobs) on a pool of async workers.
+
+    Handlers are coroutines registered per kind and called with the job's payload; raising
+    retries the job later. Jobs survive restarts: any a stop interrupted are queued again
+    at the next start.
+    """
+
+    def __init__(self, db, concurrency=4, poll=30.0):
+        self.db = db
+        self.concurrency = concurrency
+        self.poll = poll
+        self.handlers = {}
+        self.workers = []
+        self.running = 0
+        self.wake = asyncio.Event()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    async def enqueue(self, kind, payload, priority=jobs.PRIORITY_INTERACTIVE, delay=0, max_attempts=5,
+                      dedupe_key=None):
+        job_id = await self.db.run(jobs.enqueue, kind, payload, priority, delay, max_attempts, dedupe_key)
+        self.wake.set()
+        return job_id
+
+    async def enqueue_many(self, kind, items, priority=jobs.PRIORITY_INTERACTIVE):
+        """Queue [(payload, dedupe_key)] in one transaction; returns how many were new."""
+        def add(conn):
+            return sum(jobs.enqueue(conn, kind, payload, priority, dedupe_key=key) is not None for payload, key in items)
+
+        added = await self.db.transaction(add)
+        self.wake.set()
+        return added
+
+    async def start(self):
+        recovered = await self.db.run(jobs.recover)
+        if recovered:
+            logger.info("Re-queued %d jobs interrupted by the last shutdown", recovered)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        for worker in self.workers:
+            worker.add_done_callback(self._worker_done)
+
+    def _worker_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Job worker died; the queue has %d workers left", sum(not w.done() for w in self.workers),
+                         exc_info=task.exception())
+
+    async def stop(self):
+        # Interrupted jobs stay 'running' in the table and are recovered at the next start
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def idle(self):
+        """Whether nothing is running and nothing is due right now."""
+        if self.running:
+            return False
+        next_at = await self.db.run(jobs.next_run_at)
+        return next_at is None or next_at > time.time()
+
+    async def _worker(self):
+        backoff = ERROR_BACKOFF
+        while True:
+            try:
+                # Counted from before the claim, so idle() never sees a claimed job as neither queued nor running
+                self.running += 1
+                try:
+                    job = await self.db.run(jobs.claim)
+                    if job is not None:
+                        await self._run(job)
+                finally:
+                    self.running -= 1
+                if job is None:
+                    await self._sleep()
+                backoff = ERROR_BACKOFF
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job queue error; retrying in %.0fs", backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_ERROR_BACKOFF)
+
+    async def _record(self, fn, *args):
+        # The handler already ran; keep trying to record that rather than leave the job 'running'
+        backoff = ERROR_BACKOFF
+        while True:
+            try:
+                return await self.db.run(fn, *args)
+            except Exception:
+                logger.exception("Couldn't record job %d; retrying in %.0fs", args[0], backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_ERROR_BACKOFF)
+
+    async def _sleep(self):
+        next_at = await self.db.run(jobs.next_run_at)
+        timeout = self.poll if next_at is None else min(self.poll, max(0.0, next_at - time.time()))
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        # Cleared after waking, before the next claim, so an enqueue can't slip between the two
+        self.wake.clear()
+
+    async def _run(self, job):
+        handler = self.handlers.get(job.kind)
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise PermanentJobError(f"no handler for job kind {job.kind!r}")
+            await handler(job.payload)
+        except asyncio.CancelledError:
+            raise
+        except PermanentJobError as e:
+            result = await self._record(jobs.fail, job.id, str(e), True)
+            logger.warning("Job %d (%s) failed permanently: %s", job.id, job.kind, e)
+        except Exception as e:
+            result = await self._record(jobs.fail, job.id, f"{type(e).__name__}: {e}")
+            logger.warning("Job %d (%s) attempt %d/%d failed: %s", job.id, job.kind, job.attempts,
+                           job.max_attempts, e, exc_info=result == "dead")
+        else:
+            await self._record(jobs.complete, job.id)
+            result = "ok"
+        JOBS_RUN.inc(kind=job.kind, result=result)
+        JOB_SECONDS.observe(time.perf_counter() - started, kind=job.kind)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+
+from aiohttp import web
+
+from gameclub.metrics import CONTENT_TYPE, SamplingProfiler, registry
+
+logger = logging.getLogger("gameclub.monitoring")
+
+LOOP_LAG = registry.histogram(
+    "gameclub_event_loop_lag_seconds", "How late a periodic timer fires on the bot's event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+LOOP_LAG_MAX = registry.gauge("gameclub_event_loop_lag_max_seconds", "Worst loop lag since the last scrape")
+RESIDENT_MEMORY = registry.gauge("gameclub_resident_memory_bytes", "Resident set size of the bot process")
+GATEWAY_CACHE = registry.gauge("gameclub_gateway_cache_objects", "Objects held in discord.py's caches", ("kind",))
+
+# Longest on-demand profile the metrics server will take
+MAX_PROFILE_SECONDS = 60
+
+
+def resident_bytes():
+    """Current RSS from /proc; peak RSS from getrusage where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def gateway_cache_sizes(client):
+    return {
+        "guilds": len(client.guilds),
+        "channels": sum(len(guild.channels) for guild in client.guilds),
+        "members": sum(len(guild.members) for guild in client.guilds),
+        "users": len(client.users),
+        "messages": len(client.cached_messages),
+    }
+
+
+def update_process_gauges(client):
+    RESIDENT_MEMORY.set(resident_bytes())
+    for kind, count in gateway_cache_sizes(client).items():
+        GATEWAY_CACHE.set(count, kind=kind)
+
+
+class LoopLagMonitor:
+    """Wakes every `interval` seconds and records how late it was; anything blocking the loop shows up."""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.worst = 0.0
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(lag)
+            self.worst = max(self.worst, lag)
+            LOOP_LAG_MAX.set(self.worst)
+
+    def reset_worst(self):
+        self.worst = 0.0
+
+
+class MetricsServer:
+    """Local HTTP endpoint for /metrics, /healthz and on-demand profiles of the event loop thread.
+
+    Binds to loopback by default; nothing here is meant to be public.
+    """
+
+    def __init__(self, host="127.0.0.1", port=9108, lag_monitor=None, profiler=None, health=None, collect=None):
+        self.host = host
+        self.health = health
+        # Called before each scrape to refresh gauges that are cheaper to read than to track
+        self.collect = collect
+        self.port = port
+        self.lag_monitor = lag_monitor
+        self.profiler = profiler or SamplingProfiler()
+        self.loop_thread = threading.get_ident()
+        self.runner = None
+
+    async def start(self):
+        self.loop_thread = threading.get_ident()
+        app = web.Application()
+        app.router.add_get("/metrics", self.metrics)
+        app.router.add_get("/debug/profile", self.profile)
+        app.router.add_get("/healthz", self.healthz)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info("Metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def metrics(self, request):
+        if self.collect is not None:
+            self.collect()
+        body = registry.render()
+        if self.lag_monitor:
+            self.lag_monitor.reset_worst()
+        return web.Response(body=body.encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def healthz(self, request):
+        if self.health is not None and not self.health():
+            return web.Response(status=503, text="not ready\n")
+        return web.Response(text="ok\n")
+
+    async def profile(self, request):
+        """Sample the event loop for ?seconds=N (default 10) and return collapsed stacks."""
+        try:
+            seconds = min(float(request.query.get("seconds", 10)), MAX_PROFILE_SECONDS)
+        except ValueError:
+            raise web.HTTPBadRequest(text="seconds must be a number")
+        if not self.profiler.start(self.loop_thread):
+            raise web.HTTPConflict(text="a profile is already running")
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.profiler.stop()
+        return web.Response(text=self.profiler.collapsed())
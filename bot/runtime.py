@@ -0,0 +1,93 @@
+import os
+
+import discord
+from discord.ext import commands
+
+PROFILES = ("lean", "full")
+
+
+def _flag(name, default):
+    value = os.getenv(name)
+    return default if value is None else value == "1"
+
+
+class RuntimeProfile:
+    """What the bot asks the gateway for and keeps in memory.
+
+    "lean" (the default) subscribes only to what the commands use: guilds and channels for
+    configuration, and messages so a mention still reaches the prefix commands. It keeps no
+    message cache, caches no members but itself and never requests member chunks. "full" is
+    discord.py's defaults plus message content, as the bot ran before slash commands.
+    Every setting can also be overridden on its own from the environment.
+    """
+
+    def __init__(self, name="lean", sharded=False, shard_count=None, max_messages=None, cache_members=False,
+                 message_content=False, chunk_guilds=False, guild_ready_timeout=2.0):
+        if name not in PROFILES:
+            raise ValueError(f"unknown runtime profile {name!r}; expected one of {', '.join(PROFILES)}")
+        self.name = name
+        self.sharded = sharded
+        self.shard_count = shard_count
+        self.max_messages = max_messages
+        self.cache_members = cache_members
+        self.message_content = message_content
+        self.chunk_guilds = chunk_guilds
+        self.guild_ready_timeout = guild_ready_timeout
+
+    @classmethod
+    def from_env(cls, name=None):
+        name = name or os.getenv("GAMECLUB_RUNTIME_PROFILE", "lean")
+        full = name == "full"
+        shard_count = os.getenv("SHARD_COUNT")
+        return cls(
+            name,
+            # SHARD_COUNT alone implies sharding; without it Discord recommends a count
+            sharded=_flag("GAMECLUB_SHARDED", bool(shard_count)),
+            shard_count=int(shard_count) if shard_count else None,
+            # discord.py reads 0 as "use the default of 1000", so 0 here means no cache at all
+            max_messages=int(os.getenv("MAX_MESSAGES", "1000" if full else "0")) or None,
+            cache_members=_flag("CACHE_MEMBERS", full),
+            message_content=_flag("MESSAGE_CONTENT_INTENT", full),
+            # Chunking needs the privileged members intent, which neither profile asks for
+            chunk_guilds=_flag("CHUNK_GUILDS", False),
+            guild_ready_timeout=float(os.getenv("GUILD_READY_TIMEOUT", "2")),
+        )
+
+    def intents(self):
+        if self.name == "full":
+            intents = discord.Intents.default()
+        else:
+            intents = discord.Intents.none()
+            intents.guilds = True
+            intents.guild_messages = True
+            # Owner commands work in DMs
+            intents.dm_messages = True
+        intents.message_content = self.message_content
+        intents.members = intents.members or self.chunk_guilds
+        return intents
+
+    @property
+    def bot_class(self):
+        return commands.AutoShardedBot if self.sharded else commands.Bot
+
+    def options(self):
+        """Keyword arguments for `bot_class`."""
+        intents = self.intents()
+        options = dict(
+            intents=intents,
+            max_messages=self.max_messages,
+            member_cache_flags=(
+                discord.MemberCacheFlags.from_intents(intents) if self.cache_members else discord.MemberCacheFlags.none()
+            ),
+            chunk_guilds_at_startup=self.chunk_guilds,
+            guild_ready_timeout=self.guild_ready_timeout,
+        )
+        if self.shard_count:
+            options["shard_count"] = self.shard_count
+        return options
+
+    def __str__(self):
+        shards = (f"{self.shard_count} shards" if self.shard_count else "auto-sharded") if self.sharded else "unsharded"
+        return (f"{self.name} ({shards}, intents {self.intents().value}, "
+                f"message cache {self.max_messages or 'off'}, member cache {'on' if self.cache_members else 'off'}, "
+                f"chunking {'on' if self.chunk_guilds else 'off'})")
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from governor import CircuitOpenError
+from http_client import CHEAPSHARK_API, HttpError, LatencyStats
+from igdb import chunked
+from gameclub.prices import cents
+from gameclub.titles import normalize_title
+
+logger = logging.getLogger("gameclub.sales")
+
+# Most ids CheapShark accepts in one games?ids= request
+IDS_PER_REQUEST = 25
+
+# Statuses worth retrying: rate limited or a transient upstream failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Scan result for a lookup that errored, as opposed to None for "not listed"
+FAILED = object()
+
+
+def match_game(game_name, results):
+    """CheapShark id for `game_name` from a games?title= search, preferring an exact title match."""
+    if not results:
+        return None
+    key = normalize_title(game_name)
+    best = next((game for game in results if normalize_title(game.get("external", "")) == key), results[0])
+    return int(best["gameID"])
+
+
+def cheapest_deal(entry):
+    """Observation for one game from a games?ids= response entry, or None if nothing is listed."""
+    deals = (entry or {}).get("deals") or []
+    if not deals:
+        return None
+    deal = min(deals, key=lambda deal: float(deal["price"]))
+    store_id = deal.get("storeID")
+    return {
+        "name": entry.get("info", {}).get("title"),
+        "deal_id": deal["dealID"],
+        "store_id": int(store_id) if store_id and str(store_id).isdigit() else None,
+        "sale_cents": cents(deal["price"]),
+        "retail_cents": cents(deal["retailPrice"]),
+    }
+
+
+def format_sale(name, sale_cents, retail_cents, deal_id, deeper=False):
+    discount = round((1 - sale_cents / retail_cents) * 100)
+    label = "is even cheaper now" if deeper else "is on sale"
+    return (
+        f"💸 **{name}** {label}! **${sale_cents / 100:.2f}** (was ${retail_cents / 100:.2f}, {discount}% off)\n"
+        f"👉 [Buy here](https://www.cheapshark.com/redirect?dealID={deal_id})"
+    )
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def drain(self, seconds):
+        # Called on a 429 so every waiter backs off, not just the one that got it
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SaleScanner:
+    def __init__(self, client, cache=None, concurrency=8, rate=4, burst=None, max_retries=3, backoff=0.5):
+        self.client = client
+        self.cache = cache
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.latency = LatencyStats()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.batches = 0
+        self.elapsed = 0.0
+
+    async def get_json(self, path, params):
+        url = f"{CHEAPSHARK_API}/{path}"
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            started = time.monotonic()
+            self.requests += 1
+            try:
+                result = await self.client.get_json(url, params)
+                self.latency.record(time.monotonic() - started)
+                return result
+            except (HttpError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.latency.record(time.monotonic() - started)
+                status = getattr(e, "status", None)
+                if attempt >= self.max_retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                retry_after = getattr(e, "retry_after", None)
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 0
+                delay = delay or self.backoff * 2 ** attempt
+                if status == 429:
+                    self.bucket.drain(delay)
+                self.retries += 1
+                logger.debug("Retrying %s %s in %.2fs (attempt %d)", path, params, delay, attempt + 1)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+    async def cached_json(self, endpoint, key, path, params):
+        if self.cache is None:
+            return await self.get_json(path, params)
+        return await self.cache.get_or_fetch(endpoint, key, lambda: self.get_json(path, params))
+
+    async def resolve(self, game_name):
+        """CheapShark id for a title, None if it isn't listed, FAILED on error. Done once per game."""
+        async with self.semaphore:
+            try:
+                data = await self.cached_json(
+                    "cheapshark_games", f"title:{game_name}", "games", {"title": game_name, "limit": 5}
+                )
+            except Exception as e:
+                self.failures += 1
+                # No traceback per game while the breaker is open; one line says why
+                logger.warning("CheapShark lookup failed for %s: %s", game_name, e,
+                               exc_info=not isinstance(e, CircuitOpenError))
+                return FAILED
+        return match_game(game_name, data)
+
+    async def refresh(self, ids):
+        """Current cheapest deal for up to IDS_PER_REQUEST games in one request, keyed by id."""
+        async with self.semaphore:
+            try:
+                data = await self.get_json("games", {"ids": ",".join(str(game_id) for game_id in ids)})
+            except Exception as e:
+                self.failures += 1
+                logger.warning("CheapShark refresh failed for %d games: %s", len(ids), e,
+                               exc_info=not isinstance(e, CircuitOpenError))
+                return dict.fromkeys(ids, FAILED)
+        self.batches += 1
+        data = data if isinstance(data, dict) else {}
+        return {game_id: cheapest_deal(data.get(str(game_id))) for game_id in ids}
+
+    async def scan(self, games):
+        """Price [(cheapshark_id or None, name)] pairs.
+
+        Unresolved games are looked up by title first; everything is then refreshed
+        IDS_PER_REQUEST ids at a time. The same game may appear many times (one row per
+        guild); each title and id is still fetched once. Returns [(cheapshark_id, observation)]
+        in the same order, where either may be None (not listed) or FAILED.
+        """
+        started = time.monotonic()
+        ids = [cheapshark_id for cheapshark_id, _ in games]
+        keys = [normalize_title(name) for _, name in games]
+        # A title another guild already resolved needs no search of its own
+        known = {key: cheapshark_id for key, cheapshark_id in zip(keys, ids) if cheapshark_id}
+        titles = {}
+        for i, key in enumerate(keys):
+            if not ids[i] and key not in known:
+                titles.setdefault(key, games[i][1])
+        resolved = await asyncio.gather(*(self.resolve(name) for name in titles.values()))
+        known.update(zip(titles, resolved))
+        for i, key in enumerate(keys):
+            if not ids[i]:
+                ids[i] = known[key]
+
+        wanted = sorted({cheapshark_id for cheapshark_id in ids if isinstance(cheapshark_id, int)})
+        found = {}
+        for batch in await asyncio.gather(*(self.refresh(chunk) for chunk in chunked(wanted, IDS_PER_REQUEST))):
+            found.update(batch)
+        self.elapsed = time.monotonic() - started
+        return [
+            (cheapshark_id, found[cheapshark_id] if isinstance(cheapshark_id, int) else cheapshark_id)
+            for cheapshark_id in ids
+        ]
+
+    def report(self):
+        return {
+            "elapsed_s": round(self.elapsed, 2),
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "batches": self.batches,
+            "latency": self.latency.summary(),
+        }
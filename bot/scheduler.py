@@ -0,0 +1,219 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+
+logger = logging.getLogger("gameclub.scheduler")
+
+# Never sleep longer than this in one go, so wall-clock jumps (DST, suspend) are noticed
+MAX_SLEEP = 3600
+
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+            if step < 1:
+                raise ValueError(f"bad cron step: {step}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"cron value out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in local time.
+
+    Supports *, lists, ranges and steps. Day-of-week is 0-6 from Sunday; 7 is also Sunday.
+    As in cron, when both day fields are restricted a day matching either one counts.
+    """
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expression needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, date):
+        day = date.day in self.days
+        weekday = (date.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, when):
+        """First matching minute strictly after the naive local datetime `when`."""
+        when = when.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = when + datetime.timedelta(days=366 * 5)
+        while when < limit:
+            if when.month not in self.months:
+                year, month = divmod(when.month, 12)
+                when = when.replace(year=when.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(when):
+                when = (when + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif when.hour not in self.hours:
+                when = (when + datetime.timedelta(hours=1)).replace(minute=0)
+            elif when.minute not in self.minutes:
+                when += datetime.timedelta(minutes=1)
+            else:
+                return when
+        raise ValueError(f"cron expression never matches: {self.expr!r}")
+
+    def __repr__(self):
+        return f"CronSchedule({self.expr!r})"
+
+
+def load_runs(conn):
+    return dict(conn.execute("SELECT job, last_run FROM scheduler_runs").fetchall())
+
+
+def save_run(conn, job, last_run, status, duration):
+    conn.execute('''
+        INSERT INTO scheduler_runs (job, last_run, last_status, last_duration) VALUES (?, ?, ?, ?)
+        ON CONFLICT (job) DO UPDATE SET
+            last_run = excluded.last_run, last_status = excluded.last_status, last_duration = excluded.last_duration
+    ''', (job, last_run, status, duration))
+
+
+class Job:
+    def __init__(self, name, schedule, func, jitter=0, chunks=1, window=0, lock=None):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.jitter = jitter
+        self.chunks = max(1, chunks)
+        self.window = window
+        self.lock = lock
+        self.due = None       # epoch seconds of the occurrence being waited for
+        self.run_at = None    # due plus jitter
+        self.running = False
+
+    def plan(self, after):
+        """Schedule the first occurrence after epoch `after`."""
+        occurrence = self.schedule.next_after(datetime.datetime.fromtimestamp(after))
+        self.due = occurrence.timestamp()
+        self.run_at = self.due + random.uniform(0, self.jitter)
+
+
+class Scheduler:
+    """Runs async jobs on cron schedules, sleeping until the next one is due.
+
+    Last runs are kept in the scheduler_runs table, so an occurrence missed while
+    the bot was down runs once at startup. Jobs sharing a lock name never overlap,
+    and code outside the scheduler can take the same lock with `lock(name)`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.jobs = {}
+        self.locks = {}
+        self.tasks = set()
+        self.wake = asyncio.Event()
+        self.loop_task = None
+
+    def lock(self, name):
+        if name not in self.locks:
+            self.locks[name] = asyncio.Lock()
+        return self.locks[name]
+
+    def add(self, name, cron, func, jitter=0, chunks=1, window=0, lock=None):
+        """Register `func(chunk=i, chunks=n)`; with chunks > 1 the chunks start evenly across `window` seconds."""
+        self.jobs[name] = Job(name, CronSchedule(cron), func, jitter, chunks, window, self.lock(lock or name))
+        self.wake.set()
+
+    async def start(self):
+        last_runs = await self.db.run(load_runs)
+        now = time.time()
+        for job in self.jobs.values():
+            last_run = last_runs.get(job.name)
+            if last_run is None:
+                # First start: no backlog to catch up on
+                job.plan(now)
+            else:
+                job.plan(last_run)
+                if job.due <= now:
+                    logger.info("Job %s missed its %s run; catching up", job.name,
+                                datetime.datetime.fromtimestamp(job.due).isoformat(timespec="minutes"))
+                    job.run_at = now + random.uniform(0, job.jitter)
+        self.loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        tasks = list(self.tasks)
+        if self.loop_task:
+            tasks.append(self.loop_task)
+            self.loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            for job in self.jobs.values():
+                if job.due is None:
+                    job.plan(now)
+                if not job.running and job.run_at <= now:
+                    job.running = True
+                    task = asyncio.create_task(self._run(job))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+            waiting = [job.run_at for job in self.jobs.values() if not job.running]
+            delay = min(waiting, default=now + MAX_SLEEP) - now
+            self.wake.clear()
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=min(max(delay, 0), MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job):
+        started = time.monotonic()
+        status = "ok"
+        try:
+            for chunk in range(job.chunks):
+                if chunk:
+                    await asyncio.sleep(job.window / job.chunks)
+                # Held per chunk, so a manual run only ever waits for one chunk
+                async with job.lock:
+                    logger.info("Running job %s (chunk %d/%d)", job.name, chunk + 1, job.chunks)
+                    await job.func(chunk=chunk, chunks=job.chunks)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            status = "error"
+            logger.exception("Job %s failed", job.name)
+        finally:
+            job.running = False
+
+        duration = time.monotonic() - started
+        # Recorded against the occurrence, not the clock, so the next one is computed from the schedule
+        await self.db.run(save_run, job.name, int(job.due), status, round(duration, 3))
+        job.plan(max(job.due, time.time()))
+        logger.info("Job %s finished (%s) in %.1fs; next run %s", job.name, status, duration,
+                    datetime.datetime.fromtimestamp(job.run_at).isoformat(timespec="seconds"))
+        self.wake.set()
+
+    def status(self):
+        return [
+            {"job": job.name, "cron": job.schedule.expr, "running": job.running, "next_run": job.run_at}
+            for job in self.jobs.values()
+        ]
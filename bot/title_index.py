@@ -0,0 +1,140 @@
+import bisect
+import time
+
+from gameclub.metrics import registry
+from gameclub.titles import normalize_title
+
+AUTOCOMPLETE_SECONDS = registry.histogram(
+    "gameclub_autocomplete_seconds", "Slash command autocomplete lookups", ("command",)
+)
+
+# Discord shows at most 25 choices and cuts names and values at 100 characters
+MAX_CHOICES = 25
+MAX_LENGTH = 100
+IGDB_GAME_URL = "https://www.igdb.com/games/"
+
+
+class Title:
+    __slots__ = ("name", "key", "slug", "year")
+
+    def __init__(self, name, key, slug, year):
+        self.name = name
+        self.key = key
+        self.slug = slug
+        self.year = year
+
+
+def year_of(release_ts):
+    return time.gmtime(release_ts).tm_year if isinstance(release_ts, int) else None
+
+
+class TitleIndex:
+    """Game titles in memory for autocomplete: every guild's games plus IGDB results the bot has seen.
+
+    Each title is stored once per word it starts at, in an array kept sorted, so "witcher"
+    finds "The Witcher 3" with a bisect and no query. Titles are added as they are suggested,
+    picked or looked up; nothing is ever rebuilt.
+    """
+
+    def __init__(self):
+        self.words = []  # sorted (normalized title from a word start, title id)
+        self.titles = []  # Title, by id
+        self.ids = {}  # slug or normalized title -> title id
+        self.guilds = {}  # (guild id, title id) -> (state, member) for the guild's own games
+        self.guild_words = {}  # guild id -> sorted words of just that guild's games
+        self.loading = False
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, name, slug=None, release_ts=None, guild_id=None, state=None, user=None):
+        key = normalize_title(name)
+        if not key:
+            return None
+        title_id = self.ids.get(slug) if slug else None
+        if title_id is None:
+            # A game stored before IGDB slugs existed is the same title once its slug turns up,
+            # but two slugs with one name (remakes, reboots) are different games
+            title_id = self.ids.get(key)
+            if title_id is not None and slug and self.titles[title_id].slug not in (None, slug):
+                title_id = None
+        if title_id is None:
+            title_id = len(self.titles)
+            self.titles.append(Title(name, key, slug, year_of(release_ts)))
+            self._insert(self.words, key, title_id)
+        else:
+            title = self.titles[title_id]
+            title.slug = title.slug or slug
+            title.year = title.year or year_of(release_ts)
+        self.ids.setdefault(key, title_id)
+        if slug:
+            self.ids[slug] = title_id
+        if guild_id is not None:
+            if (guild_id, title_id) not in self.guilds:
+                self._insert(self.guild_words.setdefault(guild_id, []), self.titles[title_id].key, title_id)
+            self.guilds[(guild_id, title_id)] = (state, user)
+        return title_id
+
+    def _insert(self, words, key, title_id):
+        for start in [0] + [i + 1 for i, ch in enumerate(key) if ch == " "]:
+            if self.loading:
+                words.append((key[start:], title_id))
+            else:
+                bisect.insort(words, (key[start:], title_id))
+
+    def load(self, games, records=()):
+        """Bulk add (name, slug, release_ts, guild id, state, member) rows and IGDB records, sorting once."""
+        self.loading = True
+        try:
+            for game in games:
+                self.add(*game)
+            self.add_games(records)
+        finally:
+            self.loading = False
+            self.words.sort()
+            for words in self.guild_words.values():
+                words.sort()
+
+    def add_games(self, games):
+        """Index IGDB game records (a lookup's results or a cached response)."""
+        for game in games or ():
+            if game.get("name"):
+                self.add(game["name"], game.get("slug"), game.get("first_release_date"))
+
+    def matches(self, guild_id, text, limit=MAX_CHOICES, own_only=False):
+        """Titles with a word starting with `text`; whole-title prefixes and this guild's games first."""
+        prefix = normalize_title(text)
+        if not prefix:
+            return []
+        # A one-letter prefix can match thousands; ranking a few screens of them is plenty
+        scan = limit * 8
+        found = {}
+        sources = [self.guild_words.get(guild_id, [])] + ([] if own_only else [self.words])
+        for words in sources:
+            i = bisect.bisect_left(words, (prefix,))
+            while i < len(words) and len(found) < scan:
+                word, title_id = words[i]
+                if not word.startswith(prefix):
+                    break
+                i += 1
+                title = self.titles[title_id]
+                own = self.guilds.get((guild_id, title_id))
+                rank = (title.key != word, own is None, len(title.key))
+                if title_id not in found or rank < found[title_id][0]:
+                    found[title_id] = (rank, title, own)
+        ranked = sorted(found.values(), key=lambda match: (match[0], match[1].key))
+        return [(title, own) for _, title, own in ranked[:limit]]
+
+
+def choice_label(title, own=None):
+    label = title.name + (f" ({title.year})" if title.year else "")
+    if own:
+        state, user = own
+        label += f" – {state} by {user}" if user else f" – {state}"
+    return label[:MAX_LENGTH]
+
+
+def suggest_value(title):
+    # An IGDB link makes the lookup exact instead of a second search
+    url = IGDB_GAME_URL + title.slug if title.slug else None
+    return url if url and len(url) <= MAX_LENGTH else title.name[:MAX_LENGTH]
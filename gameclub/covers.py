@@ -0,0 +1,164 @@
+"""On-disk cache of IGDB cover art, shared by the bot (which fills it) and the web app (which serves it).
+
+Files are content-addressed: <root>/<digest[:2]>/<digest>-<size>.<ext>, where digest is the
+SHA-256 of the image IGDB sent. Names never change meaning, so they can be cached forever, and
+ids that point at the same picture share files. With Pillow installed each cover is stored as
+WebP thumbnails in SIZES; without it the original is kept as the only size.
+
+Eviction is least-recently-used by file mtime, which the web app bumps when it serves a file.
+"""
+import hashlib
+import io
+import os
+import re
+import time
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Size name -> width in pixels; IGDB's cover_big (the download) is 264 wide
+SIZES = {"thumb": 90, "card": 180, "big": 264}
+WEBP_QUALITY = 80
+NAME_RE = re.compile(r"^([0-9a-f]{64})-(thumb|card|big)\.(webp|jpg|png)$")
+# Serving bumps a file's mtime at most this often, to keep LRU order without a write per request
+TOUCH_INTERVAL = 3600
+
+
+def file_name(digest, size, ext):
+    return f"{digest}-{size}.{ext}"
+
+
+def file_path(root, name):
+    return os.path.join(root, name[:2], name)
+
+
+def _sniff(data):
+    if data.startswith(b"\x89PNG"):
+        return "png"
+    if data.startswith(b"\xff\xd8"):
+        return "jpg"
+    raise ValueError("not a JPEG or PNG image")
+
+
+def _write(path, data):
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def store(root, data):
+    """Write the sizes for one downloaded image; returns (digest, ext, sizes, bytes written).
+
+    Blocking (disk and, with Pillow, CPU), so the bot runs it in a thread.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    if Image is None:
+        ext = _sniff(data)
+        _write(file_path(root, file_name(digest, "big", ext)), data)
+        return digest, ext, ("big",), len(data)
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        total = 0
+        for size, width in SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((width, width * 2))
+            out = io.BytesIO()
+            variant.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+            _write(file_path(root, file_name(digest, size, "webp")), out.getvalue())
+            total += out.tell()
+    return digest, "webp", tuple(SIZES), total
+
+
+def record(conn, cover_id, digest, ext, sizes, nbytes, now=None):
+    conn.execute('''
+        INSERT OR REPLACE INTO covers (cover_id, digest, ext, sizes, bytes, fetched_at) VALUES (?, ?, ?, ?, ?, ?)
+    ''', (cover_id, digest, ext, ",".join(sizes), nbytes, int(now or time.time())))
+
+
+def missing(conn, limit):
+    """Cover ids shown somewhere but not on disk: current games first, then the newest suggestions."""
+    rows = conn.execute('''
+        SELECT cover_id FROM (
+            SELECT ag.cover_id, 0 AS rank, ag.id FROM current_game cg JOIN archived_games ag ON ag.id = cg.game_id
+            UNION ALL
+            SELECT cover_id, 1, id FROM game_picks
+        )
+        WHERE cover_id IS NOT NULL AND cover_id NOT IN (SELECT cover_id FROM covers)
+        GROUP BY cover_id ORDER BY MIN(rank), MAX(id) DESC LIMIT ?
+    ''', (limit,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def lookup(conn, cover_ids):
+    """{cover_id: {size: file name}} for the ids that are cached; every size in SIZES gets an entry."""
+    cover_ids = list({cover_id for cover_id in cover_ids if cover_id})
+    if not cover_ids:
+        return {}
+    rows = conn.execute(
+        f"SELECT cover_id, digest, ext, sizes FROM covers WHERE cover_id IN ({', '.join('?' * len(cover_ids))})",
+        cover_ids,
+    ).fetchall()
+    found = {}
+    for cover_id, digest, ext, sizes in rows:
+        stored = sizes.split(",")
+        # Missing sizes fall back to the largest one stored
+        found[cover_id] = {
+            size: file_name(digest, size if size in stored else stored[-1], ext) for size in SIZES
+        }
+    return found
+
+
+def touch(path, now=None):
+    now = now or time.time()
+    try:
+        if os.stat(path).st_mtime < now - TOUCH_INTERVAL:
+            os.utime(path, (now, now))
+    except OSError:
+        pass
+
+
+def evict(root, max_bytes, low_water=0.9):
+    """Delete least recently used images until the cache is under `max_bytes`; returns the digests removed.
+
+    All sizes of an image go together, aged by whichever was used last. Evicting stops at
+    `low_water` of the budget so the next few downloads don't each trigger a directory scan.
+    """
+    images = {}
+    total = 0
+    for shard in os.scandir(root) if os.path.isdir(root) else ():
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            match = NAME_RE.match(entry.name)
+            if not match:
+                continue
+            stat = entry.stat()
+            files, size, used = images.get(match.group(1), ([], 0, 0))
+            images[match.group(1)] = (files + [entry.path], size + stat.st_size, max(used, stat.st_mtime))
+            total += stat.st_size
+    if total <= max_bytes:
+        return []
+
+    evicted = []
+    for digest, (files, size, _) in sorted(images.items(), key=lambda item: item[1][2]):
+        if total <= max_bytes * low_water:
+            break
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        evicted.append(digest)
+    return evicted
+
+
+def forget(conn, digests):
+    conn.executemany("DELETE FROM covers WHERE digest = ?", [(digest,) for digest in digests])
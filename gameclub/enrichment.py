@@ -0,0 +1,44 @@
+import json
+import time
+
+COLUMNS = ("ttb_hastily", "ttb_normally", "ttb_completely", "platforms", "stores", "similar")
+_UPDATES = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS + ("fetched_at",))
+
+
+def save(conn, igdb_id, values, now=None):
+    """Store what enrichment found for an IGDB game, and fill in platforms on rows still missing them."""
+    # An upsert rather than REPLACE, whose implicit delete would skip the stats triggers
+    conn.execute(f'''
+        INSERT INTO game_enrichment (igdb_id, {", ".join(COLUMNS)}, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (igdb_id) DO UPDATE SET {_UPDATES}
+    ''', (igdb_id, values["ttb_hastily"], values["ttb_normally"], values["ttb_completely"], values["platforms"],
+          json.dumps(values["stores"]), json.dumps(values["similar"]), int(now or time.time())))
+    if values["platforms"]:
+        for table in ("game_picks", "archived_games"):
+            conn.execute(f"UPDATE {table} SET platforms = ? WHERE igdb_id = ? AND platforms IS NULL",
+                         (values["platforms"], igdb_id))
+
+
+def load(conn, igdb_id):
+    row = conn.execute(
+        f"SELECT {', '.join(COLUMNS)} FROM game_enrichment WHERE igdb_id = ?", (igdb_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    values = dict(zip(COLUMNS, row))
+    values["stores"] = json.loads(values["stores"] or "[]")
+    values["similar"] = json.loads(values["similar"] or "[]")
+    return values
+
+
+def missing(conn):
+    """IGDB ids of suggested or archived games that have never been enriched."""
+    rows = conn.execute('''
+        SELECT igdb_id FROM game_picks WHERE igdb_id IS NOT NULL
+        UNION
+        SELECT igdb_id FROM archived_games WHERE igdb_id IS NOT NULL
+        EXCEPT
+        SELECT igdb_id FROM game_enrichment
+    ''').fetchall()
+    return [row[0] for row in rows]
@@ -0,0 +1,61 @@
+import time
+
+# Settings a guild can change with !config; all are Discord ids
+CONFIG_FIELDS = ("sales_channel_id", "suggestions_channel_id", "announcement_channel_id", "owner_id")
+
+# Where rows written before per-guild data existed live until a guild adopts them
+LEGACY_GUILD_ID = 0
+
+
+def load_configs(conn):
+    """Every guild's settings as {guild_id: {"name": ..., field: id or None}}."""
+    rows = conn.execute(f"SELECT guild_id, name, {', '.join(CONFIG_FIELDS)} FROM guild_config").fetchall()
+    return {row[0]: dict(zip(("name",) + CONFIG_FIELDS, row[1:])) for row in rows}
+
+
+def save_config(conn, guild_id, values):
+    """Insert or update some of a guild's settings from a dict; fields not in it keep their value."""
+    unknown = set(values) - set(CONFIG_FIELDS) - {"name"}
+    if unknown:
+        raise ValueError(f"unknown setting(s): {', '.join(sorted(unknown))}")
+    columns = list(values)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns + ["updated_at"])
+    conn.execute(f'''
+        INSERT INTO guild_config (guild_id, {", ".join(columns + ["updated_at"])})
+        VALUES (?, {", ".join("?" * (len(columns) + 1))})
+        ON CONFLICT (guild_id) DO UPDATE SET {updates}
+    ''', (guild_id, *values.values(), int(time.time())))
+
+
+def guild_name(conn, guild_id):
+    row = conn.execute("SELECT name FROM guild_config WHERE guild_id = ?", (guild_id,)).fetchone()
+    return row[0] if row else None
+
+
+def legacy_rows(conn):
+    return conn.execute(
+        "SELECT (SELECT COUNT(*) FROM game_picks WHERE guild_id = ?) + "
+        "(SELECT COUNT(*) FROM archived_games WHERE guild_id = ?)", (LEGACY_GUILD_ID, LEGACY_GUILD_ID)
+    ).fetchone()[0]
+
+
+def adopt_legacy(conn, guild_id):
+    """Move rows from before per-guild data into `guild_id`. Safe to repeat; returns rows moved."""
+    # Same convention as migration 3 for titles the target guild already has
+    conn.execute('''
+        UPDATE game_picks SET title_key = title_key || ' #' || id
+        WHERE guild_id = ? AND title_key IN (SELECT title_key FROM game_picks WHERE guild_id = ?)
+    ''', (LEGACY_GUILD_ID, guild_id))
+    moved = 0
+    for table in ("game_picks", "archived_games"):
+        moved += conn.execute(
+            f"UPDATE {table} SET guild_id = ? WHERE guild_id = ?", (guild_id, LEGACY_GUILD_ID)
+        ).rowcount
+    conn.execute("UPDATE OR IGNORE current_game SET guild_id = ? WHERE guild_id = ?", (guild_id, LEGACY_GUILD_ID))
+    conn.execute("DELETE FROM current_game WHERE guild_id = ?", (LEGACY_GUILD_ID,))
+    # Moving game_picks already joined their suggesters to the guild's rotation, oldest first
+    conn.execute("DELETE FROM rotation_members WHERE guild_id = ?", (LEGACY_GUILD_ID,))
+    conn.execute("UPDATE OR IGNORE rotation_state SET guild_id = ? WHERE guild_id = ?", (guild_id, LEGACY_GUILD_ID))
+    conn.execute("DELETE FROM rotation_state WHERE guild_id = ?", (LEGACY_GUILD_ID,))
+    conn.execute("UPDATE rotation_events SET guild_id = ? WHERE guild_id = ?", (guild_id, LEGACY_GUILD_ID))
+    return moved
@@ -0,0 +1,106 @@
+"""Persistent job queue in SQLite.
+
+Jobs are claimed in (priority, run_at, id) order, lowest priority number first, so
+interactive work overtakes backfills. A failed job is retried with exponential backoff
+until it has used max_attempts, then stays in state 'dead' with its last error: the
+dead-letter list, which retry() puts back in the queue. Finished jobs are deleted.
+"""
+import collections
+import json
+import random
+import time
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKFILL = 100
+
+BACKOFF_BASE = 15
+BACKOFF_MAX = 3600
+
+Job = collections.namedtuple("Job", "id kind payload attempts max_attempts")
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: doubling from BACKOFF_BASE, capped, with 20% jitter."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def enqueue(conn, kind, payload, priority=PRIORITY_INTERACTIVE, delay=0, max_attempts=5, dedupe_key=None, now=None):
+    """Add a job; returns its id, or None when a job with the same dedupe_key is already pending."""
+    now = now or time.time()
+    cur = conn.execute('''
+        INSERT OR IGNORE INTO jobs (kind, payload, priority, max_attempts, run_at, created_at, updated_at, dedupe_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (kind, json.dumps(payload), priority, max_attempts, now + delay, int(now), int(now), dedupe_key))
+    return cur.lastrowid if cur.rowcount else None
+
+
+def claim(conn, now=None):
+    """Mark the next runnable job as running and return it, or None if nothing is due."""
+    now = now or time.time()
+    row = conn.execute('''
+        UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ?
+        WHERE id = (
+            SELECT id FROM jobs WHERE state = 'queued' AND run_at <= ? ORDER BY priority, run_at, id LIMIT 1
+        )
+        RETURNING id, kind, payload, attempts, max_attempts
+    ''', (int(now), now)).fetchone()
+    if row is None:
+        return None
+    return Job(row[0], row[1], json.loads(row[2]), row[3], row[4])
+
+
+def complete(conn, job_id):
+    conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+def fail(conn, job_id, error, permanent=False, now=None):
+    """Record a failure; returns "retry" with the job re-queued after a backoff, or "dead"."""
+    now = now or time.time()
+    attempts, max_attempts = conn.execute(
+        "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)
+    ).fetchone()
+    if permanent or attempts >= max_attempts:
+        conn.execute(
+            "UPDATE jobs SET state = 'dead', last_error = ?, updated_at = ? WHERE id = ?",
+            (error, int(now), job_id),
+        )
+        return "dead"
+    conn.execute(
+        "UPDATE jobs SET state = 'queued', last_error = ?, run_at = ?, updated_at = ? WHERE id = ?",
+        (error, now + backoff(attempts), int(now), job_id),
+    )
+    return "retry"
+
+
+def recover(conn):
+    """Re-queue jobs left running by a process that stopped mid-job; returns how many."""
+    return conn.execute("UPDATE jobs SET state = 'queued' WHERE state = 'running'").rowcount
+
+
+def next_run_at(conn):
+    return conn.execute("SELECT MIN(run_at) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+
+def counts(conn):
+    """{(state, kind): count} over everything still in the table."""
+    rows = conn.execute("SELECT state, kind, COUNT(*) FROM jobs GROUP BY state, kind").fetchall()
+    return {(state, kind): count for state, kind, count in rows}
+
+
+def dead(conn, limit=10):
+    """Most recent dead jobs as (id, kind, attempts, last_error, updated_at)."""
+    return conn.execute('''
+        SELECT id, kind, attempts, last_error, updated_at FROM jobs WHERE state = 'dead'
+        ORDER BY updated_at DESC, id DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def retry(conn, job_id=None, now=None):
+    """Put one dead job, or all of them, back in the queue with fresh attempts; returns how many."""
+    now = now or time.time()
+    sql = "UPDATE OR IGNORE jobs SET state = 'queued', attempts = 0, run_at = ?, updated_at = ? WHERE state = 'dead'"
+    params = [now, int(now)]
+    if job_id is not None:
+        sql += " AND id = ?"
+        params.append(job_id)
+    return conn.execute(sql, params).rowcount
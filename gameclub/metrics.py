@@ -0,0 +1,227 @@
+"""In-process metrics in the Prometheus text format, shared by the bot and the web app.
+
+Each process keeps its own registry; scrape every process (or every web worker)
+separately. Nothing here needs a Prometheus client library.
+"""
+import bisect
+import collections
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a cached SQLite lookup up to a slow upstream API
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines += self._samples(key, value)
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket counts plus the +Inf bucket, then sum
+                state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(self.labels, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _add(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+# The registry everything in a process reports to
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PROCESS_START = registry.gauge("process_start_time_seconds", "Unix time the process started")
+PROCESS_START.set(time.time())
+
+
+class SamplingProfiler:
+    """Statistical profiler: a thread snapshots another thread's stack every `interval` seconds.
+
+    Costs almost nothing while stopped, so it can stay wired in and be switched on when
+    something is slow. Output is collapsed stacks (flamegraph.pl / speedscope input).
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.thread = None
+        self.stopping = threading.Event()
+        self.target = None
+        self.started_at = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, thread_id=None, all_threads=False):
+        """Sample `thread_id` (default: the calling thread), or every other thread, until stop()."""
+        if self.running:
+            return False
+        self.stacks.clear()
+        self.samples = 0
+        self.target = None if all_threads else thread_id or threading.get_ident()
+        self.stopping.clear()
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._sample, name="gameclub-profiler", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self.stopping.set()
+        self.thread.join()
+        return True
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            frames = sys._current_frames()
+            if self.target is not None:
+                frames = {self.target: frames[self.target]} if self.target in frames else {}
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def top(self, limit=10):
+        """Leaf frames where the sampled thread spent the most time, as (frame, share) pairs."""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = self.samples or 1
+        return [(frame, count / total) for frame, count in leaves.most_common(limit)]
@@ -0,0 +1,829 @@
+import calendar
+import logging
+import time
+
+from gameclub.titles import normalize_title
+
+logger = logging.getLogger("gameclub.migrations")
+
+# Column lists shared by the bot and web app once the schema is at head
+GAME_COLUMNS = (
+    "id", "user", "game_name", "title_key", "genres", "release_ts",
+    "summary", "url", "igdb_id", "cover_id", "platforms", "slug", "cheapshark_id", "guild_id",
+)
+
+
+def parse_release_date(value):
+    """Old rows hold 'YYYY-MM-DD' text, raw IGDB epoch seconds or 'Unknown'."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return calendar.timegm(time.strptime(value, "%Y-%m-%d"))
+    except ValueError:
+        return None
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def baseline(conn):
+    # The schema bot.py created before migrations existed
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS game_picks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user TEXT,
+            game_name TEXT,
+            genres TEXT,
+            release_date TEXT,
+            summary TEXT,
+            url TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS current_game (
+            id INTEGER PRIMARY KEY,
+            game_id INTEGER,
+            FOREIGN KEY (game_id) REFERENCES game_picks(id)
+        )
+    ''')
+    conn.execute("CREATE TABLE IF NOT EXISTS archived_games AS SELECT * FROM game_picks WHERE 0")
+    conn.execute("CREATE TABLE IF NOT EXISTS picked_users (user TEXT PRIMARY KEY)")
+
+
+def igdb_columns(conn):
+    # Databases touched by the pre-migration bot may already have these
+    for table in ("game_picks", "archived_games"):
+        existing = _columns(conn, table)
+        for column, decl in (("igdb_id", "INTEGER"), ("cover_id", "TEXT"), ("platforms", "TEXT"), ("slug", "TEXT")):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def keys_and_indexes(conn):
+    """Rebuild game_picks/archived_games with keys, a normalized title key and integer release dates."""
+    conn.create_function("normalize_title", 1, normalize_title, deterministic=True)
+    conn.create_function("parse_release_date", 1, parse_release_date, deterministic=True)
+
+    game_columns = '''
+        user TEXT NOT NULL,
+        game_name TEXT NOT NULL,
+        title_key TEXT NOT NULL COLLATE NOCASE,
+        genres TEXT,
+        release_ts INTEGER,
+        summary TEXT,
+        url TEXT,
+        igdb_id INTEGER,
+        cover_id TEXT,
+        platforms TEXT,
+        slug TEXT
+    '''
+    copy = '''
+        SELECT id, COALESCE(user, ''), COALESCE(game_name, ''), normalize_title(game_name), genres,
+               parse_release_date(release_date), summary, url, igdb_id, cover_id, platforms, slug
+        FROM {table}
+    '''
+    columns = "id, user, game_name, title_key, genres, release_ts, summary, url, igdb_id, cover_id, platforms, slug"
+
+    # AUTOINCREMENT on the new table must stay ahead of ids already moved to the archive
+    next_id = conn.execute('''
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM game_picks), 0), COALESCE((SELECT MAX(id) FROM archived_games), 0),
+                   COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'game_picks'), 0))
+    ''').fetchone()[0]
+
+    conn.execute(f"CREATE TABLE game_picks_new (id INTEGER PRIMARY KEY AUTOINCREMENT, {game_columns})")
+    conn.execute(f"INSERT INTO game_picks_new ({columns}) {copy.format(table='game_picks')}")
+    conn.execute("DROP TABLE game_picks")
+    conn.execute("ALTER TABLE game_picks_new RENAME TO game_picks")
+    if conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'game_picks'", (next_id,)).rowcount == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('game_picks', ?)", (next_id,))
+
+    conn.execute(f"CREATE TABLE archived_games_new (id INTEGER PRIMARY KEY, {game_columns})")
+    # The old archive had no key, so a double pick could have stored a row twice
+    conn.execute(f"INSERT OR IGNORE INTO archived_games_new ({columns}) {copy.format(table='archived_games')}")
+    conn.execute("DROP TABLE archived_games")
+    conn.execute("ALTER TABLE archived_games_new RENAME TO archived_games")
+
+    # Titles that only differed by case or punctuation were let through before;
+    # keep them but give every later copy a distinct key so the unique index holds
+    conn.execute('''
+        UPDATE game_picks SET title_key = title_key || ' #' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM game_picks GROUP BY title_key)
+    ''')
+
+    conn.execute("CREATE UNIQUE INDEX idx_game_picks_title_key ON game_picks (title_key)")
+    conn.execute("CREATE INDEX idx_game_picks_user ON game_picks (user, id)")
+    conn.execute("CREATE INDEX idx_game_picks_igdb_id ON game_picks (igdb_id)")
+    conn.execute("CREATE INDEX idx_archived_games_user ON archived_games (user, id)")
+    conn.execute("CREATE INDEX idx_archived_games_title_key ON archived_games (title_key)")
+    conn.execute("CREATE INDEX idx_current_game_game_id ON current_game (game_id)")
+
+
+# Tables whose writes bump data_changes
+WATCHED_TABLES = ("game_picks", "archived_games", "current_game")
+
+
+def change_counter(conn):
+    """Single-row version counter, bumped by triggers whenever anything the web app shows changes."""
+    conn.execute('''
+        CREATE TABLE data_changes (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT INTO data_changes (id, version, changed_at) VALUES (1, 1, CAST(strftime('%s', 'now') AS INTEGER))")
+    for table in WATCHED_TABLES:
+        _change_triggers(conn, table)
+
+
+def _change_triggers(conn, table):
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_{event.lower()}_changes AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_changes
+                SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)
+                WHERE id = 1;
+            END
+        ''')
+
+
+def pagination_indexes(conn):
+    # Keyset pages sort on (expression, id); these let each page be a single index range scan.
+    # The release expression must stay identical to queries.SORTS["release"] to be used.
+    conn.execute("CREATE INDEX idx_game_picks_release ON game_picks (COALESCE(release_ts, 0), id)")
+    conn.execute("CREATE INDEX idx_archived_games_release ON archived_games (COALESCE(release_ts, 0), id)")
+    conn.execute("DROP INDEX idx_archived_games_title_key")
+    conn.execute("CREATE INDEX idx_archived_games_title_key ON archived_games (title_key, id)")
+
+
+def search_indexes(conn):
+    """FTS5 word index over name/genres/summary and a trigram index over title keys.
+
+    Both cover game_picks and archived_games. Suggestions and their archived copy share an
+    id, so rowid = id * 2 for suggestions and id * 2 + 1 for the archive (see gameclub.search).
+    """
+    conn.execute('''
+        CREATE VIRTUAL TABLE search_index USING fts5(
+            game_name, genres, summary, tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute("CREATE VIRTUAL TABLE title_trigrams USING fts5(title_key, tokenize = 'trigram')")
+    # Exact slug lookups let pasted IGDB links be matched without a network call
+    conn.execute("CREATE INDEX idx_game_picks_slug ON game_picks (slug)")
+
+    for table, offset in (("game_picks", 0), ("archived_games", 1)):
+        rowid = f"id * 2 + {offset}"
+        conn.execute(f"INSERT INTO search_index (rowid, game_name, genres, summary) "
+                     f"SELECT {rowid}, game_name, genres, summary FROM {table}")
+        conn.execute(f"INSERT INTO title_trigrams (rowid, title_key) SELECT {rowid}, title_key FROM {table}")
+
+        insert = f'''
+            INSERT INTO search_index (rowid, game_name, genres, summary)
+            VALUES (NEW.id * 2 + {offset}, NEW.game_name, NEW.genres, NEW.summary);
+            INSERT INTO title_trigrams (rowid, title_key) VALUES (NEW.id * 2 + {offset}, NEW.title_key);
+        '''
+        delete = f'''
+            DELETE FROM search_index WHERE rowid = OLD.id * 2 + {offset};
+            DELETE FROM title_trigrams WHERE rowid = OLD.id * 2 + {offset};
+        '''
+        conn.execute(f"CREATE TRIGGER trg_{table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        conn.execute(f"CREATE TRIGGER trg_{table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_search_update
+            AFTER UPDATE OF id, game_name, title_key, genres, summary ON {table}
+            BEGIN {delete} {insert} END
+        ''')
+
+
+def price_history(conn):
+    """Append-only price changes, the latest known price per game and daily min/max rollups.
+
+    Keyed by game id, which a suggestion keeps when it moves to the archive. Prices are cents.
+    """
+    conn.execute('''
+        CREATE TABLE price_history (
+            game_id INTEGER NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            store_id INTEGER,
+            sale_cents INTEGER NOT NULL,
+            retail_cents INTEGER NOT NULL,
+            PRIMARY KEY (game_id, recorded_at)
+        ) WITHOUT ROWID
+    ''')
+    # One row per game: what the change check compares against and what the scan uses to find stale games
+    conn.execute('''
+        CREATE TABLE price_latest (
+            game_id INTEGER PRIMARY KEY,
+            store_id INTEGER,
+            sale_cents INTEGER,
+            retail_cents INTEGER,
+            deal_id TEXT,
+            checked_at INTEGER NOT NULL,
+            changed_at INTEGER,
+            alerted_cents INTEGER
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_price_latest_checked_at ON price_latest (checked_at)")
+    conn.execute('''
+        CREATE TABLE price_daily (
+            game_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            min_cents INTEGER NOT NULL,
+            max_cents INTEGER NOT NULL,
+            close_cents INTEGER NOT NULL,
+            retail_cents INTEGER NOT NULL,
+            PRIMARY KEY (game_id, day)
+        ) WITHOUT ROWID
+    ''')
+    # Price charts on the web app go stale with the rollups
+    _change_triggers(conn, "price_daily")
+
+
+def scheduler_runs(conn):
+    # Last run of each bot job, so occurrences missed during downtime are caught up on start
+    conn.execute('''
+        CREATE TABLE scheduler_runs (
+            job TEXT PRIMARY KEY,
+            last_run INTEGER NOT NULL,
+            last_status TEXT,
+            last_duration REAL
+        )
+    ''')
+
+
+def cheapshark_ids(conn):
+    # Resolved once per game by title, then prices are refreshed in bulk by id
+    for table in ("game_picks", "archived_games"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN cheapshark_id INTEGER")
+
+
+def guilds(conn):
+    """Per-guild settings, and a guild_id on everything that belongs to one club.
+
+    Rows from before this migration land in guild 0 until the bot adopts them
+    (see gameclub.guilds.adopt_legacy). Ids stay global, so price history,
+    search rowids and the archive still key on id alone.
+    """
+    conn.execute('''
+        CREATE TABLE guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            name TEXT,
+            sales_channel_id INTEGER,
+            suggestions_channel_id INTEGER,
+            announcement_channel_id INTEGER,
+            owner_id INTEGER,
+            updated_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    ''')
+
+    for table in ("game_picks", "archived_games"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0")
+    # Every lookup and keyset page is now within one guild, so guild_id leads each index
+    for index in ("idx_game_picks_title_key", "idx_game_picks_user", "idx_game_picks_igdb_id", "idx_game_picks_slug",
+                  "idx_game_picks_release", "idx_archived_games_user", "idx_archived_games_title_key",
+                  "idx_archived_games_release"):
+        conn.execute(f"DROP INDEX {index}")
+    conn.execute("CREATE UNIQUE INDEX idx_game_picks_title_key ON game_picks (guild_id, title_key)")
+    conn.execute("CREATE INDEX idx_game_picks_guild ON game_picks (guild_id, id)")
+    conn.execute("CREATE INDEX idx_game_picks_user ON game_picks (guild_id, user, id)")
+    conn.execute("CREATE INDEX idx_game_picks_igdb_id ON game_picks (guild_id, igdb_id)")
+    conn.execute("CREATE INDEX idx_game_picks_slug ON game_picks (guild_id, slug)")
+    conn.execute("CREATE INDEX idx_game_picks_release ON game_picks (guild_id, COALESCE(release_ts, 0), id)")
+    conn.execute("CREATE INDEX idx_archived_games_guild ON archived_games (guild_id, id)")
+    conn.execute("CREATE INDEX idx_archived_games_user ON archived_games (guild_id, user, id)")
+    conn.execute("CREATE INDEX idx_archived_games_title_key ON archived_games (guild_id, title_key, id)")
+    conn.execute("CREATE INDEX idx_archived_games_release ON archived_games (guild_id, COALESCE(release_ts, 0), id)")
+    # The price scan dedupes by CheapShark id across guilds
+    conn.execute("CREATE INDEX idx_game_picks_cheapshark_id ON game_picks (cheapshark_id)")
+
+    # One current game per guild; the newest row wins if an old database somehow has several
+    conn.execute("CREATE TABLE current_game_new (guild_id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL)")
+    conn.execute("INSERT INTO current_game_new (guild_id, game_id) SELECT 0, game_id FROM current_game "
+                 "WHERE game_id IS NOT NULL ORDER BY id DESC LIMIT 1")
+    conn.execute("DROP TABLE current_game")
+    conn.execute("ALTER TABLE current_game_new RENAME TO current_game")
+    conn.execute("CREATE INDEX idx_current_game_game_id ON current_game (game_id)")
+    _change_triggers(conn, "current_game")
+
+    conn.execute('''
+        CREATE TABLE picked_users_new (
+            guild_id INTEGER NOT NULL,
+            user TEXT NOT NULL,
+            PRIMARY KEY (guild_id, user)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT INTO picked_users_new (guild_id, user) SELECT 0, user FROM picked_users WHERE user IS NOT NULL")
+    conn.execute("DROP TABLE picked_users")
+    conn.execute("ALTER TABLE picked_users_new RENAME TO picked_users")
+    # Guild names appear on the web pages
+    _change_triggers(conn, "guild_config")
+
+
+def rotation(conn):
+    """Explicit pick rotation: an ordered member queue per guild, its state and an audit log.
+
+    Each member row points at that member's oldest suggestion (next_game_id); triggers on
+    game_picks keep the pointer current, so finding who picks next never scans the library.
+    Replaces picked_users, whose leftovers set the starting cursor.
+    """
+    conn.execute('''
+        CREATE TABLE rotation_members (
+            guild_id INTEGER NOT NULL,
+            user TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            weight REAL NOT NULL DEFAULT 1.0,
+            next_game_id INTEGER,
+            deferred_until INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE UNIQUE INDEX idx_rotation_members_position ON rotation_members (guild_id, position)")
+    conn.execute('''
+        CREATE TABLE rotation_state (
+            guild_id INTEGER PRIMARY KEY,
+            mode TEXT NOT NULL DEFAULT 'round_robin',
+            seed INTEGER NOT NULL,
+            cursor INTEGER NOT NULL DEFAULT 0,
+            draws INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE rotation_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            draw INTEGER,
+            user TEXT,
+            game_id INTEGER,
+            detail TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_rotation_events_guild ON rotation_events (guild_id, id)")
+
+    # Existing suggesters join in the order of their oldest suggestion, as the old query ranked them
+    conn.execute('''
+        INSERT INTO rotation_members (guild_id, user, position, next_game_id)
+        SELECT guild_id, user, ROW_NUMBER() OVER (PARTITION BY guild_id ORDER BY MIN(id)), MIN(id)
+        FROM game_picks GROUP BY guild_id, user
+    ''')
+    conn.execute('''
+        INSERT INTO rotation_state (guild_id, seed, cursor)
+        SELECT m.guild_id, abs(random()) % 2147483647, COALESCE(MIN(m.position), 0)
+        FROM rotation_members m
+        LEFT JOIN picked_users p ON p.guild_id = m.guild_id AND p.user = m.user
+        WHERE p.user IS NULL
+        GROUP BY m.guild_id
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO rotation_state (guild_id, seed, cursor)
+        SELECT DISTINCT guild_id, abs(random()) % 2147483647, 0 FROM rotation_members
+    ''')
+    conn.execute("DROP TABLE picked_users")
+
+    member_join = '''
+        INSERT INTO rotation_members (guild_id, user, position, next_game_id)
+        VALUES (NEW.guild_id, NEW.user,
+                (SELECT COALESCE(MAX(position), 0) + 1 FROM rotation_members WHERE guild_id = NEW.guild_id), NEW.id)
+        ON CONFLICT (guild_id, user) DO UPDATE
+        SET next_game_id = MIN(COALESCE(next_game_id, excluded.next_game_id), excluded.next_game_id);
+    '''
+    # Only when the pointer itself went away; a seek on (guild_id, user, id) finds the next one
+    member_leave = '''
+        UPDATE rotation_members
+        SET next_game_id = (SELECT MIN(id) FROM game_picks WHERE guild_id = OLD.guild_id AND user = OLD.user)
+        WHERE guild_id = OLD.guild_id AND user = OLD.user AND next_game_id = OLD.id;
+    '''
+    conn.execute(f"CREATE TRIGGER trg_game_picks_rotation_insert AFTER INSERT ON game_picks BEGIN {member_join} END")
+    conn.execute(f"CREATE TRIGGER trg_game_picks_rotation_delete AFTER DELETE ON game_picks BEGIN {member_leave} END")
+    conn.execute(f'''
+        CREATE TRIGGER trg_game_picks_rotation_update AFTER UPDATE OF guild_id, user ON game_picks
+        BEGIN {member_leave} {member_join} END
+    ''')
+
+
+def covers(conn):
+    """Which IGDB covers are on disk: content-addressed files (see gameclub.covers) per cover image_id.
+
+    Several ids can share one digest. Rows are removed when the files are evicted, and the
+    change triggers let cached pages pick up covers as they arrive.
+    """
+    conn.execute('''
+        CREATE TABLE covers (
+            cover_id TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            ext TEXT NOT NULL,
+            sizes TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            fetched_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX idx_covers_digest ON covers (digest)")
+    _change_triggers(conn, "covers")
+
+
+def job_queue(conn):
+    """Background jobs (see gameclub.jobs) and the IGDB details they fill in, keyed by IGDB id.
+
+    Enrichment is per IGDB game rather than per row, so suggestions, their archived copy
+    and the same game in other guilds share one fetch.
+    """
+    conn.execute('''
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_at REAL NOT NULL,
+            created_at INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            last_error TEXT,
+            dedupe_key TEXT
+        )
+    ''')
+    # Claiming is one range scan in run order; finished jobs are deleted, dead ones stay
+    conn.execute("CREATE INDEX idx_jobs_queue ON jobs (priority, run_at, id) WHERE state = 'queued'")
+    conn.execute(
+        "CREATE UNIQUE INDEX idx_jobs_dedupe ON jobs (dedupe_key) WHERE state IN ('queued', 'running')"
+    )
+    conn.execute('''
+        CREATE TABLE game_enrichment (
+            igdb_id INTEGER PRIMARY KEY,
+            ttb_hastily INTEGER,
+            ttb_normally INTEGER,
+            ttb_completely INTEGER,
+            platforms TEXT,
+            stores TEXT,
+            similar TEXT,
+            fetched_at INTEGER NOT NULL
+        )
+    ''')
+
+
+def _names_json(column):
+    """A comma-joined name list as a JSON array for json_each(); triggers can't split text with a recursive CTE."""
+    array = rf"""'["' || replace(replace(replace(trim({column}), '\', '\\'), '"', '\"'), ',', '","') || '"]'"""
+    return f"CASE WHEN json_valid({array}) THEN {array} ELSE '[]' END"
+
+
+def _link_names(kind, column, row):
+    # Names are trimmed, and N/A (what old suggestions stored for "no genres") is dropped
+    names = f"json_each({_names_json(f'{row}.{column}')}) j"
+    wanted = "trim(j.value) NOT IN ('', 'N/A')"
+    return f"""
+        INSERT OR IGNORE INTO {kind}s (name) SELECT trim(j.value) FROM {names} WHERE {wanted};
+        INSERT OR IGNORE INTO game_{kind}s (game_id, {kind}_id)
+        SELECT {row}.id, t.id FROM {names} JOIN {kind}s t ON t.name = trim(j.value) WHERE {wanted};
+    """
+
+
+def _tag_totals(kind, row, picked, sign):
+    return f"""
+        INSERT INTO {kind}_stats (guild_id, {kind}_id, suggested, picked)
+        SELECT {row}.guild_id, {kind}_id, {sign}, {sign * picked} FROM game_{kind}s WHERE game_id = {row}.id
+        ON CONFLICT (guild_id, {kind}_id) DO UPDATE
+        SET suggested = suggested + excluded.suggested, picked = picked + excluded.picked;
+    """
+
+
+def _game_totals(row, picked, sign):
+    """One game row's share of guild_stats and member_stats, added (sign 1) or taken away (sign -1)."""
+    waited = f"{row}.picked_at - {row}.suggested_at" if picked else "NULL"
+    ttb = f"(SELECT ttb_normally FROM game_enrichment WHERE igdb_id = {row}.igdb_id)" if picked else "NULL"
+    waits = f"{sign} * ({waited} IS NOT NULL), {sign} * COALESCE({waited}, 0)"
+    return f"""
+        INSERT INTO guild_stats (guild_id, suggested, picked, waits, wait_seconds, ttbs, ttb_seconds)
+        VALUES ({row}.guild_id, {sign}, {sign * picked}, {waits}, {sign} * ({ttb} IS NOT NULL), {sign} * COALESCE({ttb}, 0))
+        ON CONFLICT (guild_id) DO UPDATE
+        SET suggested = suggested + excluded.suggested, picked = picked + excluded.picked,
+            waits = waits + excluded.waits, wait_seconds = wait_seconds + excluded.wait_seconds,
+            ttbs = ttbs + excluded.ttbs, ttb_seconds = ttb_seconds + excluded.ttb_seconds;
+        INSERT INTO member_stats (guild_id, user, suggested, picked, waits, wait_seconds)
+        VALUES ({row}.guild_id, {row}.user, {sign}, {sign * picked}, {waits})
+        ON CONFLICT (guild_id, user) DO UPDATE
+        SET suggested = suggested + excluded.suggested, picked = picked + excluded.picked,
+            waits = waits + excluded.waits, wait_seconds = wait_seconds + excluded.wait_seconds;
+    """
+
+
+def _ttb_change(count, seconds, row):
+    # Added to every guild that picked the game, once per archived copy
+    return f"""
+        UPDATE guild_stats
+        SET ttbs = ttbs + ({count}) * picks.n, ttb_seconds = ttb_seconds + ({seconds}) * picks.n
+        FROM (SELECT guild_id, COUNT(*) AS n FROM archived_games WHERE igdb_id = {row}.igdb_id GROUP BY guild_id) picks
+        WHERE guild_stats.guild_id = picks.guild_id;
+    """
+
+
+def stats(conn):
+    """Normalized genres and platforms, and running totals for the stats pages.
+
+    Names are split out of the comma-joined genres/platforms columns into genres/platforms
+    and game_genres/game_platforms, keyed by game id (shared by a suggestion and its archived
+    copy). Triggers on game_picks, archived_games and game_enrichment keep per-guild totals
+    in guild_stats, member_stats, genre_stats and platform_stats current, so reading stats
+    never scans the library. "suggested" counts every game ever suggested, picked or not.
+    Waiting times need suggested_at and picked_at, which older rows don't have.
+    """
+    for table in ("game_picks", "archived_games"):
+        # Both tables keep the same columns; picked_at stays NULL on suggestions
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN suggested_at INTEGER")
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN picked_at INTEGER")
+    # Picks made since the rotation log existed know when they happened
+    conn.execute('''
+        UPDATE archived_games SET picked_at = e.at
+        FROM (SELECT game_id, MAX(created_at) AS at FROM rotation_events WHERE kind = 'pick' GROUP BY game_id) e
+        WHERE e.game_id = archived_games.id
+    ''')
+    conn.execute("CREATE INDEX idx_archived_games_igdb_id ON archived_games (igdb_id, guild_id)")
+
+    for kind in ("genre", "platform"):
+        conn.execute(f"CREATE TABLE {kind}s (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE)")
+        conn.execute(f'''
+            CREATE TABLE game_{kind}s (
+                game_id INTEGER NOT NULL,
+                {kind}_id INTEGER NOT NULL,
+                PRIMARY KEY (game_id, {kind}_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f"CREATE INDEX idx_game_{kind}s_{kind} ON game_{kind}s ({kind}_id, game_id)")
+        conn.execute(f'''
+            CREATE TABLE {kind}_stats (
+                guild_id INTEGER NOT NULL,
+                {kind}_id INTEGER NOT NULL,
+                suggested INTEGER NOT NULL,
+                picked INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, {kind}_id)
+            ) WITHOUT ROWID
+        ''')
+    conn.execute('''
+        CREATE TABLE member_stats (
+            guild_id INTEGER NOT NULL,
+            user TEXT NOT NULL,
+            suggested INTEGER NOT NULL,
+            picked INTEGER NOT NULL,
+            waits INTEGER NOT NULL,
+            wait_seconds INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE guild_stats (
+            guild_id INTEGER PRIMARY KEY,
+            suggested INTEGER NOT NULL,
+            picked INTEGER NOT NULL,
+            waits INTEGER NOT NULL,
+            wait_seconds INTEGER NOT NULL,
+            ttbs INTEGER NOT NULL,
+            ttb_seconds INTEGER NOT NULL
+        )
+    ''')
+
+    games = '''
+        SELECT id, guild_id, user, genres, platforms, igdb_id, suggested_at, picked_at, 0 AS picked FROM game_picks
+        UNION ALL
+        SELECT id, guild_id, user, genres, platforms, igdb_id, suggested_at, picked_at, 1 FROM archived_games
+    '''
+    tags = (("genre", "genres"), ("platform", "platforms"))
+    for kind, column in tags:
+        names = f"({games}) g, json_each({_names_json(f'g.{column}')}) j"
+        conn.execute(f'''
+            INSERT OR IGNORE INTO {kind}s (name)
+            SELECT trim(j.value) FROM {names} WHERE trim(j.value) NOT IN ('', 'N/A')
+        ''')
+        conn.execute(f'''
+            INSERT OR IGNORE INTO game_{kind}s (game_id, {kind}_id)
+            SELECT g.id, t.id FROM {names} JOIN {kind}s t ON t.name = trim(j.value)
+        ''')
+        conn.execute(f'''
+            INSERT INTO {kind}_stats (guild_id, {kind}_id, suggested, picked)
+            SELECT g.guild_id, l.{kind}_id, COUNT(*), SUM(g.picked)
+            FROM ({games}) g JOIN game_{kind}s l ON l.game_id = g.id
+            GROUP BY g.guild_id, l.{kind}_id
+        ''')
+    waited = "CASE WHEN g.picked THEN g.picked_at - g.suggested_at END"
+    conn.execute(f'''
+        INSERT INTO member_stats (guild_id, user, suggested, picked, waits, wait_seconds)
+        SELECT g.guild_id, g.user, COUNT(*), SUM(g.picked), COUNT({waited}), TOTAL({waited})
+        FROM ({games}) g GROUP BY g.guild_id, g.user
+    ''')
+    ttb = "CASE WHEN g.picked THEN e.ttb_normally END"
+    conn.execute(f'''
+        INSERT INTO guild_stats (guild_id, suggested, picked, waits, wait_seconds, ttbs, ttb_seconds)
+        SELECT g.guild_id, COUNT(*), SUM(g.picked), COUNT({waited}), TOTAL({waited}), COUNT({ttb}), TOTAL({ttb})
+        FROM ({games}) g LEFT JOIN game_enrichment e ON e.igdb_id = g.igdb_id
+        GROUP BY g.guild_id
+    ''')
+
+    for table, other, picked in (("game_picks", "archived_games", 0), ("archived_games", "game_picks", 1)):
+        # A pick inserts the archived copy before deleting the suggestion, so a game's
+        # links are only dropped once neither table has it
+        insert = "".join(_link_names(kind, column, "NEW") + _tag_totals(kind, "NEW", picked, 1) for kind, column in tags)
+        delete = "".join(
+            _tag_totals(kind, "OLD", picked, -1)
+            + f"DELETE FROM game_{kind}s WHERE game_id = OLD.id AND NOT EXISTS (SELECT 1 FROM {other} WHERE id = OLD.id);"
+            for kind, _ in tags
+        )
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_stats_insert AFTER INSERT ON {table}
+            BEGIN {insert} {_game_totals("NEW", picked, 1)} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_stats_delete AFTER DELETE ON {table}
+            BEGIN {delete} {_game_totals("OLD", picked, -1)} END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_stats_update AFTER UPDATE OF guild_id, user, igdb_id, suggested_at, picked_at
+            ON {table} BEGIN {_game_totals("OLD", picked, -1)} {_game_totals("NEW", picked, 1)} END
+        ''')
+        for kind, column in tags:
+            conn.execute(f'''
+                CREATE TRIGGER trg_{table}_{kind}s_update AFTER UPDATE OF guild_id, {column} ON {table}
+                BEGIN
+                    {_tag_totals(kind, "OLD", picked, -1)}
+                    DELETE FROM game_{kind}s WHERE game_id = OLD.id;
+                    {_link_names(kind, column, "NEW")}
+                    {_tag_totals(kind, "NEW", picked, 1)}
+                END
+            ''')
+
+    # Time to beat usually arrives after the pick, from the enrichment job
+    conn.execute(f'''
+        CREATE TRIGGER trg_game_enrichment_stats_insert AFTER INSERT ON game_enrichment
+        WHEN NEW.ttb_normally IS NOT NULL
+        BEGIN {_ttb_change("1", "NEW.ttb_normally", "NEW")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_game_enrichment_stats_update AFTER UPDATE OF ttb_normally ON game_enrichment
+        BEGIN {_ttb_change("(NEW.ttb_normally IS NOT NULL) - (OLD.ttb_normally IS NOT NULL)",
+                           "COALESCE(NEW.ttb_normally, 0) - COALESCE(OLD.ttb_normally, 0)", "NEW")} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER trg_game_enrichment_stats_delete AFTER DELETE ON game_enrichment
+        WHEN OLD.ttb_normally IS NOT NULL
+        BEGIN {_ttb_change("-1", "-OLD.ttb_normally", "OLD")} END
+    ''')
+    # The stats pages show time to beat, which changes without touching the game tables
+    _change_triggers(conn, "game_enrichment")
+
+
+def guild_search_indexes(conn):
+    """Rebuild the search indexes with each row's guild as an indexed token.
+
+    MATCH 'guild:"<g1>" AND ...' then intersects posting lists inside FTS5, so ranking only
+    ever sees one guild's rows; filtering on rowid or an UNINDEXED column still ranks every guild.
+    The "<g...>" form is one word to unicode61 and an exact substring to the trigram tokenizer.
+    """
+    for table in ("game_picks", "archived_games"):
+        for event in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER trg_{table}_search_{event}")
+    conn.execute("DROP TABLE search_index")
+    conn.execute("DROP TABLE title_trigrams")
+    conn.execute('''
+        CREATE VIRTUAL TABLE search_index USING fts5(
+            game_name, genres, summary, guild, tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute("CREATE VIRTUAL TABLE title_trigrams USING fts5(title_key, guild, tokenize = 'trigram')")
+
+    for table, offset in (("game_picks", 0), ("archived_games", 1)):
+        rowid = f"id * 2 + {offset}"
+        conn.execute(f"INSERT INTO search_index (rowid, game_name, genres, summary, guild) "
+                     f"SELECT {rowid}, game_name, genres, summary, '<g' || guild_id || '>' FROM {table}")
+        conn.execute(f"INSERT INTO title_trigrams (rowid, title_key, guild) "
+                     f"SELECT {rowid}, title_key, '<g' || guild_id || '>' FROM {table}")
+
+        insert = f'''
+            INSERT INTO search_index (rowid, game_name, genres, summary, guild)
+            VALUES (NEW.id * 2 + {offset}, NEW.game_name, NEW.genres, NEW.summary, '<g' || NEW.guild_id || '>');
+            INSERT INTO title_trigrams (rowid, title_key, guild)
+            VALUES (NEW.id * 2 + {offset}, NEW.title_key, '<g' || NEW.guild_id || '>');
+        '''
+        delete = f'''
+            DELETE FROM search_index WHERE rowid = OLD.id * 2 + {offset};
+            DELETE FROM title_trigrams WHERE rowid = OLD.id * 2 + {offset};
+        '''
+        conn.execute(f"CREATE TRIGGER trg_{table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        conn.execute(f"CREATE TRIGGER trg_{table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        # guild_id changes when legacy rows are adopted
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_search_update
+            AFTER UPDATE OF id, game_name, title_key, genres, summary, guild_id ON {table}
+            BEGIN {delete} {insert} END
+        ''')
+
+
+def price_change_versions(conn):
+    # Every scan rewrites today's rollups, so these bumped every page's version on every chunk of a
+    # scan; price charts now carry their own validator (prices.chart_version)
+    for event in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER trg_price_daily_{event}_changes")
+
+
+def igdb_id_indexes(conn):
+    # Enrichment updates every row of an IGDB game across guilds, so igdb_id leads, as on archived_games
+    conn.execute("DROP INDEX idx_game_picks_igdb_id")
+    conn.execute("CREATE INDEX idx_game_picks_igdb_id ON game_picks (igdb_id, guild_id)")
+
+
+def _guild_change_triggers(conn, table, guilds):
+    """Replace `table`'s change triggers with ones that also stamp the new version on each guild it touches.
+
+    `guilds(row)` is a SELECT of the guild_id column for "NEW" or "OLD". Bumping and stamping
+    in one trigger body means a guild's version is always a data_changes version of its own.
+    """
+    rows = {"INSERT": ("NEW",), "UPDATE": ("OLD", "NEW"), "DELETE": ("OLD",)}
+    for event, refs in rows.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_{event.lower()}_changes")
+        conn.execute(f'''
+            CREATE TRIGGER trg_{table}_{event.lower()}_changes AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_changes
+                SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER)
+                WHERE id = 1;
+                INSERT INTO guild_changes (guild_id, version)
+                SELECT guild_id, (SELECT version FROM data_changes WHERE id = 1)
+                FROM ({" UNION ".join(guilds(ref) for ref in refs)}) WHERE true
+                ON CONFLICT (guild_id) DO UPDATE SET version = excluded.version;
+            END
+        ''')
+
+
+def guild_changes(conn):
+    """Per-guild change versions, so live updates only reach pages of the guild that changed.
+
+    Covers and enrichment have no guild of their own; they count for every guild showing that game.
+    """
+    conn.execute("CREATE TABLE guild_changes (guild_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)")
+    # The bot publishes the guilds that moved since its last notification
+    conn.execute("CREATE INDEX idx_guild_changes_version ON guild_changes (version)")
+    conn.execute("CREATE INDEX idx_game_picks_cover_id ON game_picks (cover_id)")
+    conn.execute("CREATE INDEX idx_archived_games_cover_id ON archived_games (cover_id)")
+    for table in ("game_picks", "archived_games", "current_game", "guild_config"):
+        _guild_change_triggers(conn, table, lambda row: f"SELECT {row}.guild_id AS guild_id")
+    for table, column in (("covers", "cover_id"), ("game_enrichment", "igdb_id")):
+        _guild_change_triggers(conn, table, lambda row, column=column: (
+            f"SELECT guild_id FROM game_picks WHERE {column} = {row}.{column} "
+            f"UNION SELECT guild_id FROM archived_games WHERE {column} = {row}.{column}"
+        ))
+
+
+# (version, description, function); append only, never edit a shipped migration
+MIGRATIONS = [
+    (1, "baseline schema", baseline),
+    (2, "IGDB id, cover, platforms and slug columns", igdb_columns),
+    (3, "keys, normalized title index and integer release dates", keys_and_indexes),
+    (4, "data change counter", change_counter),
+    (5, "keyset pagination indexes", pagination_indexes),
+    (6, "full-text and trigram search indexes", search_indexes),
+    (7, "price history", price_history),
+    (8, "scheduler run log", scheduler_runs),
+    (9, "CheapShark game ids", cheapshark_ids),
+    (10, "per-guild configuration and data", guilds),
+    (11, "explicit pick rotation", rotation),
+    (12, "local cover cache", covers),
+    (13, "job queue and game enrichment", job_queue),
+    (14, "normalized genres and platforms, stats aggregates", stats),
+    (15, "guild-scoped search indexes", guild_search_indexes),
+    (16, "price rollups no longer bump data_changes", price_change_versions),
+    (17, "IGDB id leads the game_picks index", igdb_id_indexes),
+    (18, "per-guild change versions", guild_changes),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST):
+    """Bring the database up to `target`. Safe to call from several processes at once."""
+    for version, description, apply in MIGRATIONS:
+        if version > target:
+            break
+        if current_version(conn) >= version:
+            continue
+        # Take the write lock first, then re-check: another process may have won the race
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.execute("ROLLBACK")
+                continue
+            logger.info("Applying migration %d: %s", version, description)
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    return current_version(conn)
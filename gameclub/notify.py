@@ -0,0 +1,135 @@
+"""Change notifications from the bot to web workers over Unix datagram sockets.
+
+Every web worker binds its own socket in NOTIFY_DIR; after a commit that bumped
+data_changes the bot sends the new version, followed by "guild:version" for each guild
+whose guild_changes row moved, to each socket it finds there. Sends never
+block, and sockets whose owner has gone away are removed. Readers still fall back to
+PRAGMA data_version now and then, so a lost datagram only delays an update.
+"""
+import errno
+import logging
+import os
+import socket
+import threading
+import time
+
+logger = logging.getLogger("gameclub.notify")
+
+NOTIFY_DIR = os.getenv(
+    "NOTIFY_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db", "notify")
+)
+
+
+class Publisher:
+    def __init__(self, directory=NOTIFY_DIR):
+        self.directory = directory
+        self.sock = None
+        self.sent = 0
+
+    def publish(self, version, guilds=()):
+        if not hasattr(socket, "AF_UNIX") or not os.path.isdir(self.directory):
+            return 0
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.setblocking(False)
+        message = " ".join([str(version)] + [f"{guild_id}:{guild_version}" for guild_id, guild_version in guilds]).encode()
+        delivered = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sock"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                self.sock.sendto(message, path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker exited without cleaning up
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                # A worker that isn't reading fills its buffer; it'll catch up through data_version
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                    logger.warning("Change notification to %s failed: %s", path, e)
+        self.sent += 1
+        return delivered
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class Subscriber:
+    """Receives versions on a background thread; wait_for() lets request threads block for the next one."""
+
+    def __init__(self, directory=NOTIFY_DIR, name=None):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"{name or 'web-%d' % self.pid}.sock")
+        self.version = None
+        self.guilds = {}
+        self.received_at = None
+        self.condition = threading.Condition()
+        self.sock = None
+        self.thread = None
+
+    @property
+    def active(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.thread = threading.Thread(target=self._listen, name="gameclub-notify", daemon=True)
+        self.thread.start()
+        return True
+
+    def _listen(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except OSError:
+                return
+            try:
+                version, *guilds = data.split()
+                version = int(version)
+                guilds = [tuple(map(int, guild.split(b":"))) for guild in guilds]
+            except ValueError:
+                continue
+            with self.condition:
+                for guild_id, guild_version in guilds:
+                    if guild_version > self.guilds.get(guild_id, 0):
+                        self.guilds[guild_id] = guild_version
+                if self.version is None or version > self.version:
+                    self.version = version
+                    self.received_at = time.monotonic()
+                self.condition.notify_all()
+
+    def wait_for(self, after, timeout):
+        """Block until a version newer than `after` arrives; returns the latest version seen."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version is not None and self.version > after, timeout)
+            return self.version
+
+    def wait_for_guild(self, guild_id, after, timeout):
+        """Block until `guild_id` has a version newer than `after`; returns its latest version seen."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.guilds.get(guild_id, 0) > after, timeout)
+            return self.guilds.get(guild_id, 0)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
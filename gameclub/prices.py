@@ -0,0 +1,179 @@
+import time
+
+DAY = 86400
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def cents(value):
+    """CheapShark sends prices as decimal strings; everything stored is integer cents."""
+    return round(float(value) * 100)
+
+
+def record_price(conn, game_id, observation, now=None):
+    """Store one scan result for `game_id` and say whether it's worth announcing.
+
+    `observation` is None when the game has no listing, otherwise a dict with
+    store_id, sale_cents, retail_cents and deal_id. History only grows when the
+    price actually moved. Returns "new" for a fresh sale, "deeper" when an
+    announced sale got cheaper, otherwise None.
+    """
+    now = int(now or time.time())
+    latest = conn.execute(
+        "SELECT sale_cents, retail_cents, alerted_cents FROM price_latest WHERE game_id = ?", (game_id,)
+    ).fetchone()
+
+    if observation is None:
+        conn.execute('''
+            INSERT INTO price_latest (game_id, checked_at) VALUES (?, ?)
+            ON CONFLICT (game_id) DO UPDATE SET checked_at = excluded.checked_at
+        ''', (game_id, now))
+        return None
+
+    sale, retail = observation["sale_cents"], observation["retail_cents"]
+    changed = latest is None or (latest[0], latest[1]) != (sale, retail)
+    if changed:
+        conn.execute(
+            "INSERT OR REPLACE INTO price_history (game_id, recorded_at, store_id, sale_cents, retail_cents) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (game_id, now, observation["store_id"], sale, retail),
+        )
+
+    # alerted_cents is the lowest price announced during the current sale; cleared when the sale ends
+    alerted = latest[2] if latest else None
+    alert = None
+    if sale >= retail:
+        alerted = None
+    elif alerted is None or sale < alerted:
+        alert = "new" if alerted is None else "deeper"
+        alerted = sale
+
+    conn.execute('''
+        INSERT INTO price_latest (game_id, store_id, sale_cents, retail_cents, deal_id, checked_at, changed_at, alerted_cents)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (game_id) DO UPDATE SET
+            store_id = excluded.store_id, sale_cents = excluded.sale_cents, retail_cents = excluded.retail_cents,
+            deal_id = excluded.deal_id, checked_at = excluded.checked_at,
+            changed_at = COALESCE(excluded.changed_at, changed_at), alerted_cents = excluded.alerted_cents
+    ''', (game_id, observation["store_id"], sale, retail, observation["deal_id"], now,
+          now if changed else None, alerted))
+
+    conn.execute('''
+        INSERT INTO price_daily (game_id, day, min_cents, max_cents, close_cents, retail_cents)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (game_id, day) DO UPDATE SET
+            min_cents = MIN(min_cents, excluded.min_cents), max_cents = MAX(max_cents, excluded.max_cents),
+            close_cents = excluded.close_cents, retail_cents = excluded.retail_cents
+    ''', (game_id, now // DAY, sale, sale, sale, retail))
+    return alert
+
+
+def record_prices(conn, observations, now=None):
+    """record_price for a whole scan; returns [(game_id, alert, observation)] for the ones to announce."""
+    now = int(now or time.time())
+    alerts = []
+    for game_id, observation in observations:
+        alert = record_price(conn, game_id, observation, now)
+        if alert:
+            alerts.append((game_id, alert, observation))
+    return alerts
+
+
+def stale_games(conn, max_age, now=None, limit=None, chunk=0, chunks=1, guild_id=None):
+    """Suggested games not checked in the last `max_age` seconds, never-checked and oldest first.
+
+    Rows are (id, guild_id, game_name, cheapshark_id), from every guild unless `guild_id`
+    is given. `chunk`/`chunks` select a stable 1/chunks slice by id, for scans spread over a window.
+    """
+    now = int(now or time.time())
+    sql = '''
+        SELECT gp.id, gp.guild_id, gp.game_name, gp.cheapshark_id FROM game_picks gp
+        LEFT JOIN price_latest pl ON pl.game_id = gp.id
+        WHERE (pl.checked_at IS NULL OR pl.checked_at < ?) AND gp.id % ? = ?
+    '''
+    params = [now - max_age, chunks, chunk]
+    if guild_id is not None:
+        sql += " AND gp.guild_id = ?"
+        params.append(guild_id)
+    sql += " ORDER BY COALESCE(pl.checked_at, 0), gp.id"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def set_cheapshark_ids(conn, pairs):
+    """Store [(game_id, cheapshark_id)] resolved during a scan."""
+    conn.executemany("UPDATE game_picks SET cheapshark_id = ? WHERE id = ?", [(cid, gid) for gid, cid in pairs])
+
+
+def current_sales(conn, guild_id):
+    """A guild's suggested games whose latest known price is below retail, biggest discount first."""
+    return conn.execute('''
+        SELECT gp.id, gp.game_name, pl.sale_cents, pl.retail_cents, pl.deal_id
+        FROM game_picks gp JOIN price_latest pl ON pl.game_id = gp.id
+        WHERE gp.guild_id = ? AND pl.sale_cents < pl.retail_cents
+        ORDER BY 1.0 * pl.sale_cents / pl.retail_cents, gp.id
+    ''', (guild_id,)).fetchall()
+
+
+def chart_version(conn, game_id, now=None):
+    """(version, changed_at) for one game's price charts, which change with no data_changes bump.
+
+    Only the newest day's rollup is ever rewritten, so it and today's date (the window slides
+    at midnight) are the whole version.
+    """
+    today = int(now or time.time()) // DAY
+    latest = conn.execute('''
+        SELECT day, min_cents, max_cents, close_cents, retail_cents FROM price_daily
+        WHERE game_id = ? ORDER BY day DESC LIMIT 1
+    ''', (game_id,)).fetchone() or (0,)
+    changed_at = conn.execute("SELECT changed_at FROM price_latest WHERE game_id = ?", (game_id,)).fetchone()
+    return ".".join(map(str, (today, *latest))), max((changed_at and changed_at[0]) or 0, latest[0] * DAY, today * DAY)
+
+
+def daily_prices(conn, game_id, days=90, now=None):
+    """Daily rollups for the last `days` days, oldest first."""
+    now = int(now or time.time())
+    rows = conn.execute('''
+        SELECT day, min_cents, max_cents, close_cents, retail_cents FROM price_daily
+        WHERE game_id = ? AND day > ? ORDER BY day
+    ''', (game_id, now // DAY - days)).fetchall()
+    return [
+        {"day": day, "min_cents": low, "max_cents": high, "close_cents": close, "retail_cents": retail}
+        for day, low, high, close, retail in rows
+    ]
+
+
+def spark_text(values):
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return "".join(SPARK_BLOCKS[(value - low) * (len(SPARK_BLOCKS) - 1) // span] for value in values)
+
+
+def sparkline_svg(daily, width=160, height=32, pad=2):
+    """Inline SVG of daily lows, with retail as a dashed reference line."""
+    header = f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+    if not daily:
+        return header + "</svg>"
+
+    values = [row["min_cents"] for row in daily] + [row["retail_cents"] for row in daily]
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    first_day = daily[0]["day"]
+    days = max(daily[-1]["day"] - first_day, 1)
+
+    def point(row, key):
+        x = pad + (row["day"] - first_day) * (width - 2 * pad) / days
+        y = height - pad - (row[key] - low) * (height - 2 * pad) / span
+        return f"{x:.1f},{y:.1f}"
+
+    lows = " ".join(point(row, "min_cents") for row in daily)
+    retail = " ".join(point(row, "retail_cents") for row in daily)
+    return (
+        header
+        + f'<polyline points="{retail}" fill="none" stroke="#555" stroke-width="1" stroke-dasharray="3 2"/>'
+        + f'<polyline points="{lows}" fill="none" stroke="#64b5f6" stroke-width="1.5"/>'
+        + "</svg>"
+    )
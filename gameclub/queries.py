@@ -0,0 +1,115 @@
+import base64
+import json
+
+# Public name -> table
+SOURCES = {"games": "game_picks", "archive": "archived_games"}
+
+# Public field name -> SQL expression
+FIELDS = {
+    "id": "id",
+    "user": "user",
+    "game_name": "game_name",
+    "genres": "genres",
+    "release_ts": "release_ts",
+    "summary": "summary",
+    # What list views actually show; saves shipping whole summaries around
+    "excerpt": "CASE WHEN length(summary) > 150 THEN substr(summary, 1, 150) || '...' ELSE summary END",
+    "url": "url",
+    "igdb_id": "igdb_id",
+    "cover_id": "cover_id",
+    "platforms": "platforms",
+    "slug": "slug",
+}
+DEFAULT_FIELDS = ("id", "user", "game_name", "genres", "release_ts", "excerpt", "url")
+
+# Sort name -> expression; id is always the tie-breaker so every key is unique
+SORTS = {
+    "id": "id",
+    "name": "title_key",
+    "release": "COALESCE(release_ts, 0)",
+    "user": "user",
+}
+
+MAX_LIMIT = 100
+
+
+class QueryError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise QueryError("invalid cursor")
+
+
+def parse_fields(fields):
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    names = fields.split(",") if isinstance(fields, str) else list(fields)
+    names = [name.strip() for name in names if name.strip()]
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise QueryError(f"unknown field(s): {', '.join(unknown)}")
+    return names
+
+
+def page_games(conn, guild_id, source="games", user=None, genre=None, sort="id", order="desc",
+               after=None, limit=20, fields=None):
+    """One keyset page of a guild's suggestions or archived picks.
+
+    Returns {"items": [...], "next": cursor or None}; pass `next` back as `after`
+    to continue. Cost is independent of how deep into the list the page is.
+    """
+    if source not in SOURCES:
+        raise QueryError(f"unknown source: {source}")
+    if sort not in SORTS:
+        raise QueryError(f"unknown sort: {sort}")
+    if order not in ("asc", "desc"):
+        raise QueryError("order must be asc or desc")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    names = parse_fields(fields)
+
+    sort_expr = SORTS[sort]
+    select = [f"{FIELDS[name]} AS {name}" for name in names]
+    select += [f"{sort_expr} AS _sort", "id AS _id"]
+
+    # Every sort has a (guild_id, expression, id) index
+    where, params = ["guild_id = ?"], [guild_id]
+    if user:
+        where.append("user = ?")
+        params.append(user)
+    if genre:
+        where.append("(', ' || genres || ',') LIKE ?")
+        params.append(f"%, {genre},%")
+    if after:
+        sort_value, row_id = decode_cursor(after)
+        op = "<" if order == "desc" else ">"
+        # Spelled out rather than as a row value so SQLite can seek expression indexes too
+        where.append(f"{sort_expr} {op}= ? AND ({sort_expr} {op} ? OR id {op} ?)")
+        params += [sort_value, sort_value, row_id]
+
+    sql = f"SELECT {', '.join(select)} FROM {SOURCES[source]} WHERE {' AND '.join(where)}"
+    sql += f" ORDER BY {sort_expr} {order.upper()}, id {order.upper()} LIMIT ?"
+    params.append(limit + 1)
+
+    cur = conn.execute(sql, params)
+    columns = [col[0] for col in cur.description]
+    rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["_sort"], rows[-1]["_id"])
+    for row in rows:
+        del row["_sort"], row["_id"]
+    return {"items": rows, "next": next_cursor}
@@ -0,0 +1,262 @@
+"""Whose turn it is to pick, per guild.
+
+Members sit in a persisted queue (rotation_members, ordered by position) with a
+pointer to their oldest suggestion, kept current by triggers. Choosing the next
+pick only looks at members who have a suggestion, never at the library itself.
+
+Every draw (a pick or a skip) is logged with the exact inputs it was made from.
+Random modes seed their generator from (seed, draw number), so replaying the log
+through choose() must give the same member each time. verify() checks that, and
+that each logged snapshot matches what the earlier events and the suggestion tables
+say it should have been.
+"""
+import json
+import random
+import time
+
+MODES = ("round_robin", "weighted", "random")
+
+
+class RotationError(ValueError):
+    pass
+
+
+def choose(mode, members, cursor, seed, draw):
+    """Pick from `members`: [(position, user, weight, deferred_until)] of everyone with a suggestion.
+
+    Returns (user, new_cursor). Round robin starts at the first position >= cursor and
+    wraps; members deferred past this draw are stepped over but hold the cursor, so they
+    go next. The random modes ignore order and draw with a generator seeded by (seed, draw).
+    """
+    if not members:
+        return None, cursor
+    members = sorted(members)
+
+    if mode == "round_robin":
+        start = next((i for i, m in enumerate(members) if m[0] >= cursor), 0)
+        ordered = members[start:] + members[:start]
+        held = None
+        for member in ordered:
+            if member[3] <= draw:
+                return member[1], held[0] if held else member[0] + 1
+            held = held or member
+        return ordered[0][1], ordered[0][0] + 1
+
+    waiting = [m for m in members if m[3] <= draw] or members
+    rng = random.Random(f"{seed}:{draw}")
+    if mode == "random":
+        return rng.choice(waiting)[1], cursor
+    if mode == "weighted":
+        # Weight 0 sits a member out, unless everyone left is at 0
+        pool = [m for m in waiting if m[2] > 0] or waiting
+        return rng.choices(pool, weights=[m[2] or 1 for m in pool])[0][1], cursor
+    raise RotationError(f"unknown mode: {mode}")
+
+
+def state(conn, guild_id):
+    """(mode, seed, cursor, draws) for the guild, creating its row on first use."""
+    conn.execute(
+        "INSERT OR IGNORE INTO rotation_state (guild_id, seed) VALUES (?, abs(random()) % 2147483647)", (guild_id,)
+    )
+    return conn.execute(
+        "SELECT mode, seed, cursor, draws FROM rotation_state WHERE guild_id = ?", (guild_id,)
+    ).fetchone()
+
+
+def eligible(conn, guild_id):
+    """[(position, user, weight, deferred_until, next_game_id)] of members with a suggestion waiting."""
+    return conn.execute('''
+        SELECT position, user, weight, deferred_until, next_game_id FROM rotation_members
+        WHERE guild_id = ? AND next_game_id IS NOT NULL ORDER BY position
+    ''', (guild_id,)).fetchall()
+
+
+def _log(conn, guild_id, kind, draw=None, user=None, game_id=None, detail=None):
+    conn.execute(
+        "INSERT INTO rotation_events (guild_id, created_at, kind, draw, user, game_id, detail) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (guild_id, int(time.time()), kind, draw, user, game_id, json.dumps(detail) if detail is not None else None),
+    )
+
+
+def _draw(conn, guild_id, kind):
+    mode, seed, cursor, draws = state(conn, guild_id)
+    members = eligible(conn, guild_id)
+    inputs = [row[:4] for row in members]
+    user, new_cursor = choose(mode, inputs, cursor, seed, draws)
+    if user is None:
+        return None
+    game_id = next(row[4] for row in members if row[1] == user)
+    conn.execute(
+        "UPDATE rotation_state SET cursor = ?, draws = draws + 1 WHERE guild_id = ?", (new_cursor, guild_id)
+    )
+    _log(conn, guild_id, kind, draws, user, game_id,
+         {"mode": mode, "seed": seed, "cursor": cursor, "members": [list(m) for m in inputs]})
+    return user, game_id
+
+
+def next_pick(conn, guild_id):
+    """Take the next turn: returns (user, game_id) of the suggestion to play, or None. Call inside a transaction."""
+    return _draw(conn, guild_id, "pick")
+
+
+def skip(conn, guild_id):
+    """Pass over whoever would pick next without using their suggestion; returns (user, game_id) or None."""
+    return _draw(conn, guild_id, "skip")
+
+
+def defer(conn, guild_id, user):
+    """Let `user` sit out the next draw; in round robin they pick straight after it."""
+    _, _, _, draws = state(conn, guild_id)
+    if conn.execute(
+        "UPDATE rotation_members SET deferred_until = ? WHERE guild_id = ? AND user = ?", (draws + 1, guild_id, user)
+    ).rowcount == 0:
+        raise RotationError(f"{user} isn't in the rotation")
+    _log(conn, guild_id, "defer", draws, user)
+
+
+def set_mode(conn, guild_id, mode, seed=None):
+    if mode not in MODES:
+        raise RotationError(f"mode must be one of: {', '.join(MODES)}")
+    state(conn, guild_id)
+    conn.execute(
+        "UPDATE rotation_state SET mode = ?, seed = COALESCE(?, seed) WHERE guild_id = ?", (mode, seed, guild_id)
+    )
+    _log(conn, guild_id, "mode", user=None, detail={"mode": mode, "seed": seed})
+
+
+def set_weight(conn, guild_id, user, weight):
+    if weight < 0:
+        raise RotationError("weight can't be negative")
+    if conn.execute(
+        "UPDATE rotation_members SET weight = ? WHERE guild_id = ? AND user = ?", (weight, guild_id, user)
+    ).rowcount == 0:
+        raise RotationError(f"{user} isn't in the rotation")
+    _log(conn, guild_id, "weight", user=user, detail={"weight": weight})
+
+
+def upcoming(conn, guild_id, count):
+    """The next `count` picks as [(user, game_id, game_name)], without changing anything.
+
+    Simulates the draws on a copy, taking each member's suggestions oldest first.
+    """
+    mode, seed, cursor, draws = state(conn, guild_id)
+    members = {row[1]: list(row[:4]) for row in eligible(conn, guild_id)}
+    queues = {
+        user: conn.execute(
+            "SELECT id, game_name FROM game_picks WHERE guild_id = ? AND user = ? ORDER BY id LIMIT ?",
+            (guild_id, user, count),
+        ).fetchall()
+        for user in members
+    }
+    picks = []
+    while len(picks) < count:
+        inputs = [tuple(m) for m in members.values() if queues[m[1]]]
+        user, cursor = choose(mode, inputs, cursor, seed, draws)
+        if user is None:
+            break
+        game_id, game_name = queues[user].pop(0)
+        picks.append((user, game_id, game_name))
+        draws += 1
+    return picks
+
+
+def _suggestions(conn, guild_id):
+    """{user: [(game_id, suggested_at, id of the event that picked it or None)]} from the tables themselves."""
+    suggestions = {}
+    for user, game_id, suggested_at, picked_by in conn.execute('''
+        SELECT user, id, suggested_at, NULL FROM game_picks WHERE guild_id = ?
+        UNION ALL
+        SELECT a.user, a.id, a.suggested_at, e.id FROM archived_games a
+        JOIN rotation_events e ON e.guild_id = a.guild_id AND e.game_id = a.id AND e.kind = 'pick'
+        WHERE a.guild_id = ?
+    ''', (guild_id, guild_id)):
+        suggestions.setdefault(user, []).append((game_id, suggested_at, picked_by))
+    return suggestions
+
+
+def verify(conn, guild_id):
+    """Audit the draw log; returns (draws checked, [(event id, or None for the current state, problem)]).
+
+    Each draw must replay to the member it logged. Its snapshot must also be the state the
+    earlier events left behind (mode, seed, cursor, draw number, positions, weights and
+    deferrals), everyone with a suggestion in game_picks or archived_games at the time must
+    be in it, and the game it took must have been that member's oldest. Finally the tables
+    must be where the log leaves them.
+    """
+    checked, problems = 0, []
+    suggestions = _suggestions(conn, guild_id)
+    expected = {"mode": "round_robin", "seed": None, "cursor": None, "draw": 0}
+    # user -> [position, weight, deferred_until]; a position is fixed once a member has one
+    members = {}
+    newest_game = 0
+    rows = conn.execute('''
+        SELECT id, created_at, kind, draw, user, game_id, detail FROM rotation_events WHERE guild_id = ? ORDER BY id
+    ''', (guild_id,)).fetchall()
+    for event_id, created_at, kind, draw, user, game_id, detail in rows:
+        detail = json.loads(detail) if detail else {}
+        if kind == "mode":
+            expected["mode"] = detail["mode"]
+            if detail["seed"] is not None:
+                expected["seed"] = detail["seed"]
+            continue
+        if kind == "weight":
+            members.setdefault(user, [None, 1.0, 0])[1] = detail["weight"]
+            continue
+        if kind == "defer":
+            members.setdefault(user, [None, 1.0, 0])[2] = draw + 1
+            continue
+
+        checked += 1
+        found = []
+        for key, logged in (("draw", draw), ("mode", detail["mode"]), ("seed", detail["seed"]), ("cursor", detail["cursor"])):
+            if expected[key] is not None and logged != expected[key]:
+                found.append(f"{key} was {logged}, expected {expected[key]}")
+        snapshot = [tuple(m) for m in detail["members"]]
+        for position, member, weight, deferred_until in snapshot:
+            before = members.setdefault(member, [None, 1.0, 0])
+            if before[0] is not None and position != before[0]:
+                found.append(f"{member} at position {position}, expected {before[0]}")
+            if (weight, deferred_until) != tuple(before[1:]):
+                found.append(f"{member} had weight {weight:g} deferred until {deferred_until}, "
+                             f"expected {before[1]:g} and {before[2]}")
+            members[member] = [position, weight, deferred_until]
+
+        # Ids only grow, so a suggestion older than one already drawn existed by now too
+        newest_game = max(newest_game, game_id or 0)
+        waiting = {m[1] for m in snapshot}
+        for member, games in suggestions.items():
+            if member in waiting and member != user:
+                continue
+            held = [g for g, at, picked_by in games
+                    if (g <= newest_game or (at is not None and at < created_at)) and (picked_by or event_id) >= event_id]
+            if member not in waiting and held:
+                found.append(f"{member} had a suggestion waiting but wasn't in the draw")
+            if member == user and any(g < game_id for g in held):
+                found.append(f"{member} had a suggestion older than game {game_id}")
+
+        chosen, cursor = choose(detail["mode"], snapshot, detail["cursor"], detail["seed"], draw)
+        if chosen != user:
+            found.append(f"replays to {chosen}, logged {user}")
+        problems.extend((event_id, problem) for problem in found)
+        expected.update(mode=detail["mode"], seed=detail["seed"], cursor=cursor, draw=draw + 1)
+
+    current = conn.execute(
+        "SELECT draws, mode, seed, cursor FROM rotation_state WHERE guild_id = ?", (guild_id,)
+    ).fetchone()
+    for key, value in zip(("draw", "mode", "seed", "cursor"), current or ()):
+        if expected[key] is not None and value != expected[key]:
+            problems.append((None, f"{key} is {value}, the log implies {expected[key]}"))
+    for position, member, weight, deferred_until, next_game_id in conn.execute(
+        "SELECT position, user, weight, deferred_until, next_game_id FROM rotation_members WHERE guild_id = ?",
+        (guild_id,),
+    ):
+        implied = members.get(member, [None, 1.0, 0])
+        if implied[0] is not None and position != implied[0]:
+            problems.append((None, f"{member} is at position {position}, the log implies {implied[0]}"))
+        if (weight, deferred_until) != tuple(implied[1:]):
+            problems.append((None, f"{member} has weight {weight:g} deferred until {deferred_until}, "
+                                   f"the log implies {implied[1]:g} and {implied[2]}"))
+        oldest = min((g for g, _, picked_by in suggestions.get(member, ()) if picked_by is None), default=None)
+        if next_game_id != oldest:
+            problems.append((None, f"{member} points at game {next_game_id}, their oldest suggestion is {oldest}"))
+    return checked, problems
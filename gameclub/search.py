@@ -0,0 +1,182 @@
+import re
+
+from gameclub.titles import normalize_title
+
+# rowid layout shared with migrations.search_indexes and guild_search_indexes
+SOURCE_TABLES = ("game_picks", "archived_games")
+SOURCE_NAMES = ("games", "archive")
+
+# A local match at or above this score is worth asking about before adding
+DUPLICATE_THRESHOLD = 0.8
+FUZZY_CANDIDATES = 50
+
+_SUBTITLE = re.compile(r"\s*(?::| - | – | — )\s*")
+
+
+def trigrams(key):
+    # Padded like pg_trgm so word starts and ends count as well
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """Dice coefficient over trigram sets: 1.0 identical, 0.0 nothing in common."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def _strip_article(key):
+    return key[4:] if key.startswith("the ") else key
+
+
+def _numbers(key):
+    return {token for token in key.split() if token.isdigit()}
+
+
+def title_score(query_key, game_name, title_key):
+    """How likely a typed title names a stored game, 0..1."""
+    # Earlier migrations suffix colliding keys with " #id"; compare on the real title
+    title_key = title_key.split(" #")[0]
+    if query_key == title_key:
+        return 1.0
+    # "witcher 3" is how people type "The Witcher 3: Wild Hunt"
+    main_title = _strip_article(normalize_title(_SUBTITLE.split(game_name, maxsplit=1)[0]))
+    if _strip_article(query_key) in (main_title, _strip_article(title_key)):
+        return 0.95
+    score = similarity(_strip_article(query_key), _strip_article(title_key))
+    # Sequels differ by a single character; never let "Witcher 2" match "Witcher 3"
+    if _numbers(query_key) != _numbers(title_key):
+        score *= 0.5
+    return score
+
+
+def _trigram_match(key):
+    grams = {key[i:i + 3] for i in range(len(key) - 2)}
+    return " OR ".join('"' + gram.replace('"', '""') + '"' for gram in sorted(grams))
+
+
+def _guild_match(guild_id, columns, query):
+    # The guild is an indexed column (see migrations.guild_search_indexes), so FTS5 ranks one guild's rows only
+    return f'guild:"<g{int(guild_id)}>" AND {columns}: ({query})'
+
+
+def _hits(conn, index, match, order, columns, sources, limit, extra=(), params=()):
+    """Rows of `sources` behind the best `limit` index hits, best first, in one statement.
+
+    Each hit's row is joined on its id (rowid // 2) instead of being looked up one by one.
+    MATERIALIZED keeps the ranked MATCH from running again for each source table.
+    """
+    parity = "" if len(sources) == len(SOURCE_TABLES) else f"AND rowid % 2 = {SOURCE_TABLES.index(sources[0])}"
+    selects = [
+        f"SELECT hits.rowid, hits.score{''.join(', hits.' + name for name, _ in extra)}, "
+        f"{', '.join('t.' + column for column in columns)} "
+        f"FROM hits JOIN {table} t ON t.id = hits.rowid / 2 WHERE hits.rowid % 2 = {SOURCE_TABLES.index(table)}"
+        for table in sources
+    ]
+    return conn.execute(f'''
+        WITH hits AS MATERIALIZED (
+            SELECT rowid, {order} AS score{''.join(f', {expr} AS {name}' for name, expr in extra)}
+            FROM {index} WHERE {index} MATCH ? {parity} ORDER BY score LIMIT ?
+        )
+        {' UNION ALL '.join(selects)}
+        ORDER BY 2
+    ''', (*params, match, limit)).fetchall()
+
+
+def fuzzy_titles(conn, guild_id, title, limit=5, sources=SOURCE_TABLES, threshold=0.3):
+    """Stored titles in the guild that look like `title`, best first, as dicts with a `score`."""
+    key = normalize_title(title)
+    if len(key) < 3:
+        return []
+
+    # Trigram FTS narrows 100k titles to a few dozen candidates; scoring them is then cheap
+    candidates = _hits(
+        conn, "title_trigrams", _guild_match(guild_id, "title_key", _trigram_match(key)),
+        "bm25(title_trigrams, 1.0, 0.0)", ("id", "user", "game_name", "title_key"), sources, FUZZY_CANDIDATES,
+    )
+    results = []
+    for rowid, _, game_id, user, game_name, title_key in candidates:
+        score = title_score(key, game_name, title_key)
+        if score >= threshold:
+            results.append({
+                "source": SOURCE_NAMES[rowid % 2], "id": game_id, "user": user,
+                "game_name": game_name, "score": round(score, 3),
+            })
+    results.sort(key=lambda match: -match["score"])
+    return results[:limit]
+
+
+def find_duplicate(conn, guild_id, title=None, slug=None, igdb_id=None):
+    """The suggestion with exactly this title, slug or IGDB id in the guild, or None. Never touches the network."""
+    if igdb_id is not None or slug:
+        # Two index seeks; an OR across the (guild_id, ...) indexes scans the whole guild instead
+        row = conn.execute('''
+            SELECT id, user, game_name FROM game_picks WHERE guild_id = ? AND igdb_id = ?
+            UNION ALL
+            SELECT id, user, game_name FROM game_picks WHERE guild_id = ? AND slug = ?
+            LIMIT 1
+        ''', (guild_id, igdb_id, guild_id, slug)).fetchone()
+        if row:
+            return {"source": "games", "id": row[0], "user": row[1], "game_name": row[2], "score": 1.0}
+    if title:
+        row = conn.execute(
+            "SELECT id, user, game_name FROM game_picks WHERE guild_id = ? AND title_key = ?",
+            (guild_id, normalize_title(title)),
+        ).fetchone()
+        if row:
+            return {"source": "games", "id": row[0], "user": row[1], "game_name": row[2], "score": 1.0}
+    return None
+
+
+def similar_suggestion(conn, guild_id, title):
+    """The guild's suggestion that looks most like `title`, or None.
+
+    Only a hint: "Hollow Knight" looks just like "Hollow Knight: Silksong", so the caller
+    asks rather than refusing, and the IGDB id decides once the lookup has resolved it.
+    """
+    matches = fuzzy_titles(conn, guild_id, title, limit=1, sources=("game_picks",), threshold=DUPLICATE_THRESHOLD)
+    return matches[0] if matches else None
+
+
+def _fts_query(text):
+    # Every word must appear; the last one may still be being typed
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = ['"' + word + '"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(conn, guild_id, text, limit=20, highlight=("**", "**")):
+    """Full-text search over names (weighted highest), genres and summaries of a guild's games.
+
+    Falls back to fuzzy title matching when no word matches, so typos still find something.
+    """
+    query = _fts_query(text)
+    results = []
+    if query:
+        rows = _hits(
+            conn, "search_index", _guild_match(guild_id, "{game_name genres summary}", query),
+            "bm25(search_index, 10.0, 3.0, 1.0, 0.0)", ("id", "user", "game_name", "url"), SOURCE_TABLES, limit,
+            extra=(("snippet", "snippet(search_index, 2, ?, ?, '…', 12)"),), params=highlight,
+        )
+        for rowid, _, snippet, game_id, user, game_name, url in rows:
+            results.append({
+                "source": SOURCE_NAMES[rowid % 2], "id": game_id, "user": user,
+                "game_name": game_name, "url": url, "snippet": snippet,
+            })
+    if not results:
+        # Looser than duplicate detection: a rough guess beats an empty result here
+        matches = fuzzy_titles(conn, guild_id, text, limit=limit, threshold=0.15)
+        urls = {}
+        for source, table in zip(SOURCE_NAMES, SOURCE_TABLES):
+            ids = [match["id"] for match in matches if match["source"] == source]
+            if ids:
+                urls[source] = dict(conn.execute(
+                    f"SELECT id, url FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids
+                ).fetchall())
+        results = [dict(match, url=urls[match["source"]].get(match["id"]), snippet=None) for match in matches]
+    return results
@@ -0,0 +1,78 @@
+"""Club statistics, read from the totals triggers keep current (see migrations.stats).
+
+Every query here is a primary-key lookup or a scan of one guild's genres, platforms or
+members, so the cost doesn't grow with the number of games.
+"""
+
+SECTIONS = ("totals", "genres", "platforms", "members")
+
+DAY = 86400
+HOUR = 3600
+
+
+def _average(total, count, unit):
+    return round(total / count / unit, 1) if count else None
+
+
+def totals(conn, guild_id):
+    row = conn.execute(
+        "SELECT suggested, picked, waits, wait_seconds, ttbs, ttb_seconds FROM guild_stats WHERE guild_id = ?",
+        (guild_id,),
+    ).fetchone()
+    suggested, picked, waits, wait_seconds, ttbs, ttb_seconds = row or (0, 0, 0, 0, 0, 0)
+    return {
+        "suggested": suggested,
+        "picked": picked,
+        "waiting": suggested - picked,
+        # Averages only cover games whose dates or time to beat are known; the counts say how many
+        "avg_wait_days": _average(wait_seconds, waits, DAY),
+        "waits_known": waits,
+        "avg_ttb_hours": _average(ttb_seconds, ttbs, HOUR),
+        "ttbs_known": ttbs,
+    }
+
+
+def _tags(conn, kind, guild_id, limit):
+    rows = conn.execute(f'''
+        SELECT t.name, s.suggested, s.picked
+        FROM {kind}_stats s JOIN {kind}s t ON t.id = s.{kind}_id
+        WHERE s.guild_id = ? AND s.suggested > 0
+        ORDER BY s.suggested DESC, s.picked DESC, t.name
+        LIMIT ?
+    ''', (guild_id, limit)).fetchall()
+    return [{"name": name, "suggested": suggested, "picked": picked} for name, suggested, picked in rows]
+
+
+def genres(conn, guild_id, limit=10):
+    return _tags(conn, "genre", guild_id, limit)
+
+
+def platforms(conn, guild_id, limit=10):
+    return _tags(conn, "platform", guild_id, limit)
+
+
+def members(conn, guild_id, limit=20):
+    rows = conn.execute('''
+        SELECT user, suggested, picked, waits, wait_seconds FROM member_stats
+        WHERE guild_id = ? AND suggested > 0
+        ORDER BY suggested DESC, user
+        LIMIT ?
+    ''', (guild_id, limit)).fetchall()
+    return [
+        {"user": user, "suggested": suggested, "picked": picked, "waiting": suggested - picked,
+         "avg_wait_days": _average(wait_seconds, waits, DAY)}
+        for user, suggested, picked, waits, wait_seconds in rows
+    ]
+
+
+def section(conn, name, guild_id, limit=None):
+    if name not in SECTIONS:
+        raise KeyError(name)
+    if name == "totals":
+        return totals(conn, guild_id)
+    reader = {"genres": genres, "platforms": platforms, "members": members}[name]
+    return reader(conn, guild_id) if limit is None else reader(conn, guild_id, limit)
+
+
+def overview(conn, guild_id, limit=10):
+    return {name: section(conn, name, guild_id, None if name == "totals" else limit) for name in SECTIONS}
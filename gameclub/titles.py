@@ -0,0 +1,11 @@
+import re
+import unicodedata
+
+
+def normalize_title(title):
+    """Case-, accent- and punctuation-insensitive key used to spot duplicate titles."""
+    text = unicodedata.normalize("NFKD", title or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.lower().replace("&", " and ")
+    text = re.sub(r"[^\w]+|_", " ", text)
+    return " ".join(text.split())
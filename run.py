@@ -1,36 +1,184 @@
-import threading
-import subprocess
+"""Process supervisor: runs the web tier (gunicorn) and the bot as separate, restartable children.
+
+    python run.py            # both
+    python run.py web        # just the web app, e.g. one container per service
+    python run.py bot
+
+Children that exit or stop answering their health check are restarted with backoff.
+SIGTERM/SIGINT is passed on to every child, which then gets SHUTDOWN_TIMEOUT seconds to
+finish before being killed.
+"""
+import logging
 import os
 import signal
+import subprocess
 import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WEB_BIND = os.getenv("WEB_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "4"))
+# gthread keeps the per-worker caches warm across many threads and leaves room for /events streams;
+# "sync" works too, just without live updates
+WEB_WORKER_CLASS = os.getenv("WEB_WORKER_CLASS", "gthread")
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", "60"))
+# The bot's health check rides on its metrics server; METRICS_PORT=0 leaves it unchecked
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "15"))
+# Bot login and the first migration can take a while; don't judge a child before this
+HEALTH_GRACE = float(os.getenv("HEALTH_GRACE", "60"))
+HEALTH_FAILURES = int(os.getenv("HEALTH_FAILURES", "3"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+MAX_BACKOFF = 60
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+logger = logging.getLogger("gameclub.supervisor")
+
+
+def local_url(bind, path):
+    host, _, port = bind.rpartition(":")
+    if host in ("", "0.0.0.0", "[::]", "::"):
+        host = "127.0.0.1"
+    return f"http://{host}:{port}{path}"
+
+
+def web_command():
+    command = [
+        sys.executable, "-m", "gunicorn", "web_app.wsgi:app",
+        "--bind", WEB_BIND,
+        "--workers", str(WEB_WORKERS),
+        "--worker-class", WEB_WORKER_CLASS,
+        "--timeout", str(WEB_TIMEOUT),
+        "--graceful-timeout", str(int(SHUTDOWN_TIMEOUT)),
+    ]
+    if WEB_WORKER_CLASS == "gthread":
+        command += ["--threads", str(WEB_THREADS)]
+    return command
+
+
+class Child:
+    def __init__(self, name, command, health_url=None, env=None):
+        self.name = name
+        self.command = command
+        self.health_url = health_url
+        self.env = env
+        self.process = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restarts = 0
+        self.next_start = 0.0
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        logger.info("Starting %s: %s", self.name, " ".join(self.command))
+        self.process = subprocess.Popen(self.command, cwd=BASE_DIR, env=self.env)
+        self.started_at = time.monotonic()
+        self.failures = 0
+
+    def healthy(self):
+        if self.health_url is None:
+            return True
+        try:
+            with urllib.request.urlopen(self.health_url, timeout=5) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def signal(self, signum):
+        if self.running:
+            self.process.send_signal(signum)
+
+    def backoff(self):
+        # A child that ran for a while before dying starts over at one second
+        if time.monotonic() - self.started_at > MAX_BACKOFF:
+            self.restarts = 0
+        delay = min(2 ** self.restarts, MAX_BACKOFF)
+        self.restarts += 1
+        return delay
+
+
+class Supervisor:
+    def __init__(self, children):
+        self.children = children
+        self.stopping = threading.Event()
+
+    def handle_signal(self, signum, frame):
+        logger.info("Received %s, shutting down", signal.Signals(signum).name)
+        self.stopping.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+        for child in self.children:
+            child.start()
+        last_check = time.monotonic()
+
+        while not self.stopping.wait(1):
+            now = time.monotonic()
+            check = now - last_check >= HEALTH_INTERVAL
+            if check:
+                last_check = now
+            for child in self.children:
+                if not child.running:
+                    if child.process is not None:
+                        delay = child.backoff()
+                        logger.warning("%s exited with %s; restarting in %ds", child.name, child.process.returncode, delay)
+                        child.process = None
+                        child.next_start = now + delay
+                    if now >= child.next_start:
+                        child.start()
+                elif check and now - child.started_at > HEALTH_GRACE and not child.healthy():
+                    child.failures += 1
+                    logger.warning("%s failed its health check (%d/%d)", child.name, child.failures, HEALTH_FAILURES)
+                    if child.failures >= HEALTH_FAILURES:
+                        self.terminate(child)
+                elif check:
+                    child.failures = 0
+
+        for child in self.children:
+            child.signal(signal.SIGTERM)
+        for child in self.children:
+            self.wait(child)
+        logger.info("Shutdown complete")
+
+    def terminate(self, child):
+        logger.warning("Restarting unhealthy %s", child.name)
+        child.signal(signal.SIGTERM)
+        self.wait(child)
+
+    def wait(self, child):
+        if child.process is None:
+            return
+        try:
+            child.process.wait(SHUTDOWN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning("%s did not stop within %ss; killing it", child.name, SHUTDOWN_TIMEOUT)
+            child.process.kill()
+            child.process.wait()
+
+
+def build_children(role):
+    children = []
+    if role in ("web", "all"):
+        env = dict(os.environ, WEB_WORKER_CLASS=WEB_WORKER_CLASS)
+        children.append(Child("web", web_command(), local_url(WEB_BIND, "/healthz"), env))
+    if role in ("bot", "all"):
+        health = f"http://127.0.0.1:{METRICS_PORT}/healthz" if METRICS_PORT else None
+        children.append(Child("bot", [sys.executable, os.path.join("bot", "bot.py")], health))
+    return children
+
 
-def run_flask():
-    # Run the Flask app using Gunicorn in production mode
-    subprocess.run([
-        sys.executable, "-m", "gunicorn",
-        "-w", "4",
-        "-b", "0.0.0.0:5000",
-        "wsgi:app"
-    ])
-
-# Start Flask server in a thread
-flask_thread = threading.Thread(target=run_flask)
-flask_thread.daemon = True  # Let it shut down automatically with the main program
-flask_thread.start()
-
-# Start the bot process
-bot_process = subprocess.Popen(
-    [sys.executable, "bot/bot.py"],
-    stdout=sys.stdout,
-    stderr=sys.stderr
-)
-
-try:
-    bot_process.wait()
-except KeyboardInterrupt:
-    print("\n[!] Shutting down...")
-    bot_process.send_signal(signal.SIGINT)
-    bot_process.terminate()
-    bot_process.wait()
-    print("[✓] Shutdown complete.")
-    sys.exit(0)
+if __name__ == "__main__":
+    role = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if role not in ("web", "bot", "all"):
+        sys.exit(f"usage: {sys.argv[0]} [web|bot|all]")
+    Supervisor(build_children(role)).run()
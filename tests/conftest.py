@@ -0,0 +1,17 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# The bot's modules import each other top-level, as they do when bot.py runs from bot/
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bot"))
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    yield conn
+    conn.close()
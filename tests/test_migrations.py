@@ -0,0 +1,67 @@
+import sqlite3
+
+from gameclub import migrations
+
+
+def schema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def seed_baseline(conn):
+    # What the bot left behind before migrations existed: no user_version, text release dates
+    migrations.baseline(conn)
+    conn.executemany(
+        "INSERT INTO game_picks (user, game_name, genres, release_date, summary, url) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("alice", "Hollow Knight", "Platform, Adventure", "2017-02-24", "Bugs.", "https://www.igdb.com/games/hollow-knight"),
+            ("bob", "Outer Wilds", "Adventure", "1559174400", "Space.", "https://www.igdb.com/games/outer-wilds"),
+            ("alice", "Celeste", "Platform", "Unknown", None, None),
+            ("carol", "Hades", "Roguelike", "2020-09-17", "Greek.", "https://www.igdb.com/games/hades"),
+        ],
+    )
+    conn.execute("INSERT INTO archived_games SELECT * FROM game_picks WHERE user = 'carol'")
+    conn.execute("DELETE FROM game_picks WHERE user = 'carol'")
+    conn.execute("INSERT INTO picked_users (user) VALUES ('alice')")
+
+
+def test_migrates_baseline_to_head(conn):
+    seed_baseline(conn)
+    assert migrations.current_version(conn) == 0
+
+    assert migrations.migrate(conn) == migrations.LATEST
+
+    rows = conn.execute("SELECT user, game_name, title_key, release_ts FROM game_picks ORDER BY id").fetchall()
+    assert rows == [
+        ("alice", "Hollow Knight", "hollow knight", 1487894400),
+        ("bob", "Outer Wilds", "outer wilds", 1559174400),
+        ("alice", "Celeste", "celeste", None),
+    ]
+    assert conn.execute("SELECT game_name FROM archived_games").fetchall() == [("Hades",)]
+    # alice had already picked, so the rotation carries on from bob
+    members = conn.execute("SELECT user, position, next_game_id FROM rotation_members ORDER BY position").fetchall()
+    assert members == [("alice", 1, 1), ("bob", 2, 2)]
+    assert conn.execute("SELECT cursor FROM rotation_state").fetchone() == (2,)
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+
+
+def test_migrate_twice_changes_nothing(conn):
+    seed_baseline(conn)
+    migrations.migrate(conn)
+    before = schema(conn), conn.execute("SELECT * FROM game_picks ORDER BY id").fetchall()
+
+    assert migrations.migrate(conn) == migrations.LATEST
+    assert (schema(conn), conn.execute("SELECT * FROM game_picks ORDER BY id").fetchall()) == before
+
+
+def test_fresh_database_matches_migrated_one(conn):
+    seed_baseline(conn)
+    migrations.migrate(conn)
+    fresh = sqlite3.connect(":memory:", isolation_level=None)
+    assert migrations.migrate(fresh) == migrations.LATEST
+    assert [row[:2] for row in schema(fresh)] == [row[:2] for row in schema(conn)]
+    fresh.close()
+
+
+def test_versions_are_sequential():
+    assert [version for version, _, _ in migrations.MIGRATIONS] == list(range(1, migrations.LATEST + 1))
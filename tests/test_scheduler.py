@@ -0,0 +1,45 @@
+import datetime
+
+import pytest
+
+from scheduler import CronSchedule
+
+
+def at(*args):
+    return datetime.datetime(*args)
+
+
+@pytest.mark.parametrize("expr, after, expected", [
+    ("* * * * *", at(2026, 3, 1, 12, 0, 30), at(2026, 3, 1, 12, 1)),
+    ("0 * * * *", at(2026, 3, 1, 12, 0), at(2026, 3, 1, 13, 0)),
+    ("*/15 * * * *", at(2026, 3, 1, 12, 7), at(2026, 3, 1, 12, 15)),
+    ("5/20 * * * *", at(2026, 3, 1, 12, 26), at(2026, 3, 1, 12, 45)),
+    ("0 9-17/4 * * *", at(2026, 3, 1, 13, 30), at(2026, 3, 1, 17, 0)),
+    ("30 8 * * 1,3", at(2026, 3, 1, 9, 0), at(2026, 3, 2, 8, 30)),
+    ("0 0 * * 7", at(2026, 3, 1, 0, 0), at(2026, 3, 8, 0, 0)),
+    ("0 0 1 * *", at(2026, 12, 15, 0, 0), at(2027, 1, 1, 0, 0)),
+    ("0 12 31 * *", at(2026, 4, 1, 0, 0), at(2026, 5, 31, 12, 0)),
+    ("0 0 29 2 *", at(2026, 3, 1, 0, 0), at(2028, 2, 29, 0, 0)),
+    # Both day fields restricted: either one matches, as in cron
+    ("0 0 13 * 5", at(2026, 3, 1, 0, 0), at(2026, 3, 6, 0, 0)),
+])
+def test_next_after(expr, after, expected):
+    assert CronSchedule(expr).next_after(after) == expected
+
+
+def test_next_after_is_strictly_later():
+    schedule = CronSchedule("30 8 * * *")
+    first = schedule.next_after(at(2026, 3, 1, 8, 29, 59))
+    assert first == at(2026, 3, 1, 8, 30)
+    assert schedule.next_after(first) == at(2026, 3, 2, 8, 30)
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 24 * * *", "0 0 0 * *", "*/0 * * * *", "0 0 5-1 * *"])
+def test_rejects_bad_expressions(expr):
+    with pytest.raises(ValueError):
+        CronSchedule(expr)
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(at(2026, 1, 1))
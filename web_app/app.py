@@ -1,50 +1,423 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request, make_response, jsonify, g, abort, send_file
 import sqlite3
 import os
-from datetime import datetime
+import json
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+from datetime import datetime, timezone
+from functools import wraps
+from markupsafe import escape, Markup
+from gameclub import covers, guilds, migrations, notify, prices, queries, search, stats
+from gameclub.metrics import CONTENT_TYPE, SamplingProfiler, registry
+from web_app.assets import Assets
+from web_app.render_cache import RenderCache
 
-app = Flask(__name__, template_folder="templates", static_folder="static")
+# Static files are served by static_file() below, under fingerprinted names
+app = Flask(__name__, template_folder="templates", static_folder=None)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "../db/gameclub.db")
+DB_PATH = os.getenv("GAMECLUB_DB_PATH", os.path.join(BASE_DIR, "../db/gameclub.db"))
+# Every club's pages live under /g/<guild id>/; the bare paths show this guild's
+DEFAULT_GUILD_ID = int(os.getenv("GAMECLUB_DEFAULT_GUILD_ID", "0"))
+# Filled by the bot (see gameclub.covers); the web app only reads, and bumps mtimes for LRU
+COVER_DIR = os.getenv("GAMECLUB_COVER_DIR", os.path.join(BASE_DIR, "../db/covers"))
+COVER_TYPES = {"webp": "image/webp", "jpg": "image/jpeg", "png": "image/png"}
+IMMUTABLE_SECONDS = 365 * 86400
 
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
-@app.route("/")
-def home():
-    conn = get_db_connection()
+# Both the bot and the web app bring the schema up to date; whichever starts first does the work
+_conn = get_db_connection()
+migrations.migrate(_conn)
+_conn.close()
+
+# One read-only connection per worker thread, kept for the life of the worker
+_local = threading.local()
+
+def get_read_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{os.path.abspath(DB_PATH)}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+    return conn
+
+render_cache = RenderCache()
+
+assets = Assets(os.path.join(BASE_DIR, "static"))
+app.jinja_env.globals["asset_url"] = assets.url
+
+# The bot announces every write on a per-worker socket; started on the first request so each
+# forked gunicorn worker binds its own
+_subscriber_lock = threading.Lock()
+_subscriber = None
+
+def get_subscriber():
+    global _subscriber
+    if _subscriber is None or _subscriber.pid != os.getpid():
+        with _subscriber_lock:
+            if _subscriber is None or _subscriber.pid != os.getpid():
+                subscriber = notify.Subscriber()
+                try:
+                    subscriber.start()
+                except OSError as e:
+                    app.logger.warning("Change notifications unavailable, polling data_version: %s", e)
+                render_cache.subscriber = subscriber
+                _subscriber = subscriber
+    return _subscriber
+
+# Live updates hold a thread per open page, so they're only offered by worker classes with threads to spare
+WORKER_CLASS = os.getenv("WEB_WORKER_CLASS", "gthread")
+LIVE_UPDATES = WORKER_CLASS in ("gthread", "gevent", "eventlet")
+EVENT_STREAM_SECONDS = 55
+EVENT_KEEPALIVE_SECONDS = 15
+# Under gthread each stream pins one of the worker's threads; past this many, pages go without
+# live updates so ordinary requests and /healthz always have threads left
+EVENT_STREAMS = int(os.getenv(
+    "EVENT_STREAMS", str(max(1, int(os.getenv("WEB_THREADS", "8")) // 2)) if WORKER_CLASS == "gthread" else "1000"
+))
+_event_slots = threading.BoundedSemaphore(EVENT_STREAMS)
+
+REQUEST_SECONDS = registry.histogram(
+    "gameclub_web_request_seconds", "Web request duration", ("endpoint", "method", "status")
+)
+RENDER_SECONDS = registry.histogram("gameclub_web_render_seconds", "Time rendering a page body", ("endpoint",))
+RENDER_CACHE = registry.counter("gameclub_web_render_cache_total", "Cached page outcomes", ("endpoint", "result"))
+EVENT_STREAMS_REFUSED = registry.counter(
+    "gameclub_web_event_streams_refused_total", "Live update streams turned away at the per-worker cap"
+)
+
+# /metrics and /debug/* answer only these addresses; each worker process reports its own numbers
+METRICS_ALLOW = set(os.getenv("METRICS_ALLOW", "127.0.0.1,::1").split(","))
+profiler = SamplingProfiler()
+
+@app.before_request
+def start_timer():
+    g.started_at = time.perf_counter()
+    get_subscriber()
+
+@app.after_request
+def record_request(response):
+    started = g.pop("started_at", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code,
+        )
+    return response
+
+def cached_page(mimetype="text/html", version=None):
+    """Serve a page from memory until the data changes, and answer revalidations with 304.
+
+    `version(conn, **kwargs)` -> (version, changed_at timestamp) replaces data_changes for
+    pages that depend on something it doesn't track.
+    """
+    def decorator(view):
+        return _cached(view, mimetype, version)
+    return decorator
+
+def _cached(view, mimetype, version_of):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        conn = get_read_connection()
+        if version_of is None:
+            version, changed_at = render_cache.data_version(conn)
+        else:
+            version, changed_at = version_of(conn, *args, **kwargs)
+            changed_at = datetime.fromtimestamp(changed_at, timezone.utc)
+        # Pages link fingerprinted assets, so a deploy that changes one has to change the page too
+        changed_at = max(changed_at, datetime.fromtimestamp(assets.modified_at, timezone.utc))
+        # Query strings are part of the page (filters, cursors), so they're part of the tag
+        etag = f"{request.endpoint}-{version}-{assets.version}-{zlib.crc32(request.query_string):x}"
+
+        if request.if_none_match.contains(etag) or (
+            not request.if_none_match and request.if_modified_since and changed_at <= request.if_modified_since
+        ):
+            response = make_response("", 304)
+            RENDER_CACHE.inc(endpoint=request.endpoint, result="not_modified")
+        else:
+            key = request.full_path
+            body = render_cache.get(key, version)
+            if body is None:
+                with RENDER_SECONDS.time(endpoint=request.endpoint):
+                    body = view(conn, *args, **kwargs)
+                render_cache.put(key, version, body)
+                RENDER_CACHE.inc(endpoint=request.endpoint, result="miss")
+            else:
+                RENDER_CACHE.inc(endpoint=request.endpoint, result="hit")
+            response = make_response(body)
+            response.mimetype = mimetype
+
+        response.set_etag(etag)
+        response.last_modified = changed_at
+        # Let browsers keep the page but check back every time; the check is a cheap 304
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+def internal_only():
+    if request.remote_addr not in METRICS_ALLOW:
+        abort(404)
+
+@app.route("/metrics")
+def metrics():
+    internal_only()
+    return registry.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+@app.route("/debug/profile", methods=["POST"])
+def debug_profile():
+    # POST ?action=start, then ?action=stop to get collapsed stacks of this worker's request threads
+    internal_only()
+    if request.args.get("action") == "start":
+        started = profiler.start(all_threads=True)
+        return ("started\n", 200) if started else ("already running\n", 409)
+    if not profiler.stop():
+        return "not running\n", 409
+    return profiler.collapsed(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+@app.route("/healthz")
+def healthz():
+    try:
+        get_read_connection().execute("SELECT 1").fetchone()
+    except sqlite3.Error as e:
+        return f"database unavailable: {e}\n", 503
+    return "ok\n"
+
+def immutable(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_SECONDS
+    response.cache_control.immutable = True
+    return response
+
+@app.route("/static/<path:name>")
+def static_file(name):
+    asset, fingerprinted = assets.get(name)
+    if asset is None:
+        abort(404)
+    if request.if_none_match.contains(asset.digest):
+        response = make_response("", 304)
+    else:
+        response = make_response(asset.body)
+        response.mimetype = asset.mimetype
+    response.set_etag(asset.digest)
+    if fingerprinted:
+        return immutable(response)
+    # Plain names still work for old links, but are checked on every use
+    response.cache_control.no_cache = True
+    return response
+
+@app.route("/covers/<name>")
+def cover_image(name):
+    # Names are content hashes, so a file never changes once it exists
+    match = covers.NAME_RE.match(name)
+    path = covers.file_path(COVER_DIR, name)
+    if not match or not os.path.exists(path):
+        abort(404)
+    covers.touch(path)
+    return immutable(send_file(path, mimetype=COVER_TYPES[match.group(3)], etag=name, max_age=IMMUTABLE_SECONDS))
+
+def cover_urls(conn, rows):
+    """Set row["cover"] to {size: url} (or None) for rows carrying a cover_id."""
+    found = covers.lookup(conn, [row.get("cover_id") for row in rows])
+    for row in rows:
+        names = found.get(row.get("cover_id"))
+        row["cover"] = {size: f"/covers/{name}" for size, name in names.items()} if names else None
+    return rows
+
+def guild_routes(rule, **options):
+    """Register a view at `rule` for the default guild and at /g/<guild_id>`rule` for any guild."""
+    def decorator(view):
+        app.route(rule, defaults={"guild_id": DEFAULT_GUILD_ID}, **options)(view)
+        return app.route(f"/g/<int:guild_id>{rule}", **options)(view)
+    return decorator
+
+def guild_version(conn, guild_id):
+    row = conn.execute("SELECT version FROM guild_changes WHERE guild_id = ?", (guild_id,)).fetchone()
+    return row[0] if row else 0
+
+@guild_routes("/events")
+def events(guild_id):
+    """Server-sent events: one `change` event each time the bot commits something visible in this guild."""
+    subscriber = get_subscriber()
+    if not LIVE_UPDATES or not subscriber.active:
+        return "", 204
+    # 204 tells EventSource to stop reconnecting, so a refused page just doesn't live-update
+    if not _event_slots.acquire(blocking=False):
+        EVENT_STREAMS_REFUSED.inc()
+        return "", 204
+    try:
+        version = guild_version(get_read_connection(), guild_id)
+    except Exception:
+        _event_slots.release()
+        raise
+
+    def stream(version):
+        # Browsers reconnect on their own; short-lived streams keep a worker from being pinned forever
+        deadline = time.monotonic() + EVENT_STREAM_SECONDS
+        yield "retry: 5000\n\n"
+        while time.monotonic() < deadline:
+            latest = subscriber.wait_for_guild(guild_id, version, EVENT_KEEPALIVE_SECONDS)
+            if latest <= version:
+                # A lost datagram only delays the event to the next keepalive
+                latest = guild_version(get_read_connection(), guild_id)
+            if latest > version:
+                version = latest
+                yield f"event: change\ndata: {version}\n\n"
+            else:
+                yield ": keepalive\n\n"
+
+    response = Response(stream(version), mimetype="text/event-stream")
+    # Runs when the stream ends or the client goes away, whether or not it was ever iterated
+    response.call_on_close(_event_slots.release)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.context_processor
+def guild_context():
+    # Links in the templates stay inside whichever guild's pages the visitor is on
+    args = request.view_args or {}
+    if "guild_id" not in args:
+        return {}
+    base = f"/g/{args['guild_id']}" if request.path.startswith("/g/") else ""
+    return {"base": base, "guild_name": guilds.guild_name(get_read_connection(), args["guild_id"])}
+
+def format_release(ts):
+    return datetime.utcfromtimestamp(ts).strftime("%B %d, %Y") if ts is not None else "Unknown"
+
+@app.errorhandler(queries.QueryError)
+def bad_query(e):
+    return jsonify(error=str(e)), 400
+
+def page_args(guild_id, source):
+    args = request.args
+    return dict(
+        guild_id=guild_id,
+        source=source,
+        user=args.get("user") or None,
+        genre=args.get("genre") or None,
+        sort=args.get("sort", "id"),
+        order=args.get("order", "desc"),
+        after=args.get("after") or None,
+        limit=args.get("limit", 20, type=int),
+        fields=args.get("fields"),
+    )
+
+@guild_routes("/")
+@cached_page()
+def home(conn, guild_id):
     game = conn.execute("""
-        SELECT ag.user, ag.game_name, ag.genres, ag.release_date, ag.summary, ag.url
+        SELECT ag.id, ag.user, ag.game_name, ag.genres, ag.release_ts, ag.summary, ag.url, ag.cover_id
         FROM current_game cg
         JOIN archived_games ag ON cg.game_id = ag.id
-        LIMIT 1
-    """).fetchone()
-    conn.close()
+        WHERE cg.guild_id = ?
+    """, (guild_id,)).fetchone()
 
-    if game and str(game["release_date"]).isdigit():
+    if game:
         game = dict(game)
-        game["release_date"] = datetime.utcfromtimestamp(int(game["release_date"])).strftime("%B %d, %Y")
+        game["release_date"] = format_release(game["release_ts"])
+        cover_urls(conn, [game])
 
     return render_template("home.html", game=game)
 
-@app.route("/games")
-def games():
-    conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT user, game_name, genres, release_date, summary, url
-        FROM game_picks
-        ORDER BY id DESC
-    """).fetchall()
-    conn.close()
-
-    formatted_rows = []
-    for row in rows:
-        row = dict(row)
-        if row["release_date"] and str(row["release_date"]).isdigit():
-            row["release_date"] = datetime.utcfromtimestamp(int(row["release_date"])).strftime("%B %d, %Y")
-        formatted_rows.append(row)
+# Just what the table shows; full summaries stay on the server
+PAGE_FIELDS = "user,game_name,genres,release_ts,excerpt,url,cover_id"
+
+@guild_routes("/games")
+@cached_page()
+def games(conn, guild_id):
+    # First page is rendered server-side; the page script pulls later ones from /api/games
+    args = page_args(guild_id, "games")
+    args["fields"] = PAGE_FIELDS
+    page = queries.page_games(conn, **args)
+    cover_urls(conn, page["items"])
+    for row in page["items"]:
+        row["release_date"] = format_release(row["release_ts"])
+
+    more_url = None
+    if page["next"]:
+        more_args = {key: value for key, value in request.args.items() if key != "after"}
+        more_url = request.path + "?" + urlencode(dict(more_args, after=page["next"]))
+    return render_template(
+        "games.html", rows=page["items"], next_cursor=page["next"], more_url=more_url,
+        filters=args, page_fields=PAGE_FIELDS,
+    )
+
+def api_page(conn, args):
+    page = queries.page_games(conn, **args)
+    # Asking for cover_id also gets the cached images' URLs
+    if page["items"] and "cover_id" in page["items"][0]:
+        cover_urls(conn, page["items"])
+    return page
+
+@guild_routes("/api/games")
+@cached_page("application/json")
+def api_games(conn, guild_id):
+    return json.dumps(api_page(conn, page_args(guild_id, "games")))
+
+@guild_routes("/api/archive")
+@cached_page("application/json")
+def api_archive(conn, guild_id):
+    return json.dumps(api_page(conn, page_args(guild_id, "archive")))
+
+# Control characters can't occur in stored text, so they mark highlights safely through escaping
+HIGHLIGHT = ("\x02", "\x03")
+
+def highlight(snippet):
+    if not snippet:
+        return ""
+    html = str(escape(snippet))
+    return Markup(html.replace(HIGHLIGHT[0], "<mark>").replace(HIGHLIGHT[1], "</mark>"))
+
+@guild_routes("/search")
+@cached_page()
+def search_page(conn, guild_id):
+    text = request.args.get("q", "").strip()
+    results = search.search(conn, guild_id, text, limit=50, highlight=HIGHLIGHT) if text else []
+    for result in results:
+        result["snippet"] = highlight(result["snippet"])
+    return render_template("search.html", q=text, results=results)
+
+@guild_routes("/api/search")
+@cached_page("application/json")
+def api_search(conn, guild_id):
+    text = request.args.get("q", "").strip()
+    limit = max(1, min(request.args.get("limit", 20, type=int), queries.MAX_LIMIT))
+    return json.dumps({"items": search.search(conn, guild_id, text, limit=limit) if text else []})
+
+@guild_routes("/stats")
+@cached_page()
+def stats_page(conn, guild_id):
+    return render_template("stats.html", stats=stats.overview(conn, guild_id, limit=15))
+
+@guild_routes("/api/stats")
+@cached_page("application/json")
+def api_stats(conn, guild_id):
+    limit = max(1, min(request.args.get("limit", 10, type=int), queries.MAX_LIMIT))
+    return json.dumps(stats.overview(conn, guild_id, limit))
+
+@guild_routes("/api/stats/<section>")
+@cached_page("application/json")
+def api_stats_section(conn, guild_id, section):
+    if section not in stats.SECTIONS:
+        abort(404)
+    limit = max(1, min(request.args.get("limit", 10, type=int), queries.MAX_LIMIT))
+    return json.dumps(stats.section(conn, section, guild_id, limit))
+
+# Game ids are unique across guilds, so price charts need no guild in the path
+@app.route("/prices/<int:game_id>.svg")
+@cached_page("image/svg+xml", prices.chart_version)
+def price_sparkline(conn, game_id):
+    days = max(1, min(request.args.get("days", 90, type=int), 365))
+    return prices.sparkline_svg(prices.daily_prices(conn, game_id, days))
 
-    return render_template("games.html", rows=formatted_rows)
+@app.route("/api/prices/<int:game_id>")
+@cached_page("application/json", prices.chart_version)
+def api_prices(conn, game_id):
+    days = max(1, min(request.args.get("days", 90, type=int), 365))
+    return json.dumps({"game_id": game_id, "days": prices.daily_prices(conn, game_id, days)})
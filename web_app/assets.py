@@ -0,0 +1,139 @@
+"""Fingerprinted static files, and the script that puts the site's fonts among them.
+
+Every file under static/ is also served as <name>.<hash><ext>, which templates get from
+asset_url("style.css"). Those names change whenever the content does, so they go out with
+a year-long immutable lifetime. url(...) references inside stylesheets are rewritten to
+fingerprinted names too, so fonts pulled in by CSS are covered as well.
+
+    python -m web_app.assets fonts
+
+downloads the Google Fonts the pages use into static/fonts/ and writes static/fonts.css,
+so browsers never leave the site for them. The Docker image runs it at build time; without
+it pages fall back to the system fonts named in style.css.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+import urllib.error
+import urllib.request
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+URL_RE = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+
+GOOGLE_FONTS_CSS = (
+    "https://fonts.googleapis.com/css2?family=Pacifico&family=Roboto+Mono:ital,wght@0,100..700;1,100..700"
+    "&family=Roboto:ital,wght@0,100..900;1,100..900&family=Special+Gothic+Expanded+One&display=swap"
+)
+# Google serves woff2 only to browsers it recognises
+FONT_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+mimetypes.add_type("font/woff2", ".woff2")
+
+
+class Asset:
+    def __init__(self, name, body):
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, ext = posixpath.splitext(name)
+        self.fingerprinted = f"{stem}.{self.digest}{ext}"
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class Assets:
+    """Everything in a static directory, read once at startup and kept in memory."""
+
+    def __init__(self, root=STATIC_DIR):
+        self.root = root
+        self.by_name = {}
+        self.by_fingerprint = {}
+        self.version = ""
+        self.modified_at = 0
+        self.load()
+
+    def load(self):
+        names = []
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                names.append(posixpath.relpath(os.path.join(directory, file).replace(os.sep, "/"),
+                                               self.root.replace(os.sep, "/")))
+        # Stylesheets last, so what they reference already has its final name
+        for name in sorted(names, key=lambda name: (name.endswith(".css"), name)):
+            path = os.path.join(self.root, name)
+            with open(path, "rb") as f:
+                body = f.read()
+            self.modified_at = max(self.modified_at, int(os.path.getmtime(path)))
+            if name.endswith(".css"):
+                body = self.rewrite_css(name, body.decode()).encode()
+            asset = Asset(name, body)
+            self.by_name[name] = asset
+            self.by_fingerprint[asset.fingerprinted] = asset
+        # Changes with any asset, so pages naming the old fingerprints aren't revalidated as current
+        self.version = hashlib.sha256(" ".join(sorted(self.by_fingerprint)).encode()).hexdigest()[:8]
+
+    def rewrite_css(self, name, css):
+        def replace(match):
+            ref = match.group(2)
+            if ref.startswith(("data:", "http:", "https:", "/", "#")):
+                return match.group(0)
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(name), ref))
+            asset = self.by_name.get(target)
+            return f'url("/static/{asset.fingerprinted}")' if asset else match.group(0)
+        return URL_RE.sub(replace, css)
+
+    def url(self, name):
+        """Fingerprinted URL for a static file, or None if there's no such file."""
+        asset = self.by_name.get(name)
+        return f"/static/{asset.fingerprinted}" if asset else None
+
+    def get(self, path):
+        """(asset, immutable) for a requested path under /static/, or (None, False)."""
+        if path in self.by_fingerprint:
+            return self.by_fingerprint[path], True
+        return self.by_name.get(path), False
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={"User-Agent": FONT_USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def fetch_fonts(root=STATIC_DIR):
+    """Download the Google Fonts stylesheet and every font it names; returns how many fonts were saved."""
+    css = fetch(GOOGLE_FONTS_CSS).decode()
+    os.makedirs(os.path.join(root, "fonts"), exist_ok=True)
+    saved = {}
+
+    def localize(match):
+        url = match.group(2)
+        name = posixpath.basename(url.split("?", 1)[0])
+        if name not in saved:
+            with open(os.path.join(root, "fonts", name), "wb") as f:
+                f.write(fetch(url))
+            saved[name] = url
+        return f"url(fonts/{name})"
+
+    css = URL_RE.sub(localize, css)
+    with open(os.path.join(root, "fonts.css"), "w") as f:
+        f.write(css)
+    return len(saved)
+
+
+def main(argv):
+    if argv[1:] != ["fonts"]:
+        print("usage: python -m web_app.assets fonts", file=sys.stderr)
+        return 2
+    try:
+        saved = fetch_fonts()
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Could not download fonts: {e}", file=sys.stderr)
+        return 1
+    print(f"Saved {saved} font files to {os.path.join(STATIC_DIR, 'fonts')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
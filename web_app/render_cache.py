@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+class RenderCache:
+    """Rendered pages keyed by URL, valid for as long as the data_changes version stays put.
+
+    Each gunicorn worker holds its own copy; PRAGMA data_version tells a connection whether
+    any other connection has committed since it last looked, so an unchanged database costs
+    one pragma per request instead of a query. With a change `subscriber` running, not even
+    that: the pragma is only re-checked when the bot announces a new version, or every
+    `recheck` seconds in case a notification was lost.
+    """
+
+    def __init__(self, max_entries=256, subscriber=None, recheck=5.0):
+        self.max_entries = max_entries
+        self.subscriber = subscriber
+        self.recheck = recheck
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+        # One read connection per thread, so the data_version we last saw is per thread too
+        self.local = threading.local()
+
+    def data_version(self, conn):
+        """(version, changed_at) for this thread's connection, re-read only after someone else wrote."""
+        state = getattr(self.local, "state", None)
+        now = time.monotonic()
+        subscriber = self.subscriber
+        if (state is not None and subscriber is not None and subscriber.active and now - state[3] < self.recheck
+                and (subscriber.version is None or subscriber.version <= state[1])):
+            return state[1], state[2]
+
+        seen = conn.execute("PRAGMA data_version").fetchone()[0]
+        if state is None or state[0] != seen:
+            version, changed_at = conn.execute("SELECT version, changed_at FROM data_changes WHERE id = 1").fetchone()
+            state = (seen, version, datetime.fromtimestamp(changed_at, timezone.utc), now)
+        else:
+            state = state[:3] + (now,)
+        self.local.state = state
+        return state[1], state[2]
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.pages.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.pages.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, body):
+        with self.lock:
+            self.pages[key] = (version, body)
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_entries:
+                self.pages.popitem(last=False)